@@ -1,6 +1,13 @@
 import c4d
 from c4d import utils
 
+# NumPy не обязателен: если он установлен в Python Cinema 4D,
+# точки трансформируются одним векторизованным проходом.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def VectorEqual(v1, v2, eps=1e-6):
     """Сравнивает два вектора с учётом погрешности."""
@@ -16,6 +23,37 @@ def CollectDescendants(obj, out):
         CollectDescendants(c, out)
 
 
+def ReadPointArray(obj):
+    """Читает локальные точки объекта в массив float64 формы (n, 3)."""
+    count = obj.GetPointCount()
+    try:
+        arr = np.frombuffer(obj.GetPointR(), dtype=np.float64, count=count * 3)
+        return arr.reshape(count, 3).copy()
+    except Exception:
+        pts = [(p.x, p.y, p.z) for p in obj.GetAllPoints()]
+        return np.array(pts, dtype=np.float64).reshape(count, 3)
+
+
+def TransformPoints(obj, m):
+    """Применяет матрицу m ко всем точкам объекта."""
+    if np is None:
+        obj.SetAllPoints([m * p for p in obj.GetAllPoints()])
+        obj.Message(c4d.MSG_UPDATE)
+        return
+
+    basis = np.array([[m.v1.x, m.v1.y, m.v1.z],
+                      [m.v2.x, m.v2.y, m.v2.z],
+                      [m.v3.x, m.v3.y, m.v3.z]])
+    new_pts = ReadPointArray(obj) @ basis + np.array([m.off.x, m.off.y, m.off.z])
+    try:
+        # Пишем прямо в память точек, без создания Vector на каждую точку.
+        buf = np.frombuffer(obj.GetPointW(), dtype=np.float64, count=new_pts.size)
+        buf[:] = new_pts.ravel()
+    except Exception:
+        obj.SetAllPoints([c4d.Vector(x, y, z) for x, y, z in new_pts.tolist()])
+    obj.Message(c4d.MSG_UPDATE)
+
+
 def BakePolygonAxisWithLogs(doc, obj):
     name = obj.GetName() or "<без имени>"
     print(f"\n--- Baking Polygon Axis for '{name}' ---")
@@ -36,10 +74,8 @@ def BakePolygonAxisWithLogs(doc, obj):
     change = (~M_target) * M_before
     print("\nChange Matrix (for points):\n", change)
 
-    pts = obj.GetAllPoints()
-    new_pts = [change * p for p in pts]
     doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
-    obj.SetAllPoints(new_pts)
+    TransformPoints(obj, change)
     obj.SetMg(M_target)
 
     M_after = obj.GetMg()
@@ -0,0 +1,167 @@
+import os
+import sys
+
+import c4d
+from c4d import gui
+
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects
+
+# Only merge instances that share a parent. Set to False to merge all
+# instances of a master into one multi-instance under the first one's parent.
+SAME_PARENT_ONLY = True
+
+def is_generator_input(obj):
+    """Returns True if the object or one of its parents is used by a generator."""
+    while obj:
+        if obj.GetBit(c4d.BIT_CONTROLOBJECT):
+            return True
+        obj = obj.GetUp()
+    return False
+
+def tags_signature(obj):
+    """
+    Returns the material assignments of the object's texture tags, in order.
+    Instances are only merged when these match, since a multi-instance
+    carries one set of tags for all its copies.
+    """
+    signature = []
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Ttexture):
+            signature.append((tag[c4d.TEXTURETAG_MATERIAL],
+                              tag[c4d.TEXTURETAG_RESTRICTION],
+                              tag[c4d.TEXTURETAG_PROJECTION]))
+        tag = tag.GetNext()
+    return tuple(signature)
+
+def has_own_data(obj):
+    """
+    Returns True if the object carries anything a multi-instance can't take
+    over per copy: tags other than texture tags, animation tracks (on the
+    object or its texture tags) or user data.
+    """
+    if obj.GetCTracks() or obj.GetUserDataContainer():
+        return True
+    tag = obj.GetFirstTag()
+    while tag:
+        if not tag.CheckType(c4d.Ttexture) or tag.GetCTracks():
+            return True
+        tag = tag.GetNext()
+    return False
+
+def can_consolidate(obj, linked):
+    """
+    Returns True for plain instances that can become part of a multi-instance:
+    a valid link, no children, not already a render instance, not used by a
+    generator, not referenced by another instance, and no tags (other than
+    texture tags), tracks or user data that would be lost.
+    """
+    return (obj.CheckType(c4d.Oinstance) and
+            obj[c4d.INSTANCEOBJECT_LINK] is not None and
+            obj[c4d.INSTANCEOBJECT_RENDERINSTANCE_MODE] == c4d.INSTANCEOBJECT_RENDERINSTANCE_MODE_NONE and
+            obj.GetDown() is None and
+            obj not in linked and
+            not is_generator_input(obj) and
+            not has_own_data(obj))
+
+def group_instances(all_objects):
+    """
+    Groups the consolidatable instances by master, parent (if
+    SAME_PARENT_ONLY), layer, visibility and texture tags. Only groups with
+    at least two instances are returned, in scene order.
+    """
+    linked = set()
+    for obj in all_objects:
+        if obj.CheckType(c4d.Oinstance) and obj[c4d.INSTANCEOBJECT_LINK] is not None:
+            linked.add(obj[c4d.INSTANCEOBJECT_LINK])
+
+    groups = {}
+    order = []
+    for obj in all_objects:
+        if not can_consolidate(obj, linked):
+            continue
+        key = (obj[c4d.INSTANCEOBJECT_LINK],
+               obj.GetUp() if SAME_PARENT_ONLY else None,
+               obj.GetLayerObject(obj.GetDocument()),
+               obj[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR],
+               obj[c4d.ID_BASEOBJECT_VISIBILITY_RENDER],
+               tags_signature(obj))
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(obj)
+    return [groups[key] for key in order if len(groups[key]) > 1]
+
+def consolidate_group(doc, instances):
+    """
+    Replaces a group of instances with one multi-instance object that
+    carries their matrices. The new object sits where the first instance was,
+    with an identity local matrix, so the stored matrices are the instances'
+    world matrices relative to that parent.
+    """
+    first = instances[0]
+    parent = first.GetUp()
+    master = first[c4d.INSTANCEOBJECT_LINK]
+
+    multi = c4d.BaseObject(c4d.Oinstance)
+    multi[c4d.INSTANCEOBJECT_LINK] = master
+    multi[c4d.INSTANCEOBJECT_RENDERINSTANCE_MODE] = c4d.INSTANCEOBJECT_RENDERINSTANCE_MODE_MULTIINSTANCE
+    multi.SetName(master.GetName() + "_multi")
+    layer = first.GetLayerObject(doc)
+    if layer:
+        multi.SetLayerObject(layer)
+    multi[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] = first[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR]
+    multi[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] = first[c4d.ID_BASEOBJECT_VISIBILITY_RENDER]
+
+    tag = first.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Ttexture):
+            multi.InsertTag(tag.GetClone())
+        tag = tag.GetNext()
+
+    parent_inv = ~parent.GetMg() if parent else c4d.Matrix()
+    multi.SetInstanceMatrices([parent_inv * inst.GetMg() for inst in instances])
+
+    doc.InsertObject(multi, parent=parent, pred=first)
+    doc.AddUndo(c4d.UNDOTYPE_NEW, multi)
+    for inst in instances:
+        doc.AddUndo(c4d.UNDOTYPE_DELETE, inst)
+        inst.Remove()
+    return multi
+
+def main():
+    doc = c4d.documents.GetActiveDocument()
+    if not doc:
+        gui.MessageDialog("No active document found.")
+        return
+    if not hasattr(c4d.BaseObject(c4d.Oinstance), "SetInstanceMatrices"):
+        gui.MessageDialog("Multi-instances require Cinema 4D 2023 or newer.")
+        return
+
+    all_objects = get_all_objects(doc.GetFirstObject())
+    groups = group_instances(all_objects)
+    if not groups:
+        gui.MessageDialog("No instances to consolidate.")
+        return
+
+    # Group all operations into a single undo step.
+    doc.StartUndo()
+    merged = 0
+    for instances in groups:
+        multi = consolidate_group(doc, instances)
+        print("{}: {} instances".format(multi.GetName(), len(instances)))
+        merged += len(instances)
+    doc.EndUndo()
+
+    c4d.EventAdd()
+    removed = merged - len(groups)
+    gui.MessageDialog(f"Merged {merged} instances into {len(groups)} multi-instances.\n"
+                      f"Object count reduced by {removed} "
+                      f"({len(all_objects)} -> {len(all_objects) - removed}).")
+
+if __name__ == "__main__":
+    main()
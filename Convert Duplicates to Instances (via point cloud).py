@@ -1,86 +1,642 @@
+import math
+import os
+import sys
+import time
+
 import c4d
 from c4d import gui
 
-def get_all_objects(op, out):
-    """Recursively collects all objects in the scene."""
-    while op:
-        out.append(op)
-        get_all_objects(op.GetDown(), out)
-        op = op.GetNext()
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects
+
+# NumPy is optional. Cinema 4D doesn't ship it, but when it is installed into
+# C4D's Python all point clouds are handled as contiguous float64 arrays.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Smallest grid cell used by the point matcher, so a zero tolerance
+# still produces a usable grid (identical points share a cell).
+MIN_CELL_SIZE = 1e-6
+
+# Principal axes whose variances differ by less than this fraction of the
+# largest variance can't be told apart (e.g. cubes, cylinders).
+AXIS_EPSILON = 1e-4
+
+# An axis sign is ambiguous if the third moment along it is this small
+# relative to its absolute third moment (symmetric shapes).
+SIGN_EPSILON = 1e-6
+
+# Axis sign flips that keep the frame right-handed (proper rotations only).
+PROPER_FLIPS = ((1, 1, 1), (1, -1, -1), (-1, 1, -1), (-1, -1, 1))
+
+# Axis sign flips that mirror the frame.
+MIRROR_FLIPS = ((1, 1, -1), (1, -1, 1), (-1, 1, 1), (-1, -1, -1))
+
+# Optional: also match copies that were scaled (uniformly or along their
+# principal axes) or mirrored, e.g. left/right brackets. Their instances get
+# the recovered scale/mirror matrix. Shape buckets then only use the point
+# count, so matching takes longer.
+MATCH_SCALED_AND_MIRRORED = False
+
+# Shape buckets are this many tolerances wide. Matching clouds differ by at
+# most about two tolerances in their principal spreads, so probing the
+# neighbouring buckets never misses a match.
+DESCRIPTOR_CELL_FACTOR = 4.0
+
+# Offsets of a grid cell and its 26 neighbours.
+NEIGHBOUR_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+# Per-run caches keyed by object: local point buffers, centered world clouds
+# and canonical frames. Masters are compared many times, so each is built once.
+point_cache = {}
+cloud_cache = {}
+frame_cache = {}
+radius_cache = {}
+descriptor_cache = {}
+
+# Comparison stages, cheapest first. For each stage the run records how many
+# pairs it checked, how many it rejected and how long it took.
+COMPARISON_STAGES = ("type", "counts", "radius", "moments", "match")
+stage_stats = {}
 
 def clear_selection(doc):
     """Clears the active selection flag from all objects."""
-    all_objs = []
-    get_all_objects(doc.GetFirstObject(), all_objs)
+    all_objs = get_all_objects(doc.GetFirstObject())
     for obj in all_objs:
         obj.DelBit(c4d.BIT_ACTIVE)
 
-def get_centered_points(obj):
+def clear_caches():
+    """Forgets all point buffers and frames from a previous run."""
+    point_cache.clear()
+    cloud_cache.clear()
+    frame_cache.clear()
+    radius_cache.clear()
+    descriptor_cache.clear()
+
+def as_vector(v):
+    """Converts a NumPy row to a c4d.Vector (Vectors are returned unchanged)."""
+    if np is not None and isinstance(v, np.ndarray):
+        return c4d.Vector(float(v[0]), float(v[1]), float(v[2]))
+    return v
+
+def read_point_array(obj):
+    """Reads the object's local points into an (n, 3) float64 array."""
+    count = obj.GetPointCount()
+    try:
+        # View the point memory directly instead of creating a Vector per point.
+        arr = np.frombuffer(obj.GetPointR(), dtype=np.float64, count=count * 3)
+        return arr.reshape(count, 3).copy()
+    except Exception:
+        pts = [(p.x, p.y, p.z) for p in obj.GetAllPoints()]
+        return np.array(pts, dtype=np.float64).reshape(count, 3)
+
+def get_local_points(obj):
     """
-    Returns a list of world-space points centered on the object's centroid.
-    This ignores pivot position.
+    Returns the object's local points, read once per run: an (n, 3) float64
+    array when NumPy is available, otherwise a list of c4d.Vector.
     """
-    points = obj.GetAllPoints()
-    if not points:
-        return []
+    pts = point_cache.get(obj)
+    if pts is None:
+        pts = read_point_array(obj) if np is not None else obj.GetAllPoints()
+        point_cache[obj] = pts
+    return pts
+
+def get_world_points(obj):
+    """Returns the object's points in world space."""
     mg = obj.GetMg()
-    world_pts = [mg * p for p in points]
+    pts = get_local_points(obj)
+    if np is not None:
+        basis = np.array([[mg.v1.x, mg.v1.y, mg.v1.z],
+                          [mg.v2.x, mg.v2.y, mg.v2.z],
+                          [mg.v3.x, mg.v3.y, mg.v3.z]])
+        return pts @ basis + np.array([mg.off.x, mg.off.y, mg.off.z])
+    return [mg * p for p in pts]
+
+def get_centroid(points):
+    """Returns the average of a non-empty point cloud."""
+    if np is not None:
+        return points.mean(axis=0)
     center = c4d.Vector(0)
-    for p in world_pts:
+    for p in points:
         center += p
-    center /= len(world_pts)
-    return [p - center for p in world_pts]
+    return center / len(points)
+
+def get_world_cloud(obj):
+    """
+    Returns (centroid, centered_points) of the object's world-space points,
+    computed once per run. centroid is None for objects without points.
+    """
+    cloud = cloud_cache.get(obj)
+    if cloud is None:
+        world_pts = get_world_points(obj)
+        if len(world_pts) == 0:
+            cloud = (None, world_pts)
+        else:
+            center = get_centroid(world_pts)
+            if np is not None:
+                cloud = (center, world_pts - center)
+            else:
+                cloud = (center, [p - center for p in world_pts])
+        cloud_cache[obj] = cloud
+    return cloud
+
+def get_centered_points(obj):
+    """
+    Returns the world-space points centered on the object's centroid.
+    This ignores pivot position.
+    """
+    return get_world_cloud(obj)[1]
+
+def symmetric_eigen(a):
+    """
+    Jacobi eigen decomposition of a symmetric 3x3 matrix given as nested lists.
+    Returns (eigenvalues, eigenvectors) with eigenvectors as unit c4d.Vectors.
+    Only used when NumPy is not available.
+    """
+    a = [row[:] for row in a]
+    v = [[1.0 if i == j else 0.0 for j in range(3)] for i in range(3)]
+    for _ in range(50):
+        if a[0][1] ** 2 + a[0][2] ** 2 + a[1][2] ** 2 < 1e-30:
+            break
+        for p, q in ((0, 1), (0, 2), (1, 2)):
+            if a[p][q] == 0.0:
+                continue
+            theta = (a[q][q] - a[p][p]) / (2.0 * a[p][q])
+            t = math.copysign(1.0, theta) / (abs(theta) + math.sqrt(theta * theta + 1.0))
+            c = 1.0 / math.sqrt(t * t + 1.0)
+            s = t * c
+            for k in range(3):
+                akp, akq = a[k][p], a[k][q]
+                a[k][p] = c * akp - s * akq
+                a[k][q] = s * akp + c * akq
+            for k in range(3):
+                apk, aqk = a[p][k], a[q][k]
+                a[p][k] = c * apk - s * aqk
+                a[q][k] = s * apk + c * aqk
+            for k in range(3):
+                vkp, vkq = v[k][p], v[k][q]
+                v[k][p] = c * vkp - s * vkq
+                v[k][q] = s * vkp + c * vkq
+    values = [a[i][i] for i in range(3)]
+    vectors = [c4d.Vector(v[0][i], v[1][i], v[2][i]) for i in range(3)]
+    return values, vectors
+
+def principal_axes(centered):
+    """
+    Returns (variances, axes) of a centered cloud sorted by decreasing
+    variance. Axes are unit NumPy rows or c4d.Vectors.
+    """
+    if np is not None:
+        values, vectors = np.linalg.eigh(centered.T @ centered)
+        order = np.argsort(values)[::-1]
+        return [float(values[i]) for i in order], [vectors[:, i].copy() for i in order]
+
+    cov = [[0.0] * 3 for _ in range(3)]
+    for p in centered:
+        c = (p.x, p.y, p.z)
+        for i in range(3):
+            for j in range(i, 3):
+                cov[i][j] += c[i] * c[j]
+    for i in range(3):
+        for j in range(i):
+            cov[i][j] = cov[j][i]
+    values, vectors = symmetric_eigen(cov)
+    order = sorted(range(3), key=lambda i: values[i], reverse=True)
+    return [values[i] for i in order], [vectors[i] for i in order]
+
+def third_moments(centered, axis):
+    """Returns (signed, absolute) third moments of the cloud along axis."""
+    if np is not None:
+        proj = centered @ axis
+        return float(np.sum(proj ** 3)), float(np.sum(np.abs(proj) ** 3))
+    proj = [p.Dot(axis) for p in centered]
+    return sum(d ** 3 for d in proj), sum(abs(d) ** 3 for d in proj)
+
+def get_canonical_frame(obj):
+    """
+    Puts the object's world-space points into a canonical frame: origin at the
+    centroid, axes along the principal axes (largest variance first), and each
+    axis flipped so the third moment of the cloud along it is positive.
+    Returns (frame, canonical_points, ambiguous), where frame maps canonical
+    coordinates to world space and ambiguous is True if the axes or their
+    signs could not be fixed reliably (symmetric shapes).
+    """
+    cached = frame_cache.get(obj)
+    if cached is not None:
+        return cached
+
+    center, centered = get_world_cloud(obj)
+    if center is None:
+        return None, centered, True
+
+    values, axes = principal_axes(centered)
+    scale = max(values[0], 1e-30)
+    ambiguous = (values[0] - values[1] <= AXIS_EPSILON * scale or
+                 values[1] - values[2] <= AXIS_EPSILON * scale)
+
+    for i in (0, 1):
+        skew, magnitude = third_moments(centered, axes[i])
+        if abs(skew) <= SIGN_EPSILON * magnitude:
+            ambiguous = True
+        if skew < 0:
+            axes[i] = -axes[i]
+
+    if np is not None:
+        axes[2] = np.cross(axes[0], axes[1])
+        canonical = centered @ np.array(axes).T
+    else:
+        axes[2] = axes[0].Cross(axes[1])
+        canonical = [c4d.Vector(p.Dot(axes[0]), p.Dot(axes[1]), p.Dot(axes[2]))
+                     for p in centered]
+
+    frame = c4d.Matrix(as_vector(center), as_vector(axes[0]),
+                       as_vector(axes[1]), as_vector(axes[2]))
+    cached = (frame, canonical, ambiguous)
+    frame_cache[obj] = cached
+    return cached
+
+def grid_key(p, cell):
+    """Returns the integer grid cell containing point p."""
+    return (math.floor(p.x / cell), math.floor(p.y / cell), math.floor(p.z / cell))
+
+def build_point_grid(points, cell):
+    """Buckets points into a uniform grid keyed by cell coordinates."""
+    grid = {}
+    for p in points:
+        grid.setdefault(grid_key(p, cell), []).append(p)
+    return grid
+
+def nearest_distance(grid, cell, p):
+    """
+    Returns the distance from p to the closest grid point in its own or a
+    neighbouring cell, or None if those cells are empty. Since the cell size
+    is at least the tolerance, every point within tolerance is found.
+    """
+    kx, ky, kz = grid_key(p, cell)
+    best = None
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                for q in grid.get((kx + dx, ky + dy, kz + dz), ()):
+                    d = (p - q).GetLength()
+                    if best is None or d < best:
+                        best = d
+    return best
+
+def directed_deviation(p_list, grid, cell, tolerance):
+    """
+    Checks that every point in p_list has a grid point within tolerance.
+    Returns (matched, max_deviation); stops at the first unmatched point.
+    """
+    worst = 0.0
+    for p in p_list:
+        d = nearest_distance(grid, cell, p)
+        if d is None or d > tolerance:
+            return False, float("inf") if d is None else d
+        if d > worst:
+            worst = d
+    return True, worst
+
+def encode_cells(keys):
+    """Packs rows of integer cell coordinates into one int64 hash each."""
+    return (keys[:, 0] * 73856093) ^ (keys[:, 1] * 19349663) ^ (keys[:, 2] * 83492791)
+
+def directed_deviation_array(src, dst, cell, tolerance):
+    """
+    Vectorized version of directed_deviation for NumPy clouds. dst is sorted
+    by cell hash, and every src row looks up the rows of its neighbouring cells
+    with a binary search. Returns (matched, max_deviation).
+    """
+    if len(src) == 0:
+        return True, 0.0
+    dst_codes = encode_cells(np.floor(dst / cell).astype(np.int64))
+    order = np.argsort(dst_codes, kind="stable")
+    dst_codes = dst_codes[order]
+    dst_sorted = dst[order]
+
+    src_keys = np.floor(src / cell).astype(np.int64)
+    best = np.full(len(src), np.inf)
+    for offset in NEIGHBOUR_OFFSETS:
+        codes = encode_cells(src_keys + offset)
+        lo = np.searchsorted(dst_codes, codes, side="left")
+        counts = np.searchsorted(dst_codes, codes, side="right") - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        # Expand every (src row, candidate dst row) pair of this offset.
+        seg_starts = np.cumsum(counts) - counts
+        src_idx = np.repeat(np.arange(len(src)), counts)
+        dst_idx = np.arange(total) + np.repeat(lo - seg_starts, counts)
+        dist = np.linalg.norm(src[src_idx] - dst_sorted[dst_idx], axis=1)
+        hit = counts > 0
+        best[hit] = np.minimum(best[hit], np.minimum.reduceat(dist, seg_starts[hit]))
+    worst = float(best.max())
+    return worst <= tolerance, worst
 
 def points_match(p_list1, p_list2, tolerance):
     """
     Checks if every point in p_list1 has at least one point in p_list2 within tolerance,
-    and vice versa.
+    and vice versa. Each list is hashed into a grid with cells of the tolerance size,
+    so only neighbouring cells are probed.
+    Returns (matched, max_deviation).
     """
-    for p1 in p_list1:
-        if not any((p1 - p2).GetLength() <= tolerance for p2 in p_list2):
-            return False
-    for p2 in p_list2:
-        if not any((p2 - p1).GetLength() <= tolerance for p1 in p_list1):
-            return False
-    return True
+    cell = max(tolerance, MIN_CELL_SIZE)
+    if np is not None:
+        ok, dev1 = directed_deviation_array(p_list1, p_list2, cell, tolerance)
+        if not ok:
+            return False, dev1
+        ok, dev2 = directed_deviation_array(p_list2, p_list1, cell, tolerance)
+        return ok, max(dev1, dev2)
+    ok, dev1 = directed_deviation(p_list1, build_point_grid(p_list2, cell), cell, tolerance)
+    if not ok:
+        return False, dev1
+    ok, dev2 = directed_deviation(p_list2, build_point_grid(p_list1, cell), cell, tolerance)
+    return ok, max(dev1, dev2)
+
+def flip_points(points, flip):
+    """Multiplies each axis of the cloud by the matching sign (or scale) in flip."""
+    if np is not None:
+        return points * np.array(flip, dtype=np.float64)
+    sx, sy, sz = flip
+    return [c4d.Vector(p.x * sx, p.y * sy, p.z * sz) for p in points]
+
+def match_shapes(obj_a, obj_b, tolerance):
+    """
+    Compares two polygon objects via their vertex clouds and returns the
+    world-space transform that maps obj_a's geometry onto obj_b's, or None if
+    they don't match within tolerance.
+    The cheap comparison stages run first, so most non-matching pairs never
+    reach find_shape_transform.
+    """
+    for stage, test in COMPARISON_TESTS:
+        result = run_stage(stage, test, obj_a, obj_b, tolerance)
+        if result is None or result is False:
+            return None
+    return result
+
+def find_shape_transform(obj_a, obj_b, tolerance):
+    """
+    Full vertex cloud match of two objects with equal point counts.
+    Translated copies are tried first; rotated copies are matched in their
+    canonical frames (scaled and mirrored ones too, if enabled). Returns the
+    transform or None.
+    """
+    center_a, pts_a = get_world_cloud(obj_a)
+    center_b, pts_b = get_world_cloud(obj_b)
+    if center_a is None:
+        return None
+    matched, _ = points_match(pts_a, pts_b, tolerance)
+    if matched:
+        return c4d.Matrix(as_vector(center_b) - as_vector(center_a))
+
+    frame_a, canon_a, ambiguous_a = get_canonical_frame(obj_a)
+    frame_b, canon_b, ambiguous_b = get_canonical_frame(obj_b)
+    ambiguous = ambiguous_a or ambiguous_b
+    flips = PROPER_FLIPS if ambiguous else PROPER_FLIPS[:1]
+    scale = c4d.Matrix()
+    if MATCH_SCALED_AND_MIRRORED:
+        # Stretch a's canonical cloud to b's spreads. A mirrored copy's
+        # canonical frame differs by a reflection of the third axis.
+        flips = flips + (MIRROR_FLIPS if ambiguous else MIRROR_FLIPS[:1])
+        factors = axis_scale_factors(obj_a, obj_b)
+        canon_a = flip_points(canon_a, factors)
+        scale = c4d.Matrix(c4d.Vector(0), c4d.Vector(factors[0], 0, 0),
+                           c4d.Vector(0, factors[1], 0), c4d.Vector(0, 0, factors[2]))
+    for sx, sy, sz in flips:
+        matched, _ = points_match(canon_a, flip_points(canon_b, (sx, sy, sz)), tolerance)
+        if matched:
+            frame = c4d.Matrix(frame_b.off, frame_b.v1 * sx, frame_b.v2 * sy, frame_b.v3 * sz)
+            return frame * scale * ~frame_a
+    return None
+
+def axis_scale_factors(obj_a, obj_b):
+    """
+    Per-axis scale from obj_a's canonical frame to obj_b's: the ratio of the
+    spreads along each principal axis (1.0 along flat axes).
+    """
+    spreads_a = shape_descriptor(obj_a)[1]
+    spreads_b = shape_descriptor(obj_b)[1]
+    return tuple(b / a if a > MIN_CELL_SIZE else 1.0 for a, b in zip(spreads_a, spreads_b))
 
 def are_shapes_equal_by_vertices(obj_a, obj_b, tolerance):
     """
-    Compares two polygon objects via their centered vertex clouds.
     Returns True if both objects have the same number of points and each point in one
-    finds a match in the other within the specified tolerance.
+    finds a match in the other within the specified tolerance, allowing for any
+    translation or rotation between them.
+    """
+    return match_shapes(obj_a, obj_b, tolerance) is not None
+
+def shape_descriptor(obj):
+    """
+    Returns a rotation-invariant descriptor of the object's cloud:
+    (point count, spreads), where spreads are the standard deviations along
+    the principal axes, largest first. Computed once per run.
+    """
+    descriptor = descriptor_cache.get(obj)
+    if descriptor is None:
+        center, centered = get_world_cloud(obj)
+        if center is None:
+            descriptor = (0, (0.0, 0.0, 0.0))
+        else:
+            values, _ = principal_axes(centered)
+            count = len(centered)
+            descriptor = (count, tuple(math.sqrt(max(v, 0.0) / count) for v in values))
+        descriptor_cache[obj] = descriptor
+    return descriptor
+
+def descriptor_key(obj, cell):
+    """
+    Quantizes the shape descriptor into a bucket key. Spreads change with
+    scale, so scaled matching buckets by point count only.
+    """
+    count, spreads = shape_descriptor(obj)
+    if MATCH_SCALED_AND_MIRRORED:
+        return (count, 0, 0, 0)
+    return (count,) + tuple(math.floor(s / cell) for s in spreads)
+
+def build_shape_index(objs, cell):
+    """Buckets polygon objects by descriptor_key (locality-sensitive hashing)."""
+    index = {}
+    for obj in objs:
+        if obj.CheckType(c4d.Opolygon) and obj.GetPointCount():
+            index.setdefault(descriptor_key(obj, cell), []).append(obj)
+    return index
+
+def shape_candidates(index, obj, cell):
+    """Yields indexed objects whose buckets neighbour obj's bucket."""
+    count, kx, ky, kz = descriptor_key(obj, cell)
+    for dx, dy, dz in NEIGHBOUR_OFFSETS:
+        for candidate in index.get((count, kx + dx, ky + dy, kz + dz), ()):
+            yield candidate
+
+def cloud_radius(obj):
+    """
+    Returns the largest distance of a world point from the centroid,
+    computed once per run.
+    """
+    radius = radius_cache.get(obj)
+    if radius is None:
+        centered = get_centered_points(obj)
+        if len(centered) == 0:
+            radius = 0.0
+        elif np is not None:
+            radius = float(np.sqrt((centered * centered).sum(axis=1).max()))
+        else:
+            radius = max(p.GetLength() for p in centered)
+        radius_cache[obj] = radius
+    return radius
+
+def stage_limit(tolerance):
+    """
+    Returns how far the radius or a spread of two matching clouds can differ:
+    every point, and with it the centroid, moves by at most the tolerance.
+    """
+    return 2.0 * tolerance + MIN_CELL_SIZE
+
+def both_polygons(obj_a, obj_b, tolerance):
+    """Stage: only polygon objects are compared."""
+    return obj_a.CheckType(c4d.Opolygon) and obj_b.CheckType(c4d.Opolygon)
+
+def same_point_count(obj_a, obj_b, tolerance):
+    """Stage: matching clouds have the same number of points."""
+    return obj_a.GetPointCount() == obj_b.GetPointCount()
+
+def similar_radius(obj_a, obj_b, tolerance):
+    """Stage: bounding radii around the centroids agree (unless scaled copies match)."""
+    if MATCH_SCALED_AND_MIRRORED:
+        return True
+    return abs(cloud_radius(obj_a) - cloud_radius(obj_b)) <= stage_limit(tolerance)
+
+def similar_spreads(obj_a, obj_b, tolerance):
+    """Stage: second moments along the principal axes agree (unless scaled copies match)."""
+    if MATCH_SCALED_AND_MIRRORED:
+        return True
+    limit = stage_limit(tolerance)
+    spreads_a = shape_descriptor(obj_a)[1]
+    spreads_b = shape_descriptor(obj_b)[1]
+    return all(abs(a - b) <= limit for a, b in zip(spreads_a, spreads_b))
+
+COMPARISON_TESTS = (
+    ("type", both_polygons),
+    ("counts", same_point_count),
+    ("radius", similar_radius),
+    ("moments", similar_spreads),
+    ("match", find_shape_transform),
+)
+
+def reset_stage_stats():
+    """Zeroes the per-stage counters before a run."""
+    stage_stats.clear()
+    for stage in COMPARISON_STAGES:
+        stage_stats[stage] = [0, 0, 0.0]  # checked, rejected, seconds
+
+def run_stage(stage, test, obj_a, obj_b, tolerance):
+    """Runs one comparison stage and records its outcome and time."""
+    start = time.perf_counter()
+    result = test(obj_a, obj_b, tolerance)
+    entry = stage_stats.setdefault(stage, [0, 0, 0.0])
+    entry[0] += 1
+    entry[2] += time.perf_counter() - start
+    if result is None or result is False:
+        entry[1] += 1
+    return result
+
+def print_stage_stats():
+    """Prints the per-stage counters to the console."""
+    print("Duplicate comparison stages (checked / rejected / ms):")
+    for stage in COMPARISON_STAGES:
+        checked, rejected, seconds = stage_stats.get(stage, (0, 0, 0.0))
+        print("  {:<8}{:>10}{:>10}{:>12.2f}".format(stage, checked, rejected, seconds * 1000.0))
+
+def cluster_shapes(objs, tolerance):
+    """
+    Groups all polygon objects into classes of matching shapes in one pass.
+    Each object is only compared against the masters found so far in the
+    neighbouring descriptor buckets, never against the whole scene.
+    Returns a list of (master, [(duplicate, transform), ...]) in scene order.
     """
-    if obj_a.GetPointCount() != obj_b.GetPointCount():
-        return False
-    pts_a = get_centered_points(obj_a)
-    pts_b = get_centered_points(obj_b)
-    return points_match(pts_a, pts_b, tolerance)
+    cell = max(DESCRIPTOR_CELL_FACTOR * tolerance, MIN_CELL_SIZE)
+    index = {}
+    classes = []
+    for obj in objs:
+        if not obj.CheckType(c4d.Opolygon) or not obj.GetPointCount():
+            continue
+        found = None
+        for cls in shape_candidates(index, obj, cell):
+            shape_mtx = match_shapes(cls[0], obj, tolerance)
+            if shape_mtx is not None:
+                found = cls
+                break
+        if found:
+            found[1].append((obj, shape_mtx))
+        else:
+            cls = (obj, [])
+            classes.append(cls)
+            index.setdefault(descriptor_key(obj, cell), []).append(cls)
+    return classes
 
 def get_master_object(op):
     """Traces instance links until it retrieves the underlying master object."""
-    while op and op.CheckType(c4d.Oinstance):
+    seen = set()
+    while op and op.CheckType(c4d.Oinstance) and op not in seen:
+        seen.add(op)
         op = op[c4d.INSTANCEOBJECT_LINK]
     return op
 
-def relink_instances(doc, all_objs, master, tolerance, dup_obj=None):
+def build_instance_index(all_objs):
     """
-    Reassigns any instance objects that reference a duplicate (dup_obj, if provided)
-    or are identical (by vertex check within tolerance) to 'master'.
+    Maps every real master to the instances that resolve to it. Built once per
+    run and kept up to date while duplicates are replaced.
     """
+    index = {}
     for obj in all_objs:
         if obj.CheckType(c4d.Oinstance):
-            ref = obj[c4d.INSTANCEOBJECT_LINK]
-            real_master = get_master_object(ref)
-            if dup_obj:
-                if real_master == dup_obj:
-                    doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
-                    obj[c4d.INSTANCEOBJECT_LINK] = master
-                    obj.SetName(master.GetName() + "_instance")
-            else:
-                if real_master and are_shapes_equal_by_vertices(master, real_master, tolerance):
-                    doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
-                    obj[c4d.INSTANCEOBJECT_LINK] = master
-                    obj.SetName(master.GetName() + "_instance")
+            real_master = get_master_object(obj[c4d.INSTANCEOBJECT_LINK])
+            if real_master:
+                index.setdefault(real_master, []).append(obj)
+    return index
+
+def relink_instance(doc, inst, master, real_master, transform):
+    """
+    Points inst at master. transform maps master's world geometry onto
+    real_master's (the geometry inst displays now), so the instance matrix is
+    corrected to keep the instance visually in place.
+    """
+    doc.AddUndo(c4d.UNDOTYPE_CHANGE, inst)
+    mg = inst.GetMg() * ~real_master.GetMg() * transform * master.GetMg()
+    inst[c4d.INSTANCEOBJECT_LINK] = master
+    inst.SetMg(mg)
+    inst.SetName(master.GetName() + "_instance")
+
+def relink_instances(doc, instance_index, master, tolerance, dup_obj=None, transform=None):
+    """
+    Reassigns any instance objects that reference a duplicate (dup_obj, if provided,
+    with transform mapping master onto it) or are identical (by vertex check within
+    tolerance) to 'master'. Relinked instances move to master's entry in
+    instance_index.
+    """
+    if dup_obj:
+        moved = instance_index.pop(dup_obj, [])
+        for obj in moved:
+            relink_instance(doc, obj, master, dup_obj, transform)
+        instance_index.setdefault(master, []).extend(moved)
+        return
+    for obj in instance_index.get(master, ()):
+        doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
+        obj[c4d.INSTANCEOBJECT_LINK] = master
+        obj.SetName(master.GetName() + "_instance")
+    for real_master in list(instance_index):
+        if real_master == master or not real_master.CheckType(c4d.Opolygon):
+            continue
+        shape_mtx = match_shapes(master, real_master, tolerance)
+        if shape_mtx is not None:
+            relink_instances(doc, instance_index, master, tolerance,
+                             dup_obj=real_master, transform=shape_mtx)
 
 def transfer_children(doc, old_obj, new_parent):
     """
@@ -97,48 +653,56 @@ def transfer_children(doc, old_obj, new_parent):
         child.SetMl(~new_parent.GetMg() * world_mtx if new_parent else world_mtx)
         child = next_child
 
-def replace_duplicates(doc, all_objs, master, masters, tolerance):
+def convert_duplicate(doc, instance_index, master, obj, shape_mtx, tolerance):
+    """
+    Replaces obj with an instance of master. shape_mtx maps master's geometry
+    onto obj's, so the instance lands exactly on the duplicate, including any
+    rotation between them. Instances referencing obj are re-linked first.
+    """
+    parent = obj.GetUp()
+    world_mtx = shape_mtx * master.GetMg()
+    local_mtx = (~parent.GetMg() * world_mtx) if parent else world_mtx
+
+    relink_instances(doc, instance_index, master, tolerance, dup_obj=obj, transform=shape_mtx)
+
+    instance = c4d.BaseObject(c4d.Oinstance)
+    instance[c4d.INSTANCEOBJECT_LINK] = master
+    instance.SetName(master.GetName() + "_instance")
+    instance.SetMl(local_mtx)
+    doc.InsertObject(instance, parent=parent, pred=obj)
+    instance_index[master].append(instance)
+
+    transfer_children(doc, obj, instance)
+
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Ttexture):
+            instance.InsertTag(tag.GetClone())
+        tag = tag.GetNext()
+
+    doc.AddUndo(c4d.UNDOTYPE_NEW, instance)
+    doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
+    obj.Remove()
+
+def replace_duplicates(doc, instance_index, master, masters, tolerance, candidates):
     """
     Converts any duplicate object (scene-wide) that is identical to 'master'
-    (as determined by vertex cloud check within tolerance) into an instance of master.
-    Prior to deletion, any instances referencing the duplicate are re-linked to master.
-    
+    (as determined by vertex cloud check within tolerance, in any orientation)
+    into an instance of master placed with the recovered rigid transform.
+    Only the candidates from master's neighbouring shape buckets are checked.
+
     Returns the number of duplicates converted.
     """
     converted = 0
-    for obj in list(all_objs):
+    for obj in candidates:
         if obj == master or obj in masters:
             continue
-        if obj.CheckType(c4d.Opolygon) and are_shapes_equal_by_vertices(master, obj, tolerance):
-            parent = obj.GetUp()
-            world_mtx = obj.GetMg()
-            local_mtx = (~parent.GetMg() * world_mtx) if parent else world_mtx
-
-            relink_instances(doc, all_objs, master, tolerance, dup_obj=obj)
-
-            instance = c4d.BaseObject(c4d.Oinstance)
-            instance[c4d.INSTANCEOBJECT_LINK] = master
-            instance.SetName(master.GetName() + "_instance")
-            instance.SetMl(local_mtx)
-            doc.InsertObject(instance, parent=parent, pred=obj)
-
-            transfer_children(doc, obj, instance)
-
-            for inst in all_objs:
-                if inst.CheckType(c4d.Oinstance) and inst[c4d.INSTANCEOBJECT_LINK] == obj:
-                    doc.AddUndo(c4d.UNDOTYPE_CHANGE, inst)
-                    inst[c4d.INSTANCEOBJECT_LINK] = master
-                    inst.SetName(master.GetName() + "_instance")
-
-            tag = obj.GetFirstTag()
-            while tag:
-                if tag.CheckType(c4d.Ttexture):
-                    instance.InsertTag(tag.GetClone())
-                tag = tag.GetNext()
-
-            doc.AddUndo(c4d.UNDOTYPE_NEW, instance)
-            doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
-            obj.Remove()
+        # Skip objects already replaced while processing another master.
+        if obj.GetDocument() is None:
+            continue
+        shape_mtx = match_shapes(master, obj, tolerance)
+        if shape_mtx is not None:
+            convert_duplicate(doc, instance_index, master, obj, shape_mtx, tolerance)
             converted += 1
             # Continue checking for more duplicates
     return converted
@@ -160,13 +724,22 @@ def main():
     if not doc:
         gui.MessageDialog("No active document found.")
         return
+    clear_caches()
+    reset_stage_stats()
 
-    # Step 1: Process selection (multi-select, polygon objects)
+    # Step 1: Process selection (multi-select, polygon objects). With nothing
+    # selected, offer to dedupe the entire scene instead.
     selection = doc.GetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_NONE)
-    selected_polys = [obj for obj in selection if obj.CheckType(c4d.Opolygon)]
-    if not selected_polys:
-        gui.MessageDialog("Please select one or more polygon objects to use as reference.")
-        return
+    whole_scene = not selection
+    if whole_scene:
+        if not gui.QuestionDialog("Nothing is selected.\n"
+                                  "Convert duplicates in the entire scene?"):
+            return
+    else:
+        selected_polys = [obj for obj in selection if obj.CheckType(c4d.Opolygon)]
+        if not selected_polys:
+            gui.MessageDialog("Please select one or more polygon objects to use as reference.")
+            return
 
     # Ask for tolerance from the user.
     input_str = gui.InputDialog("Enter tolerance (e.g. 0.01):", "0.01")
@@ -178,27 +751,39 @@ def main():
         gui.MessageDialog("Invalid number.")
         return
 
-    # Deduplicate selected objects.
-    masters = deduplicate_selection(selected_polys, tolerance)
-    # (No dialog if duplicates found; dialog will appear only if no duplicates found later.)
-
     # Step 2: Gather all scene objects.
-    all_objs = []
-    get_all_objects(doc.GetFirstObject(), all_objs)
+    all_objs = get_all_objects(doc.GetFirstObject())
 
     doc.StartUndo()
+    total_converted = 0
+    instance_index = build_instance_index(all_objs)
 
-    # Step 3: Re-link existing instances for each master.
-    for master in masters:
-        relink_instances(doc, all_objs, master, tolerance)
+    if whole_scene:
+        # Step 3: Cluster every polygon object and convert all classes in one batch.
+        for master, duplicates in cluster_shapes(all_objs, tolerance):
+            for obj, shape_mtx in duplicates:
+                convert_duplicate(doc, instance_index, master, obj, shape_mtx, tolerance)
+                total_converted += 1
+    else:
+        # Deduplicate selected objects.
+        masters = deduplicate_selection(selected_polys, tolerance)
+        # (No dialog if duplicates found; dialog will appear only if no duplicates found later.)
 
-    # Step 4: Replace duplicates (scene-wide) for each master.
-    total_converted = 0
-    for master in masters:
-        total_converted += replace_duplicates(doc, all_objs, master, masters, tolerance)
+        # Step 3: Re-link existing instances for each master.
+        for master in masters:
+            relink_instances(doc, instance_index, master, tolerance)
+
+        # Step 4: Replace duplicates (scene-wide) for each master, checking only
+        # objects from its neighbouring shape buckets.
+        cell = max(DESCRIPTOR_CELL_FACTOR * tolerance, MIN_CELL_SIZE)
+        index = build_shape_index(all_objs, cell)
+        for master in masters:
+            candidates = list(shape_candidates(index, master, cell))
+            total_converted += replace_duplicates(doc, instance_index, master, masters, tolerance, candidates)
 
     doc.EndUndo()
     c4d.EventAdd()
+    print_stage_stats()
 
     # Show a dialog only if no duplicates were found.
     if total_converted == 0:
@@ -1,9 +1,29 @@
 # Author: Chat GPT and Dani Zaitcev
 # Tested with Cinema 4D 2025.2 and Redshift 2025.4
 
+import hashlib
+import math
+import os
+import sys
+import time
+from array import array
+
 import c4d
 from c4d import gui
 
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects, get_subtree
+
+# NumPy is optional: if it's installed into C4D's Python, point sets are
+# compared as sorted float64 arrays instead of sets of c4d.Vector.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # ----------------------------------------------------------------------
 # Define key parameters for comparing lights.
 LIGHT_PARAMETERS = {
@@ -23,23 +43,47 @@ LIGHT_PARAMETERS = {
     "Path": c4d.LIGHT_PHOTOMETRIC_FILE                      # str
 }
 
-# ----------------------------------------------------------------------
-# Recursively collect all objects in the document.
-def get_all_objects(op, out):
-    while op:
-        out.append(op)
-        get_all_objects(op.GetDown(), out)
-        op = op.GetNext()
+# Point sets read during this run, keyed by object.
+point_cache = {}
+moment_cache = {}
+hash_cache = {}
+mesh_cache = {}
+generator_cache = {}
+
+# Comparison stages, cheapest first. For each stage the run records how many
+# pairs it checked, how many it rejected and how long it took.
+COMPARISON_STAGES = ("type", "counts", "bounds", "moments", "hash", "exact", "cache")
+stage_stats = {}
 
 # ----------------------------------------------------------------------
-# Supported object types: polygons, splines, primitives, and lights.
+# Supported object types: polygons, splines, primitives, lights, and any
+# other generator with a built cache (Extrude, Sweep, Lathe, Boole...).
 def is_supported_type(op):
     return op and (
         op.CheckType(c4d.Opolygon) or 
         op.CheckType(c4d.Ospline) or 
-        op.GetType() in SUPPORTED_GENERATORS
+        op.GetType() in SUPPORTED_GENERATORS or
+        is_procedural(op)
     )
 
+# ----------------------------------------------------------------------
+# Generators outside SUPPORTED_GENERATORS are compared by their cache.
+def is_procedural(op):
+    return (op.GetType() not in SUPPORTED_GENERATORS and
+            not op.CheckType(c4d.Oinstance) and
+            bool(op.GetInfo() & c4d.OBJECT_GENERATOR) and
+            op.GetCache() is not None)
+
+# ----------------------------------------------------------------------
+# Objects consumed by a generator (and everything below them) are part of
+# that generator's cache, not standalone geometry.
+def is_generator_input(op):
+    while op:
+        if op.GetBit(c4d.BIT_CONTROLOBJECT):
+            return True
+        op = op.GetUp()
+    return False
+
 SUPPORTED_GENERATORS = {
     c4d.Ocube, c4d.Osphere, c4d.Oplatonic, c4d.Ocone,
     c4d.Ocylinder, c4d.Odisc, c4d.Otorus, c4d.Ocapsule,
@@ -89,66 +133,512 @@ def standard_lights_identical(light1, light2):
     return True
 
 # ----------------------------------------------------------------------
-# Overall comparison of two objects.
-def objects_are_identical(op1, op2):
-    if not op1 or not op2:
-        return False
-    if op1.GetType() != op2.GetType():
-        return False
-    if op1.CheckType(c4d.Opolygon):
-        if op1.GetPolygonCount() != op2.GetPolygonCount():
-            return False
-        if op1.GetPointCount() != op2.GetPointCount():
+# Read an object's local points into an (n, 3) float64 array.
+def read_point_array(op):
+    count = op.GetPointCount()
+    try:
+        # View the point memory directly instead of creating a Vector per point.
+        arr = np.frombuffer(op.GetPointR(), dtype=np.float64, count=count * 3)
+        return arr.reshape(count, 3).copy()
+    except Exception:
+        pts = [(p.x, p.y, p.z) for p in op.GetAllPoints()]
+        return np.array(pts, dtype=np.float64).reshape(count, 3)
+
+# ----------------------------------------------------------------------
+# The object's point set, read once per run. With NumPy this is the array of
+# unique points in sorted order (-0.0 folded into 0.0), otherwise a frozenset.
+def get_point_set(op):
+    key = point_cache.get(op)
+    if key is None:
+        if np is not None:
+            key = np.unique(read_point_array(op) + 0.0, axis=0)
+        else:
+            key = frozenset(op.GetAllPoints())
+        point_cache[op] = key
+    return key
+
+# ----------------------------------------------------------------------
+# Compare the point sets of two objects (order and repeats are ignored).
+def points_equal(op1, op2):
+    a = get_point_set(op1)
+    b = get_point_set(op2)
+    if np is not None:
+        return a.shape == b.shape and bool(np.array_equal(a, b))
+    return a == b
+
+# ----------------------------------------------------------------------
+# Tags that are part of a mesh's identity, besides its points and polygons.
+CORNER_TAGS = (c4d.Tuvw, c4d.Tnormal)
+SELECTION_TAGS = (c4d.Tpointselection, c4d.Tpolygonselection, c4d.Tedgeselection)
+
+def read_polygon_array(op):
+    count = op.GetPolygonCount()
+    try:
+        arr = np.frombuffer(op.GetPolygonR(), dtype=np.int32, count=count * 4)
+        return arr.reshape(count, 4).astype(np.int64)
+    except Exception:
+        polys = [(p.a, p.b, p.c, p.d) for p in op.GetAllPolygons()]
+        return np.array(polys, dtype=np.int64).reshape(count, 4)
+
+# ----------------------------------------------------------------------
+# Canonical layout of a mesh: points sorted by position, polygons relabelled
+# through that order, rotated to start at their lowest point, then sorted.
+# Returns (points, polygons, rank, poly_order, poly_rank, corners, shift, size):
+#   rank[i]        new index of point i
+#   poly_order[j]  old index of the polygon at position j
+#   poly_rank[i]   new position of polygon i
+#   corners[j]     old corner indices of the polygon at position j, in order
+#   shift[i]       how far polygon i was rotated
+#   size[i]        3 for triangles (c == d), 4 for quads
+def canonical_mesh_layout(op):
+    if np is not None:
+        pts = read_point_array(op) + 0.0
+        order = np.lexsort(pts.T[::-1])
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        polys = rank[read_polygon_array(op)]
+        size = np.where(polys[:, 2] == polys[:, 3], 3, 4)
+        lead = polys.copy()
+        lead[size == 3, 3] = len(order)
+        shift = np.argmin(lead, axis=1)
+        corners = (shift[:, None] + np.arange(4)) % size[:, None]
+        corners[size == 3, 3] = corners[size == 3, 2]
+        canon = np.take_along_axis(polys, corners, axis=1)
+        poly_order = np.lexsort(canon.T[::-1])
+        poly_rank = np.empty(len(poly_order), dtype=np.int64)
+        poly_rank[poly_order] = np.arange(len(poly_order))
+        return (pts[order], canon[poly_order], rank, poly_order, poly_rank,
+                corners[poly_order], shift, size)
+
+    pts = [(p.x + 0.0, p.y + 0.0, p.z + 0.0) for p in op.GetAllPoints()]
+    order = sorted(range(len(pts)), key=pts.__getitem__)
+    rank = [0] * len(pts)
+    for new, old in enumerate(order):
+        rank[old] = new
+    canon, corners, shift, size = [], [], [], []
+    for poly in op.GetAllPolygons():
+        idx = (rank[poly.a], rank[poly.b], rank[poly.c], rank[poly.d])
+        n = 3 if poly.c == poly.d else 4
+        first = min(range(n), key=idx.__getitem__)
+        cols = [(first + k) % n for k in range(n)]
+        if n == 3:
+            cols.append(cols[2])
+        canon.append(tuple(idx[c] for c in cols))
+        corners.append(cols)
+        shift.append(first)
+        size.append(n)
+    poly_order = sorted(range(len(canon)), key=canon.__getitem__)
+    poly_rank = [0] * len(canon)
+    for new, old in enumerate(poly_order):
+        poly_rank[old] = new
+    return ([pts[i] for i in order], [canon[i] for i in poly_order], rank, poly_order,
+            poly_rank, [corners[i] for i in poly_order], shift, size)
+
+# ----------------------------------------------------------------------
+# Raw bytes of layout rows; NumPy and plain rows give the same bytes.
+def layout_bytes(rows, code):
+    if np is not None:
+        return np.ascontiguousarray(rows).tobytes()
+    return array(code, (v for row in rows for v in row)).tobytes()
+
+# ----------------------------------------------------------------------
+# Per-corner tag data (UVWs, normals) in canonical polygon and corner order.
+# The record size is taken from the buffer, so the storage format of the
+# tag doesn't matter. Returns None if the data can't be read.
+def corner_tag_bytes(tag, layout, poly_count):
+    try:
+        data = bytes(tag.GetLowlevelDataAddressR())
+    except Exception:
+        return None
+    if not poly_count or len(data) % (poly_count * 4):
+        # Unknown layout: compare as stored (may miss reordered copies).
+        return data
+    corner = len(data) // (poly_count * 4)
+    poly_order, corners = layout[3], layout[5]
+    if np is not None:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(poly_count, 4, corner)
+        return raw[poly_order[:, None], corners].tobytes()
+    record = corner * 4
+    return b"".join(data[i * record + c * corner:i * record + (c + 1) * corner]
+                    for i, cols in zip(poly_order, corners) for c in cols)
+
+# ----------------------------------------------------------------------
+# Selected point, polygon or edge indices of a selection tag, relabelled
+# through the canonical layout and sorted.
+def selection_bytes(tag, layout, poly_count, point_count):
+    rank, poly_rank, shift, size = layout[2], layout[4], layout[6], layout[7]
+    if tag.CheckType(c4d.Tpointselection):
+        count, remap = point_count, rank
+    elif tag.CheckType(c4d.Tpolygonselection):
+        count, remap = poly_count, poly_rank
+    else:
+        count, remap = poly_count * 4, None
+    flags = tag.GetBaseSelect().GetAll(count)
+    if np is not None:
+        sel = np.flatnonzero(np.array(flags, dtype=bool))
+        if remap is not None:
+            return np.sort(remap[sel]).tobytes()
+        poly, edge = sel // 4, sel % 4
+        n = size[poly]
+        side = np.where(edge < n, (edge - shift[poly]) % n, edge)
+        return np.sort(poly_rank[poly] * 4 + side).tobytes()
+    sel = [i for i, on in enumerate(flags) if on]
+    if remap is not None:
+        return array("q", sorted(remap[i] for i in sel)).tobytes()
+    new = []
+    for i in sel:
+        poly, edge = divmod(i, 4)
+        n = size[poly]
+        side = (edge - shift[poly]) % n if edge < n else edge
+        new.append(poly_rank[poly] * 4 + side)
+    return array("q", sorted(new)).tobytes()
+
+# ----------------------------------------------------------------------
+# Canonical hash of a polygon object: point positions, polygon connectivity,
+# UVW and normal tags, selection tags and Phong settings, independent of
+# point and polygon order. Computed once per run; None if a tag couldn't be
+# read (such meshes never match).
+def mesh_hash(op):
+    if op in mesh_cache:
+        return mesh_cache[op]
+    poly_count, point_count = op.GetPolygonCount(), op.GetPointCount()
+    layout = canonical_mesh_layout(op)
+    h = hashlib.md5()
+    h.update(layout_bytes(layout[0], "d"))
+    h.update(layout_bytes(layout[1], "q"))
+    digest = None
+    tag = op.GetFirstTag()
+    while tag:
+        t = tag.GetType()
+        if t in CORNER_TAGS:
+            data = corner_tag_bytes(tag, layout, poly_count)
+            if data is None:
+                break
+        elif t in SELECTION_TAGS:
+            data = tag.GetName().encode("utf-8") + b"\0" + \
+                selection_bytes(tag, layout, poly_count, point_count)
+        elif t == c4d.Tphong:
+            data = repr(container_hash(tag.GetDataInstance())).encode("utf-8")
+        else:
+            tag = tag.GetNext()
+            continue
+        h.update(b"%d:%d:" % (t, len(data)))
+        h.update(data)
+        tag = tag.GetNext()
+    else:
+        digest = h.hexdigest()
+    mesh_cache[op] = digest
+    return digest
+
+# ----------------------------------------------------------------------
+# Hash of a generator's evaluated cache: the type, local matrix and geometry
+# of every cache object, taking deformed geometry where a deform cache
+# exists. Computed once per run; None if there is no cache or part of it
+# can't be hashed.
+def matrix_bytes(m):
+    return array("d", (m.off.x, m.off.y, m.off.z, m.v1.x, m.v1.y, m.v1.z,
+                       m.v2.x, m.v2.y, m.v2.z, m.v3.x, m.v3.y, m.v3.z)).tobytes()
+
+def hash_cache_tree(op, h):
+    while op:
+        h.update(b"%d[" % op.GetType())
+        h.update(matrix_bytes(op.GetMl()))
+        sub = op.GetDeformCache() or op.GetCache()
+        if sub is not None:
+            if not hash_cache_tree(sub, h):
+                return False
+        elif not op.GetBit(c4d.BIT_CONTROLOBJECT):
+            if op.CheckType(c4d.Opolygon):
+                digest = mesh_hash(op)
+                if digest is None:
+                    return False
+                h.update(digest.encode("ascii"))
+            elif op.CheckType(c4d.Ospline):
+                h.update(repr(points_hash(op)).encode("ascii"))
+        if not hash_cache_tree(op.GetDown(), h):
             return False
-        return set(op1.GetAllPoints()) == set(op2.GetAllPoints())
+        h.update(b"]")
+        op = op.GetNext()
+    return True
+
+def generator_cache_hash(op):
+    if op in generator_cache:
+        return generator_cache[op]
+    cache = op.GetDeformCache() or op.GetCache()
+    h = hashlib.md5()
+    digest = None
+    if cache is not None and hash_cache_tree(cache, h):
+        digest = h.hexdigest()
+    generator_cache[op] = digest
+    return digest
+
+# ----------------------------------------------------------------------
+# Mean and second moments of the object's point set, computed once per run.
+def point_moments(op):
+    moments = moment_cache.get(op)
+    if moments is None:
+        pts = get_point_set(op)
+        if not len(pts):
+            moments = (0.0,) * 9
+        elif np is not None:
+            products = pts[:, [0, 0, 0, 1, 1, 2]] * pts[:, [0, 1, 2, 1, 2, 2]]
+            moments = tuple(pts.mean(axis=0).tolist() + products.mean(axis=0).tolist())
+        else:
+            rows = [(p.x, p.y, p.z, p.x * p.x, p.x * p.y, p.x * p.z,
+                     p.y * p.y, p.y * p.z, p.z * p.z) for p in pts]
+            moments = tuple(math.fsum(col) / len(rows) for col in zip(*rows))
+        moment_cache[op] = moments
+    return moments
+
+# ----------------------------------------------------------------------
+# Point hash of the object, computed once per run.
+def cached_points_hash(op):
+    value = hash_cache.get(op)
+    if value is None:
+        value = points_hash(op)
+        hash_cache[op] = value
+    return value
+
+# ----------------------------------------------------------------------
+# Comparison stages. Each one only rejects pairs that can't be identical.
+def same_type(op1, op2):
+    return op1.GetType() == op2.GetType()
+
+def same_counts(op1, op2):
     if op1.CheckType(c4d.Ospline):
         if op1[c4d.SPLINEOBJECT_TYPE] != op2[c4d.SPLINEOBJECT_TYPE]:
             return False
         if op1.GetSegmentCount() != op2.GetSegmentCount():
             return False
-        if op1.GetPointCount() != op2.GetPointCount():
+    elif op1.GetPolygonCount() != op2.GetPolygonCount():
+        return False
+    return op1.GetPointCount() == op2.GetPointCount()
+
+def same_bounds(op1, op2):
+    # A polygon object's bounding box is spanned by its points.
+    return op1.GetMp() == op2.GetMp() and op1.GetRad() == op2.GetRad()
+
+def same_moments(op1, op2):
+    return all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+               for a, b in zip(point_moments(op1), point_moments(op2)))
+
+def same_points_hash(op1, op2):
+    return cached_points_hash(op1) == cached_points_hash(op2)
+
+def same_mesh_hash(op1, op2):
+    digest = mesh_hash(op1)
+    return digest is not None and digest == mesh_hash(op2)
+
+def same_generator_cache(op1, op2):
+    digest = generator_cache_hash(op1)
+    return digest is not None and digest == generator_cache_hash(op2)
+
+def same_parameters(op1, op2):
+    if op1.GetType() == c4d.Orslight:
+        return rs_lights_equal(op1, op2)
+    if op1.GetType() == c4d.Olight:
+        return standard_lights_identical(op1, op2)
+    return op1.GetDataInstance() == op2.GetDataInstance()
+
+# The mesh hash already covers points, connectivity and tags exactly, so
+# polygon objects need no further compare once it matches.
+POLYGON_STAGES = (
+    ("type", same_type),
+    ("counts", same_counts),
+    ("bounds", same_bounds),
+    ("moments", same_moments),
+    ("hash", same_mesh_hash),
+)
+SPLINE_STAGES = (
+    ("type", same_type),
+    ("counts", same_counts),
+    ("moments", same_moments),
+    ("hash", same_points_hash),
+    ("exact", points_equal),
+)
+PARAMETER_STAGES = (
+    ("type", same_type),
+    ("exact", same_parameters),
+)
+GENERATOR_STAGES = (
+    ("type", same_type),
+    ("exact", same_parameters),
+    ("cache", same_generator_cache),
+)
+
+def reset_stage_stats():
+    stage_stats.clear()
+    for stage in COMPARISON_STAGES:
+        stage_stats[stage] = [0, 0, 0.0]  # checked, rejected, seconds
+
+def run_stage(stage, test, op1, op2):
+    start = time.perf_counter()
+    passed = test(op1, op2)
+    entry = stage_stats.setdefault(stage, [0, 0, 0.0])
+    entry[0] += 1
+    entry[2] += time.perf_counter() - start
+    if not passed:
+        entry[1] += 1
+    return passed
+
+def print_stage_stats():
+    print("Duplicate comparison stages (checked / rejected / ms):")
+    for stage in COMPARISON_STAGES:
+        checked, rejected, seconds = stage_stats.get(stage, (0, 0, 0.0))
+        print("  {:<8}{:>10}{:>10}{:>12.2f}".format(stage, checked, rejected, seconds * 1000.0))
+
+# ----------------------------------------------------------------------
+# Overall comparison of two objects: run the stages in order and stop at
+# the first one that rejects the pair.
+def objects_are_identical(op1, op2):
+    if not op1 or not op2:
+        return False
+    if op1.CheckType(c4d.Opolygon):
+        stages = POLYGON_STAGES
+    elif op1.CheckType(c4d.Ospline):
+        stages = SPLINE_STAGES
+    elif is_procedural(op1):
+        stages = GENERATOR_STAGES
+    else:
+        stages = PARAMETER_STAGES
+    for stage, test in stages:
+        if not run_stage(stage, test, op1, op2):
             return False
-        return set(op1.GetAllPoints()) == set(op2.GetAllPoints())
-    if op1.GetType() in (c4d.Olight, c4d.Orslight):
-        if op1.GetType() == c4d.Orslight:
-            return rs_lights_equal(op1, op2)
+    return True
+
+# ----------------------------------------------------------------------
+# Reduce a container value to something hashable. Values that can't be
+# hashed reliably only contribute their type name, so two equal containers
+# always end up with the same signature.
+HASHABLE_TYPES = (bool, int, float, str, c4d.Vector)
+
+def hashable_value(value):
+    if value is None or isinstance(value, HASHABLE_TYPES):
+        return value
+    return type(value).__name__
+
+# ----------------------------------------------------------------------
+# Hash the plain values of a BaseContainer (primitives, RS lights).
+def container_hash(bc):
+    if bc is None:
+        return None
+    try:
+        items = [(pid, hashable_value(value)) for pid, value in bc]
+    except Exception:
+        # Some data types can't be read from Python; fall back to a coarse bucket.
+        return None
+    items.sort(key=lambda item: item[0])
+    return hash(tuple(items))
+
+# ----------------------------------------------------------------------
+# Hash the key parameters of a standard light.
+def light_parameters_hash(light):
+    values = []
+    for pid in LIGHT_PARAMETERS.values():
+        try:
+            values.append(hashable_value(light[pid]))
+        except Exception:
+            values.append(None)
+    return hash(tuple(values))
+
+# ----------------------------------------------------------------------
+# Order-independent hash of the point set (matches points_equal).
+def points_hash(op):
+    key = get_point_set(op)
+    if np is not None:
+        return hash(key.tobytes())
+    return hash(key)
+
+# ----------------------------------------------------------------------
+# Hashable signature of a supported object. Identical objects always share
+# a signature, so only objects with the same signature need a full compare.
+def get_signature(op):
+    t = op.GetType()
+    if op.CheckType(c4d.Opolygon):
+        return (t, op.GetPolygonCount(), op.GetPointCount(), mesh_hash(op))
+    if op.CheckType(c4d.Ospline):
+        return (t, op[c4d.SPLINEOBJECT_TYPE], op.GetSegmentCount(),
+                op.GetPointCount(), points_hash(op))
+    if t == c4d.Olight:
+        return (t, light_parameters_hash(op))
+    if is_procedural(op):
+        return (t, container_hash(op.GetDataInstance()), generator_cache_hash(op))
+    return (t, container_hash(op.GetDataInstance()))
+
+# ----------------------------------------------------------------------
+# Bucket all supported objects by signature in a single pass.
+def build_signature_index(objs):
+    index = {}
+    for obj in objs:
+        if obj.CheckType(c4d.Oinstance) or not is_supported_type(obj):
+            continue
+        if is_generator_input(obj):
+            continue
+        index.setdefault(get_signature(obj), []).append(obj)
+    return index
+
+# ----------------------------------------------------------------------
+# Split one signature bucket into classes of identical objects.
+# Hash collisions are rare, so this is usually a single class.
+def split_bucket(bucket):
+    classes = []
+    for obj in bucket:
+        for cls in classes:
+            if objects_are_identical(cls[0], obj):
+                cls.append(obj)
+                break
         else:
-            return standard_lights_identical(op1, op2)
-    return op1.GetDataInstance() == op2.GetDataInstance()
+            classes.append([obj])
+    return classes
+
+# ----------------------------------------------------------------------
+# Find every class of identical objects among objs in one traversal.
+# Each class is a list in scene order.
+def find_duplicate_classes(objs):
+    classes = []
+    for bucket in build_signature_index(objs).values():
+        classes.extend(split_bucket(bucket))
+    return classes
 
 # ----------------------------------------------------------------------
 # Among selected objects, return only unique (canonical) masters.
 def get_canonical_masters(selected):
-    canonical = []
-    for obj in selected:
-        # Skip instance objects.
-        if obj.CheckType(c4d.Oinstance):
-            continue
-        duplicateFound = False
-        for canon in canonical:
-            if objects_are_identical(obj, canon):
-                duplicateFound = True
-                break
-        if not duplicateFound:
-            canonical.append(obj)
+    canonical = [cls[0] for cls in find_duplicate_classes(selected)]
+    order = {obj: i for i, obj in enumerate(selected)}
+    canonical.sort(key=lambda obj: order[obj])
     return canonical
 
 # ----------------------------------------------------------------------
 # Follow instance links to retrieve the underlying master object.
 def get_master_object(obj):
-    while obj and is_supported_type(obj):
-        if obj.CheckType(c4d.Oinstance):
-            obj = obj[c4d.INSTANCEOBJECT_LINK]
-        else:
-            break
+    seen = set()
+    while obj and obj.CheckType(c4d.Oinstance) and obj not in seen:
+        seen.add(obj)
+        obj = obj[c4d.INSTANCEOBJECT_LINK]
     return obj
 
 # ----------------------------------------------------------------------
-# Transfer children from an object to a new parent.
+# Map every real master to the instances that resolve to it, so relinking
+# only touches instances of the objects being replaced.
+def build_instance_index(all_objs):
+    index = {}
+    for obj in all_objs:
+        if obj.CheckType(c4d.Oinstance):
+            real = get_master_object(obj[c4d.INSTANCEOBJECT_LINK])
+            if real:
+                index.setdefault(real, []).append(obj)
+    return index
+
+# ----------------------------------------------------------------------
+# Transfer children from an object to a new parent. Generator inputs stay
+# behind and are deleted with their generator.
 def transfer_children(doc, old_obj, new_parent):
     child = old_obj.GetDown()
     while child:
         next_child = child.GetNext()
+        if child.GetBit(c4d.BIT_CONTROLOBJECT):
+            child = next_child
+            continue
         doc.AddUndo(c4d.UNDOTYPE_CHANGE, child)
         world_mtx = child.GetMg()
         child.Remove()
@@ -157,60 +647,230 @@ def transfer_children(doc, old_obj, new_parent):
         child = next_child
 
 # ----------------------------------------------------------------------
-# Update instance objects that reference a duplicate (or master).
-def relink_instances(doc, all_objs, master, dup_obj=None):
-    for obj in all_objs:
-        if obj.CheckType(c4d.Oinstance):
-            ref = obj[c4d.INSTANCEOBJECT_LINK]
-            real = get_master_object(ref)
-            if dup_obj:
-                if real == dup_obj:
-                    doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
-                    obj[c4d.INSTANCEOBJECT_LINK] = master
-                    obj.SetName(master.GetName() + "_instance")
-            else:
-                if real and objects_are_identical(master, real):
-                    doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
-                    obj[c4d.INSTANCEOBJECT_LINK] = master
-                    obj.SetName(master.GetName() + "_instance")
+# Point the instances of the given targets at master and move them to
+# master's entry in the instance index.
+def relink_instances(doc, instance_index, master, targets):
+    moved = []
+    for target in targets:
+        moved.extend(instance_index.pop(target, ()))
+    # Instances inside a replaced assembly were deleted with it.
+    moved = [obj for obj in moved if obj.GetDocument() is not None]
+    for obj in moved:
+        doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
+        obj[c4d.INSTANCEOBJECT_LINK] = master
+        obj.SetName(master.GetName() + "_instance")
+    instance_index.setdefault(master, []).extend(moved)
+
+# ----------------------------------------------------------------------
+# Relink every instance whose master belongs to a canonical master's class.
+def relink_to_canonical(doc, instance_index, canonical, class_of):
+    for master in canonical:
+        relink_instances(doc, instance_index, master, class_of.get(master, ()))
+
+# ----------------------------------------------------------------------
+# Replace obj with an instance of master at the same place. Instances of obj
+# are relinked to master; children are moved under the new instance unless
+# keep_children is False (they are deleted with obj).
+def replace_with_instance(doc, instance_index, master, obj, keep_children=True):
+    parent = obj.GetUp()
+    world_mtx = obj.GetMg()
+    local_mtx = ~parent.GetMg() * world_mtx if parent else world_mtx
+
+    relink_instances(doc, instance_index, master, (obj,))
+
+    instance = c4d.BaseObject(c4d.Oinstance)
+    instance[c4d.INSTANCEOBJECT_LINK] = master
+    instance.SetName(master.GetName() + "_instance")
+    instance.SetMl(local_mtx)
+    doc.InsertObject(instance, parent=parent, pred=obj)
+    instance_index[master].append(instance)
+
+    if keep_children:
+        transfer_children(doc, obj, instance)
+
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Ttexture):
+            instance.InsertTag(tag.GetClone())
+        tag = tag.GetNext()
+
+    doc.AddUndo(c4d.UNDOTYPE_NEW, instance)
+    doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
+    obj.Remove()
 
 # ----------------------------------------------------------------------
 # Replace duplicates in the scene with an instance of the canonical master.
-def replace_duplicates_with_canonical(doc, all_objs, canonical):
+# class_of maps every supported scene object to its duplicate class, so each
+# master only visits its own duplicates.
+def replace_duplicates_with_canonical(doc, instance_index, canonical, class_of):
     total_replacements = 0
     canonical_set = set(canonical)
     for master in canonical:
-        for obj in list(all_objs):
+        for obj in class_of.get(master, ()):
             # Skip if object is one of the canonical masters.
             if obj in canonical_set:
                 continue
-            if is_supported_type(obj) and objects_are_identical(master, obj):
-                parent = obj.GetUp()
-                world_mtx = obj.GetMg()
-                local_mtx = ~parent.GetMg() * world_mtx if parent else world_mtx
-
-                relink_instances(doc, all_objs, master, dup_obj=obj)
-
-                instance = c4d.BaseObject(c4d.Oinstance)
-                instance[c4d.INSTANCEOBJECT_LINK] = master
-                instance.SetName(master.GetName() + "_instance")
-                instance.SetMl(local_mtx)
-                doc.InsertObject(instance, parent=parent, pred=obj)
-
-                transfer_children(doc, obj, instance)
-
-                tag = obj.GetFirstTag()
-                while tag:
-                    if tag.CheckType(c4d.Ttexture):
-                        instance.InsertTag(tag.GetClone())
-                    tag = tag.GetNext()
-
-                doc.AddUndo(c4d.UNDOTYPE_NEW, instance)
-                doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
-                obj.Remove()
-                total_replacements += 1
+            replace_with_instance(doc, instance_index, master, obj)
+            total_replacements += 1
     return total_replacements
 
+# ----------------------------------------------------------------------
+# Merkle hashes of whole sub-hierarchies. An object's subtree hash combines
+# its own signature with the subtree hash, local matrix, tags and visibility
+# of each child, so repeated assemblies (a null holding screws, a housing and
+# a gasket) are found as units. The root's own placement and texture tags
+# are left out, as for single objects.
+def node_signature(op):
+    if op.CheckType(c4d.Oinstance):
+        real = get_master_object(op[c4d.INSTANCEOBJECT_LINK])
+        target = get_signature(real) if is_supported_type(real) else id(real)
+        return (op.GetType(), container_hash(op.GetDataInstance()), target)
+    if is_supported_type(op):
+        return get_signature(op)
+    return (op.GetType(), container_hash(op.GetDataInstance()))
+
+def tags_key(op):
+    key = []
+    tag = op.GetFirstTag()
+    while tag:
+        material = tag[c4d.TEXTURETAG_MATERIAL] if tag.CheckType(c4d.Ttexture) else None
+        key.append((tag.GetType(), container_hash(tag.GetDataInstance()),
+                    id(material) if material else None))
+        tag = tag.GetNext()
+    return tuple(key)
+
+# ----------------------------------------------------------------------
+# (key, child) for every child of op, sorted by key so child order doesn't
+# matter. Identical subtrees list their children in corresponding order.
+def child_entries(op, hashes):
+    entries = []
+    child = op.GetDown()
+    while child:
+        modes = (child.GetEditorMode(), child.GetRenderMode(), child.GetDeformMode())
+        key = repr((hashes[child], matrix_bytes(child.GetMl()), tags_key(child), modes))
+        entries.append((key, child))
+        child = child.GetNext()
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+# ----------------------------------------------------------------------
+# True if a signature or tags key holds a None hash anywhere (a mesh, cache
+# or container that couldn't be read).
+def has_missing_hash(key):
+    if key is None:
+        return True
+    if isinstance(key, tuple):
+        return any(has_missing_hash(item) for item in key)
+    return False
+
+# ----------------------------------------------------------------------
+# Subtree hash of every object. all_objs is in depth-first order, so walking
+# it backwards visits children before their parents. An object whose own
+# signature or tags couldn't be hashed gets a hash of its own, so neither it
+# nor any assembly holding it ever matches another one.
+def compute_subtree_hashes(all_objs):
+    hashes = {}
+    for op in reversed(all_objs):
+        signature = node_signature(op)
+        if has_missing_hash(signature) or has_missing_hash(tags_key(op)):
+            hashes[op] = "unique:%d" % id(op)
+            continue
+        children = [key for key, _ in child_entries(op, hashes)]
+        data = repr((signature, children)).encode("utf-8")
+        hashes[op] = hashlib.md5(data).hexdigest()
+    return hashes
+
+# ----------------------------------------------------------------------
+# Pairs of corresponding objects in two identical subtrees.
+def corresponding_nodes(master, dup, hashes):
+    pairs = [(master, dup)]
+    for m, d in pairs:
+        for (_, m_child), (_, d_child) in zip(child_entries(m, hashes), child_entries(d, hashes)):
+            pairs.append((m_child, d_child))
+    return pairs
+
+# ----------------------------------------------------------------------
+# The subtree hashes are lossy (containers reduce some values to a type
+# name, lights only hash some parameters), so matching subtrees are
+# confirmed object by object before one is replaced: every pair of
+# corresponding objects must be identical, and below the root their tags
+# must match exactly as well.
+def tags_identical(op1, op2):
+    tag1, tag2 = op1.GetFirstTag(), op2.GetFirstTag()
+    while tag1 and tag2:
+        if tag1.GetType() != tag2.GetType():
+            return False
+        if tag1.GetDataInstance() != tag2.GetDataInstance():
+            return False
+        tag1, tag2 = tag1.GetNext(), tag2.GetNext()
+    return tag1 is None and tag2 is None
+
+# Objects that aren't supported on their own (nulls, instances) are
+# compared by their parameters.
+def nodes_identical(op1, op2):
+    if is_supported_type(op1) and not op1.CheckType(c4d.Oinstance):
+        return objects_are_identical(op1, op2)
+    return same_type(op1, op2) and op1.GetDataInstance() == op2.GetDataInstance()
+
+def subtrees_identical(master, dup, hashes):
+    pairs = corresponding_nodes(master, dup, hashes)
+    if not nodes_identical(master, dup):
+        return False
+    return all(nodes_identical(m, d) and tags_identical(m, d) for m, d in pairs[1:])
+
+# ----------------------------------------------------------------------
+# Replace repeated assemblies (objects with children) by instances of the
+# first one in scene order. With roots given, only assemblies identical to
+# one of them are replaced and the roots are the masters. Instances of any
+# object inside a replaced assembly are relinked to the matching object in
+# the master. Returns the number of assemblies replaced.
+# Parents come before their children in all_objs, so outer assemblies are
+# handled first. Nothing inside a master or a replaced copy is replaced:
+# masters must keep the subtrees their hashes were computed from.
+def replace_duplicate_assemblies(doc, all_objs, instance_index, roots=None):
+    hashes = compute_subtree_hashes(all_objs)
+    groups = {}
+    for op in all_objs:
+        if op.GetDown() and not is_generator_input(op):
+            groups.setdefault(hashes[op], []).append(op)
+
+    masters = {}
+    if roots is None:
+        wanted = {h for h, group in groups.items() if len(group) > 1}
+    else:
+        for root in roots:
+            if root.GetDown():
+                masters.setdefault(hashes[root], root)
+        wanted = set(masters)
+    master_set = set(masters.values())
+    protected = set()
+    for master in master_set:
+        protected.update(get_subtree(master))
+
+    removed = set()
+    replaced = 0
+    for op in all_objs:
+        h = hashes[op]
+        if op in removed or h not in wanted or not op.GetDown() or is_generator_input(op):
+            continue
+        master = masters.setdefault(h, op)
+        if master is op:
+            protected.update(get_subtree(op))
+            continue
+        if op in protected:
+            continue
+        inner = get_all_objects(op.GetDown())
+        if master_set.intersection(inner):
+            continue
+        if not subtrees_identical(master, op, hashes):
+            continue
+        for m, d in corresponding_nodes(master, op, hashes)[1:]:
+            relink_instances(doc, instance_index, m, (d,))
+        replace_with_instance(doc, instance_index, master, op, keep_children=False)
+        removed.update(inner)
+        replaced += 1
+    return replaced
+
 # ----------------------------------------------------------------------
 # Main function.
 def main():
@@ -218,43 +878,75 @@ def main():
     if not doc:
         gui.MessageDialog("No active document found.")
         return
+    point_cache.clear()
+    moment_cache.clear()
+    hash_cache.clear()
+    mesh_cache.clear()
+    generator_cache.clear()
+    reset_stage_stats()
 
-    # Step 1: Get selected supported objects.
+    # Step 1: Get selected supported objects. With nothing selected, offer to
+    # dedupe the entire scene instead.
     selection = doc.GetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_NONE)
-    if not selection:
-        gui.MessageDialog("Please select polygon, spline, primitive, or light objects.")
-        return
+    whole_scene = not selection
+    if whole_scene:
+        if not gui.QuestionDialog("Nothing is selected.\n"
+                                  "Convert duplicates in the entire scene?"):
+            return
+    else:
+        # Filter out only supported objects and groups.
+        masters = [obj for obj in selection if is_supported_type(obj)]
+        groups = [obj for obj in selection if obj.GetDown()]
+        if not masters and not groups:
+            gui.MessageDialog("No supported objects found in selection.")
+            return
 
-    # Filter out only supported objects.
-    masters = [obj for obj in selection if is_supported_type(obj)]
-    if not masters:
-        gui.MessageDialog("No supported objects found in selection.")
-        return
+    # Step 2: Gather all objects in the scene and replace repeated
+    # assemblies as a whole first.
+    all_objs = get_all_objects(doc.GetFirstObject())
+    doc.StartUndo()
+    instance_index = build_instance_index(all_objs)
+    total_assemblies = replace_duplicate_assemblies(
+        doc, all_objs, instance_index, None if whole_scene else groups)
+    if total_assemblies:
+        all_objs = get_all_objects(doc.GetFirstObject())
+        if not whole_scene:
+            masters = [obj for obj in masters if obj.GetDocument() is not None]
 
-    # Step 2: Among the selected objects, get only canonical masters.
-    canonical = get_canonical_masters(masters)
-    # Optionally update active selection to canonical masters.
-    try:
-        doc.SetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_NONE, canonical)
-    except Exception:
-        pass
+    # Step 3: Group the remaining objects into duplicate classes in a single pass.
+    classes = find_duplicate_classes(all_objs)
+    class_of = {}
+    for cls in classes:
+        for obj in cls:
+            class_of[obj] = cls
 
-    # Step 3: Gather all objects in the scene.
-    all_objs = []
-    get_all_objects(doc.GetFirstObject(), all_objs)
+    # Step 4: Pick the canonical masters.
+    if whole_scene:
+        # Every class with duplicates keeps its first object in scene order.
+        canonical = [cls[0] for cls in classes if len(cls) > 1]
+    else:
+        # Among the selected objects, get only canonical masters.
+        canonical = get_canonical_masters(masters)
+        # Optionally update active selection to canonical masters.
+        if canonical:
+            try:
+                doc.SetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_NONE, canonical)
+            except Exception:
+                pass
 
-    doc.StartUndo()
-    # Step 4: Relink existing instances (points from any duplicate to canonical master).
-    for master in canonical:
-        relink_instances(doc, all_objs, master)
+    # Step 5: Relink existing instances (points from any duplicate to canonical master).
+    relink_to_canonical(doc, instance_index, canonical, class_of)
 
-    # Step 5: Replace duplicates (non-canonical) in the entire scene with instances of canonical masters.
-    total_replacements = replace_duplicates_with_canonical(doc, all_objs, canonical)
+    # Step 6: Replace duplicates (non-canonical) in the entire scene with instances of canonical masters.
+    total_replacements = replace_duplicates_with_canonical(doc, instance_index, canonical, class_of)
     doc.EndUndo()
     c4d.EventAdd()
+    print_stage_stats()
+    if total_assemblies:
+        print("Replaced {} duplicate assemblies.".format(total_assemblies))
 
-    # Step 6: If no duplicates were found, show a dialog.
-    if total_replacements == 0:
+    # Step 7: If no duplicates were found, show a dialog.
+    if total_replacements == 0 and total_assemblies == 0:
         gui.MessageDialog("No duplicates found.")
 
 if __name__ == "__main__":
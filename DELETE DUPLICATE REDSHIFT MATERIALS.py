@@ -6,25 +6,161 @@ import c4d.gui
 import maxon
 import json
 import hashlib
+import itertools
+import math
 import os
+import sys
+import time
+
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects, iter_tags
 
 RED_SHIFT_NODESPACE = "com.redshift3d.redshift4c4d.class.nodespace"
 
-# Any port whose normalized value is in this set will be ignored entirely
-IGNORE_PORT_VALUES = {
-    "None",
-    "0.0000",
-    "net.maxon.interface.layerset-C",
-    "net.maxon.datatype.timevalue",
-    "N/A"
-}
+# Default value of every input port, keyed by (asset ID, port path). Filled
+# lazily and shared by all materials, so each node type is queried only once.
+port_default_cache = {}
+
+# Texture content hashes, keyed by absolute file path. Each entry is
+# [size, mtime, sha256], so a file is only read again after it changes.
+# The table is kept in TEXTURE_CACHE_FILE between runs.
+TEXTURE_CACHE_FILE = os.path.join(c4d.storage.GeGetC4DPath(c4d.C4D_PATH_PREFS),
+                                  "redshift_texture_hashes.json")
+texture_hash_cache = None
+texture_cache_dirty = False
+
+# Folders searched for textures with relative paths (document folder and
+# its "tex" folder), set per document.
+texture_search_dirs = []
+
+# Texture identity of every reference string seen in this run, shared by all
+# materials, so a texture used by many materials is resolved only once.
+texture_identity_cache = {}
+
+# Optional: point every texture reference to one canonical path per image
+# content (the first path found), so each image is loaded only once.
+REWRITE_TEXTURE_PATHS = False
+
+# Optional: also merge near-duplicates, i.e. materials with the same nodes and
+# wiring whose colours and values differ by at most a tolerance. The script
+# asks for the tolerances and previews the clusters before merging.
+CLUSTER_NEAR_DUPLICATES = False
+
+# Number of vector components used as spatial index keys when clustering.
+# Components with the largest spread are picked; the rest are only checked
+# when comparing candidates.
+CLUSTER_INDEX_DIMENSIONS = 3
+
+def load_texture_cache():
+    """Loads the on-disk texture hash table once per run."""
+    global texture_hash_cache
+    if texture_hash_cache is None:
+        try:
+            with open(TEXTURE_CACHE_FILE, "r", encoding="utf-8") as f:
+                texture_hash_cache = json.load(f)
+        except (OSError, ValueError):
+            texture_hash_cache = {}
+    return texture_hash_cache
+
+def save_texture_cache():
+    """Writes the texture hash table back if new files were hashed."""
+    global texture_cache_dirty
+    if not texture_cache_dirty:
+        return
+    try:
+        with open(TEXTURE_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(texture_hash_cache, f)
+        texture_cache_dirty = False
+    except OSError as e:
+        print(f"Could not save texture hashes: {e}")
+
+def prepare_texture_index(doc):
+    """
+    Sets the folders used to resolve the document's relative texture paths
+    and forgets the texture identities of the previous run.
+    """
+    doc_path = doc.GetDocumentPath()
+    texture_search_dirs[:] = [doc_path, os.path.join(doc_path, "tex")] if doc_path else []
+    texture_identity_cache.clear()
+
+def url_to_path(url_str):
+    """
+    Returns the local file path of a texture URL or plain path, or None for
+    URLs that don't point to the file system (assets, memory).
+    """
+    if "://" in url_str:
+        scheme, rest = url_str.split("://", 1)
+        if scheme != "file":
+            return None
+        url_str = rest
+        # file:///C:/... on Windows
+        if len(url_str) > 2 and url_str[0] == "/" and url_str[2] == ":":
+            url_str = url_str[1:]
+    if os.path.isabs(url_str):
+        return url_str if os.path.isfile(url_str) else None
+    for folder in texture_search_dirs:
+        candidate = os.path.join(folder, url_str)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def texture_content_hash(path):
+    """
+    Returns the SHA256 of the file's contents, read only when the file's
+    size or mtime differ from the cached entry.
+    """
+    global texture_cache_dirty
+    cache = load_texture_cache()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    entry = cache.get(path)
+    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+        return entry[2]
+
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    cache[path] = [stat.st_size, stat.st_mtime, digest.hexdigest()]
+    texture_cache_dirty = True
+    return cache[path][2]
+
+def texture_identity(url_str):
+    """
+    Identifies a texture by its file contents, so the same image under two
+    paths matches and different images with the same name don't. Falls back
+    to the basename for files that can't be found. Memoized per run.
+    """
+    identity = texture_identity_cache.get(url_str)
+    if identity is not None:
+        return identity
+    path = url_to_path(url_str)
+    content = texture_content_hash(path) if path else None
+    if content:
+        identity = "texture:" + content
+    elif "://" in url_str:
+        identity = os.path.basename(url_str.split("://", 1)[1])
+    else:
+        identity = os.path.basename(url_str)
+    texture_identity_cache[url_str] = identity
+    return identity
 
 def normalize_value(value):
     """
     - Floats → rounded to 4 decimals
     - ColorA → formatted
-    - maxon.Url → reduced to basename via ToString()
-    - str with '://' → reduced to basename
+    - maxon.Url → texture content hash (basename if the file is missing)
+    - str with '://' → texture content hash (basename if the file is missing)
+    - str naming an existing file (absolute, or relative to the document and
+      texture folders) → texture content hash
     - None → "None"
     """
     if value is None:
@@ -32,14 +168,14 @@ def normalize_value(value):
 
     # 1) handle Url objects
     if isinstance(value, maxon.Url):
-        url_str = value.ToString()
-        if "://" in url_str:
-            url_str = url_str.split("://", 1)[1]
-        return os.path.basename(url_str)
+        return texture_identity(value.ToString())
 
-    # 2) handle string URLs
-    if isinstance(value, str) and "://" in value:
-        return os.path.basename(value.split("://", 1)[1])
+    # 2) handle string URLs and plain file paths
+    if isinstance(value, str):
+        if "://" in value:
+            return texture_identity(value)
+        if value in texture_identity_cache or (os.path.splitext(value)[1] and url_to_path(value)):
+            return texture_identity(value)
 
     # 3) handle floats
     try:
@@ -55,33 +191,133 @@ def normalize_value(value):
     # 5) fallback
     return str(value)
 
-def collect_ports(port_node, out_dict, prefix=""):
+def numeric_value(value):
+    """
+    Splits a numeric port value into (channel, components): floats are
+    "value" channels, colours "color" channels and vectors "value" channels.
+    Returns None for anything else (ints and bools are treated as modes).
+    """
+    if isinstance(value, (bool, int)):
+        return None
+    if isinstance(value, float):
+        return "value", (value,)
+    if all(hasattr(value, c) for c in ("r", "g", "b")):
+        comps = (value.r, value.g, value.b) + ((value.a,) if hasattr(value, "a") else ())
+        return "color", tuple(float(c) for c in comps)
+    if all(hasattr(value, c) for c in ("x", "y", "z")):
+        return "value", (float(value.x), float(value.y), float(value.z))
+    return None
+
+def get_port_default(asset_id, path, port):
+    """
+    Returns the normalized default value of a port, looked up once per
+    asset ID and port path.
+    """
+    key = (asset_id, path)
+    if key not in port_default_cache:
+        try:
+            default = normalize_value(port.GetDefaultValue())
+        except Exception:
+            default = None
+        port_default_cache[key] = default
+    return port_default_cache[key]
+
+def get_upstream_ports(port):
+    """Returns the output ports wired into the given input port."""
+    try:
+        return [conn[0] for conn in port.GetConnections(maxon.PORT_DIR.INPUT)]
+    except Exception:
+        return []
+
+def collect_ports(port_node, node_data, asset_id, memo, prefix=""):
     """
-    Recursively walks a GraphNode (input bundle or port) and records
-    each leaf-port's ID path and normalized effectivevalue.
+    Recursively walks a GraphNode (input bundle or port). Wired ports record
+    the hashes of their upstream nodes and output ports in node_data["inputs"];
+    unwired leaf ports record their normalized effectivevalue in
+    node_data["ports"], unless it is unset or equal to the port's default.
     """
+    path = prefix + str(port_node.GetId())
+    upstream = get_upstream_ports(port_node)
+    if upstream:
+        sources = []
+        for src_port in upstream:
+            src_node = src_port.GetAncestor(maxon.NODE_KIND.NODE)
+            src_data = get_node_data(src_node, memo)
+            src_data["outputs"].append((node_data["key"], path, str(src_port.GetId())))
+            sources.append((src_data["hash"] + ":" + str(src_port.GetId()),
+                            src_data["shape"] + ":" + str(src_port.GetId())))
+        node_data["inputs"][path] = sorted(src for src, _ in sources)
+        node_data["shape_inputs"][path] = sorted(shape for _, shape in sources)
+        return
+
     children = port_node.GetChildren()
     if not children:
         try:
             val = port_node.GetValue("effectivevalue")
         except Exception:
             val = None
+        if val is None:
+            return
+        number = numeric_value(val)
+        if number is not None:
+            node_data["numbers"][path] = number
         nv = normalize_value(val)
-        # only record ports whose value is not in the ignore list
-        if nv not in IGNORE_PORT_VALUES:
-            out_dict[prefix + str(port_node.GetId())] = nv
+        if nv != get_port_default(asset_id, path, port_node):
+            node_data["ports"][path] = nv
     else:
         for child in children:
-            collect_ports(child, out_dict, prefix + str(port_node.GetId()) + ">")
+            collect_ports(child, node_data, asset_id, memo, path + ">")
 
-def get_normalized_material_data(material):
+def get_node_data(node, memo):
     """
-    Collects node data from the material in a normalized dictionary.
-    Each node dictionary contains:
+    Collects one node's normalized data and its Merkle hash, which folds in
+    the hashes of all upstream nodes, so equal nodes wired differently hash
+    differently. memo maps node paths to their data, so every node of a graph
+    is hashed once even when it feeds several others.
+    The node dictionary contains:
       - "asset_id": the node's asset ID
-      - "ports": a dictionary mapping each leaf-port's identifier (using its ID path)
-         to its normalized effective value (filtered to ignore defaults).
-    The list of nodes is sorted by asset_id, and each node's ports dictionary is also sorted.
+      - "ports": leaf-port ID path -> normalized value (defaults left out)
+      - "inputs": wired port ID path -> sorted upstream "hash:port" strings
+      - "hash": SHA256 of the above
+      - "numbers": leaf-port ID path -> (channel, components) of every unwired
+         numeric port, defaults included
+      - "shape": SHA256 of the node without its numeric values, folding in
+         the shapes of upstream nodes (used for near-duplicate clustering)
+      - "key": the node's path in the graph
+      - "outputs": (consumer key, wired port path, output port ID) for every
+         port this node feeds, filled in as its consumers are collected
+    """
+    key = str(node.GetPath())
+    node_data = memo.get(key)
+    if node_data is not None:
+        return node_data
+
+    asset_id_list = node.GetValue("net.maxon.node.attribute.assetid")
+    asset_id = str(asset_id_list[0]) if asset_id_list else ""
+    node_data = {"asset_id": asset_id, "ports": {}, "inputs": {},
+                 "numbers": {}, "shape_inputs": {}, "key": key, "outputs": []}
+    memo[key] = node_data
+
+    inputs = node.GetInputs()
+    if inputs:
+        collect_ports(inputs, node_data, asset_id, memo)
+
+    # sort the port dictionaries for determinism
+    node_data["ports"] = dict(sorted(node_data["ports"].items()))
+    node_data["inputs"] = dict(sorted(node_data["inputs"].items()))
+    payload = json.dumps([asset_id, node_data["ports"], node_data["inputs"]])
+    node_data["hash"] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    shape_ports = dict((k, v) for k, v in node_data["ports"].items() if k not in node_data["numbers"])
+    payload = json.dumps([asset_id, shape_ports, sorted(node_data["numbers"]),
+                          sorted(node_data["shape_inputs"].items())])
+    node_data["shape"] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return node_data
+
+def get_normalized_material_data(material):
+    """
+    Collects the normalized data of every node in the material's Redshift
+    graph (see get_node_data), sorted by node hash.
     """
     nodeMat = material.GetNodeMaterialReference()
     if not nodeMat or not nodeMat.HasSpace(RED_SHIFT_NODESPACE):
@@ -92,122 +328,366 @@ def get_normalized_material_data(material):
         return None
 
     root = graph.GetViewRoot()
+    memo = {}
     nodes = []
 
     for node in root.GetInnerNodes(mask=maxon.NODE_KIND.NODE, includeThis=False):
-        asset_id_list = node.GetValue("net.maxon.node.attribute.assetid")
-        if not asset_id_list:
+        if not node.GetValue("net.maxon.node.attribute.assetid"):
             continue
+        nodes.append(get_node_data(node, memo))
 
-        node_data = {
-            "asset_id": str(asset_id_list[0]),
-            "ports": {}
-        }
-
-        inputs = node.GetInputs()
-        if inputs:
-            collect_ports(inputs, node_data["ports"])
-
-        # sort the ports dictionary for determinism
-        node_data["ports"] = dict(sorted(node_data["ports"].items()))
-        nodes.append(node_data)
-
-    # sort the list of nodes by asset_id
-    return sorted(nodes, key=lambda n: n["asset_id"])
+    return sorted(nodes, key=lambda n: n["hash"])
 
 def get_normalized_material_signature(material):
     """
-    Generates a robust signature for the material by converting its normalized node data
-    to a JSON string (with sorted keys) and then hashing that string using SHA256.
-    Returns (signature_hash, nodes_json).
+    Generates the material's signature by hashing the sorted Merkle hashes of
+    its nodes with SHA256.
+    Returns (signature_hash, nodes).
     """
     nodes = get_normalized_material_data(material)
     if nodes is None:
         return None, None
 
-    nodes_json = json.dumps(nodes, sort_keys=True)
-    sig_hash = hashlib.sha256(nodes_json.encode('utf-8')).hexdigest()
-    return sig_hash, nodes_json
+    joined = ",".join(node["hash"] for node in nodes)
+    sig_hash = hashlib.sha256(joined.encode('utf-8')).hexdigest()
+    return sig_hash, nodes
 
-def get_all_objects(doc):
+def get_node_positions(nodes):
     """
-    Recursively yields all objects in the document.
+    Returns node key -> position hash. A node's position folds in its shape
+    and, for every port it feeds, the consumer's position and the port path,
+    so it names the node's place in the graph regardless of its values: a
+    value node wired into roughness never lines up with one wired into
+    metalness.
     """
-    obj = doc.GetFirstObject()
-    while obj:
-        yield obj
-        for child in get_all_children(obj):
-            yield child
-        obj = obj.GetNext()
+    by_key = dict((node["key"], node) for node in nodes)
+    positions = {}
+
+    def position(node):
+        key = node["key"]
+        if key not in positions:
+            positions[key] = ""  # guards against cycles
+            edges = sorted(position(by_key[consumer]) + ":" + path + ":" + output
+                           for consumer, path, output in node["outputs"]
+                           if consumer in by_key)
+            payload = json.dumps([node["shape"], edges])
+            positions[key] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return positions[key]
+
+    for node in nodes:
+        position(node)
+    return positions
 
-def get_all_children(obj):
+def get_material_embedding(material):
     """
-    Recursively yields all children of the given object.
+    Embeds the material as a numeric port vector for its graph topology.
+    Returns (shape_key, channels, values): materials with the same shape_key
+    share nodes, wiring and non-numeric settings, and their values vectors
+    line up component by component, keyed by each node's graph position and
+    port path; channels names the channel of each component. Returns None
+    for materials without a Redshift graph.
     """
-    child = obj.GetDown()
-    while child:
-        yield child
-        for sub in get_all_children(child):
-            yield sub
-        child = child.GetNext()
+    nodes = get_normalized_material_data(material)
+    if nodes is None:
+        return None
 
-def main():
-    doc = c4d.documents.GetActiveDocument()
-    if doc is None:
-        return
+    positions = get_node_positions(nodes)
+    nodes = sorted(nodes, key=lambda n: (positions[n["key"]], n["hash"]))
+    channels = []
+    values = []
+    for node in nodes:
+        for path in sorted(node["numbers"]):
+            channel, comps = node["numbers"][path]
+            channels.extend([channel] * len(comps))
+            values.extend(comps)
+    joined = ",".join(positions[node["key"]] for node in nodes)
+    shape_key = hashlib.sha256(joined.encode('utf-8')).hexdigest()
+    return shape_key, tuple(channels), values
 
-    # 1. Collect all Redshift node-based materials
-    all_mats = doc.GetMaterials()
-    redshift_mats = [
-        m for m in all_mats
-        if m.GetNodeMaterialReference() and m.GetNodeMaterialReference().HasSpace(RED_SHIFT_NODESPACE)
-    ]
+def cluster_materials(materials, color_tolerance, value_tolerance):
+    """
+    Groups materials whose graphs have the same shape and whose colour and
+    value components each differ by at most the channel's tolerance from
+    the cluster's first material (the representative).
+    Vectors are scaled by their tolerances, so a match lies within 1 in every
+    component. The few components with the largest spread are bucketed into
+    unit cells, and each material is only compared with representatives in
+    its own and neighbouring cells.
+    Returns a list of clusters (lists of materials, representative first)
+    with at least two members.
+    """
+    groups = {}
+    for mat in materials:
+        embedding = get_material_embedding(mat)
+        if embedding is None:
+            continue
+        shape_key, channels, values = embedding
+        groups.setdefault((shape_key, channels), []).append((mat, values))
 
-    # 2. Compute signatures and find duplicates
-    sig_map = {}
-    duplicates = []
-    for mat in redshift_mats:
-        sig, _ = get_normalized_material_signature(mat)
-        if sig in sig_map:
-            duplicates.append(mat)
-        else:
-            sig_map[sig] = mat
+    clusters = []
+    for (_, channels), members in groups.items():
+        tolerances = [max(color_tolerance if c == "color" else value_tolerance, 1e-9)
+                      for c in channels]
+        vectors = [[v / t for v, t in zip(values, tolerances)] for _, values in members]
+        spreads = [max(col) - min(col) for col in zip(*vectors)] if vectors[0] else []
+        dims = sorted(range(len(spreads)), key=lambda i: spreads[i], reverse=True)
+        dims = dims[:CLUSTER_INDEX_DIMENSIONS]
+        offsets = list(itertools.product((-1, 0, 1), repeat=len(dims)))
+
+        index = {}
+        representatives = []
+        for (mat, _), vec in zip(members, vectors):
+            key = tuple(math.floor(vec[i]) for i in dims)
+            found = None
+            for offset in offsets:
+                cell = tuple(k + o for k, o in zip(key, offset))
+                for rep in index.get(cell, ()):
+                    if all(abs(a - b) <= 1.0 for a, b in zip(vec, rep[1])):
+                        found = rep
+                        break
+                if found:
+                    break
+            if found:
+                found[2].append(mat)
+            else:
+                rep = (mat, vec, [mat])
+                index.setdefault(key, []).append(rep)
+                representatives.append(rep)
+        clusters.extend(rep[2] for rep in representatives if len(rep[2]) > 1)
+    return clusters
 
-    if not duplicates:
-        c4d.gui.MessageDialog("No duplicates found.")
+def describe_clusters(clusters, limit=20):
+    """Returns a preview listing each cluster's representative and size."""
+    clusters = sorted(clusters, key=len, reverse=True)
+    lines = [f"{cluster[0].GetName()}: {len(cluster)} materials" for cluster in clusters[:limit]]
+    if len(clusters) > limit:
+        lines.append(f"... and {len(clusters) - limit} more clusters")
+    return "\n".join(lines)
+
+def ask_tolerances():
+    """Asks for the colour and value tolerances. Returns a tuple or None."""
+    input_str = c4d.gui.InputDialog("Enter colour and value tolerances (e.g. 0.02, 0.05):",
+                                    "0.02, 0.05")
+    if not input_str:
+        return None
+    try:
+        color_tolerance, value_tolerance = (float(t) for t in input_str.split(","))
+    except ValueError:
+        c4d.gui.MessageDialog("Invalid tolerances.")
+        return None
+    return color_tolerance, value_tolerance
+
+def collect_texture_ports(port_node, out):
+    """
+    Recursively collects (port, value, path, content_hash) for every unwired
+    leaf port that holds a texture URL pointing to a readable file.
+    """
+    children = port_node.GetChildren()
+    if children:
+        for child in children:
+            collect_texture_ports(child, out)
+        return
+    if get_upstream_ports(port_node):
         return
+    try:
+        val = port_node.GetValue("effectivevalue")
+    except Exception:
+        return
+    if isinstance(val, maxon.Url):
+        url_str = val.ToString()
+    elif isinstance(val, str) and "://" in val:
+        url_str = val
+    else:
+        return
+    path = url_to_path(url_str)
+    content = texture_content_hash(path) if path else None
+    if content:
+        out.append((port_node, val, path, content))
+
+def rewrite_texture_paths(doc, materials):
+    """
+    Points every texture port to the first reference found for its image
+    content. The reference is copied as written (relative and project paths
+    stay as they are); resolved paths are only used to read and compare
+    files. Each material is changed in one graph transaction, all in one
+    undo step. Returns the number of ports rewritten.
+    """
+    prepare_texture_index(doc)
+    canonical = {}
+    changed = 0
+    doc.StartUndo()
+    try:
+        for mat in materials:
+            graph = mat.GetNodeMaterialReference().GetGraph(RED_SHIFT_NODESPACE)
+            if graph.IsNullValue():
+                continue
+            ports = []
+            root = graph.GetViewRoot()
+            for node in root.GetInnerNodes(mask=maxon.NODE_KIND.NODE, includeThis=False):
+                inputs = node.GetInputs()
+                if inputs:
+                    collect_texture_ports(inputs, ports)
+            updates = []
+            for port, val, path, content in ports:
+                url_str = val if isinstance(val, str) else val.ToString()
+                target_url, target_path = canonical.setdefault(content, (url_str, path))
+                if os.path.normcase(os.path.abspath(target_path)) != os.path.normcase(os.path.abspath(path)):
+                    updates.append((port, target_url if isinstance(val, str) else maxon.Url(target_url)))
+            if not updates:
+                continue
+            doc.AddUndo(c4d.UNDOTYPE_CHANGE, mat)
+            with graph.BeginTransaction() as transaction:
+                for port, new_value in updates:
+                    port.SetPortValue(new_value)
+                transaction.Commit()
+            changed += len(updates)
+    finally:
+        doc.EndUndo()
+        save_texture_cache()
+    return changed
 
-    print(f"Found {len(duplicates)} duplicate materials out of {len(redshift_mats)}.")
+def find_duplicate_materials(materials):
+    """
+    Computes each material's signature exactly once and maps every duplicate
+    to the first material with the same signature.
+    Returns a {duplicate: keeper} dict.
+    """
+    sig_map = {}
+    remap = {}
+    for mat in materials:
+        sig, _ = get_normalized_material_signature(mat)
+        if sig is None:
+            continue
+        keep = sig_map.setdefault(sig, mat)
+        if keep is not mat:
+            remap[mat] = keep
+    return remap
 
-    # 3. Remap texture tags on all objects
-    objs = list(get_all_objects(doc))
+def remap_texture_tags(doc, remap):
+    """
+    Points every texture tag that uses a duplicate material to its keeper.
+    Each tag costs a single dict lookup. Returns the number of tags changed.
+    """
+    objs = get_all_objects(doc.GetFirstObject())
     total = len(objs)
+    changed = 0
     for idx, obj in enumerate(objs):
-        tag = obj.GetFirstTag()
-        while tag:
-            if tag.CheckType(c4d.Ttexture):
-                cur = tag[c4d.TEXTURETAG_MATERIAL]
-                if cur in duplicates:
-                    sig, _ = get_normalized_material_signature(cur)
-                    keep = sig_map.get(sig)
-                    if keep:
-                        tag[c4d.TEXTURETAG_MATERIAL] = keep
-            tag = tag.GetNext()
+        for tag in iter_tags(obj, (c4d.Ttexture,)):
+            keep = remap.get(tag[c4d.TEXTURETAG_MATERIAL])
+            if keep:
+                doc.AddUndo(c4d.UNDOTYPE_CHANGE, tag)
+                tag[c4d.TEXTURETAG_MATERIAL] = keep
+                changed += 1
         pct = int((idx + 1) * 100.0 / total)
         c4d.StatusSetBar(pct)
         c4d.StatusSetText(f"Processing object {idx+1} of {total}")
     c4d.StatusClear()
-    c4d.EventAdd()
+    return changed
 
-    # 4. Delete duplicate materials via Material Manager
-    for mat in all_mats:
-        mat.DelBit(c4d.BIT_ACTIVE)
-    for dup in duplicates:
-        dup.SetBit(c4d.BIT_ACTIVE)
-    c4d.CallCommand(300001024)  # Delete selected materials
-    c4d.EventAdd()
+def delete_materials(doc, materials):
+    """
+    Removes the materials from the document through the API, with undo.
+    Returns the number of materials removed.
+    """
+    count = 0
+    for mat in materials:
+        doc.AddUndo(c4d.UNDOTYPE_DELETE, mat)
+        mat.Remove()
+        count += 1
+    return count
+
+def merge_materials(doc, remap):
+    """
+    Applies a {duplicate: keeper} remap as one undo step: texture tags are
+    pointed to the keepers, then the duplicates are deleted. Shows no dialogs,
+    so other tools can call it headlessly. Returns (tags_changed, deleted).
+    """
+    doc.StartUndo()
+    try:
+        start = time.time()
+        changed = remap_texture_tags(doc, remap)
+        print(f"Tag remap: {time.time() - start:.2f}s for {changed} tags")
+
+        start = time.time()
+        deleted = delete_materials(doc, remap)
+        print(f"Delete: {time.time() - start:.2f}s for {deleted} materials")
+    finally:
+        doc.EndUndo()
+    return changed, deleted
+
+def get_redshift_materials(doc):
+    """Returns all Redshift node-based materials of the document."""
+    return [
+        m for m in doc.GetMaterials()
+        if m.GetNodeMaterialReference() and m.GetNodeMaterialReference().HasSpace(RED_SHIFT_NODESPACE)
+    ]
+
+def dedupe_redshift_materials(doc):
+    """
+    Merges all Redshift materials with identical node graphs into the first
+    one. Returns the {duplicate: keeper} remap that was applied.
+    """
+    prepare_texture_index(doc)
+    redshift_mats = get_redshift_materials(doc)
+
+    start = time.time()
+    remap = find_duplicate_materials(redshift_mats)
+    save_texture_cache()
+    print(f"Signatures: {time.time() - start:.2f}s for {len(redshift_mats)} materials")
 
-    c4d.gui.MessageDialog(f"{len(duplicates)} duplicate materials have been removed.")
+    if remap:
+        print(f"Found {len(remap)} duplicate materials out of {len(redshift_mats)}.")
+        merge_materials(doc, remap)
+    return remap
+
+def merge_near_duplicates(doc):
+    """
+    Clusters near-duplicate materials, previews the clusters and merges each
+    into its representative. Returns the number of materials removed.
+    """
+    tolerances = ask_tolerances()
+    if tolerances is None:
+        return 0
+
+    prepare_texture_index(doc)
+    redshift_mats = get_redshift_materials(doc)
+    start = time.time()
+    clusters = cluster_materials(redshift_mats, *tolerances)
+    save_texture_cache()
+    print(f"Clustering: {time.time() - start:.2f}s for {len(redshift_mats)} materials")
+    if not clusters:
+        c4d.gui.MessageDialog("No near-duplicate materials found.")
+        return 0
+
+    preview = describe_clusters(clusters)
+    print(preview)
+    remap = dict((mat, cluster[0]) for cluster in clusters for mat in cluster[1:])
+    if not c4d.gui.QuestionDialog(f"Merge {len(remap) + len(clusters)} materials "
+                                  f"into {len(clusters)}?\n\n{preview}"):
+        return 0
+
+    merge_materials(doc, remap)
+    return len(remap)
+
+def main():
+    doc = c4d.documents.GetActiveDocument()
+    if doc is None:
+        return
+
+    if CLUSTER_NEAR_DUPLICATES:
+        removed = merge_near_duplicates(doc)
+        message = f"{removed} near-duplicate materials have been merged." if removed else ""
+    else:
+        remap = dedupe_redshift_materials(doc)
+        message = f"{len(remap)} duplicate materials have been removed." if remap else "No duplicates found."
+
+    if REWRITE_TEXTURE_PATHS:
+        rewritten = rewrite_texture_paths(doc, get_redshift_materials(doc))
+        message += f"\n{rewritten} texture references now share one path per image."
+
+    c4d.EventAdd()
+    if message:
+        c4d.gui.MessageDialog(message.strip())
 
 if __name__ == "__main__":
     main()
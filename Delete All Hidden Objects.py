@@ -1,35 +1,87 @@
 # Author: Chat GPT and Dani Zaitcev
 # Tested with Cinema 4D 2025.2 and Redshift 2025.4
 
+import os
+import sys
+import time
+
 import c4d
 from c4d import gui
 
-def get_all_objects(obj, obj_list):
-    """Recursively collects all objects in the scene."""
-    while obj:
-        obj_list.append(obj)
-        get_all_objects(obj.GetDown(), obj_list)
-        obj = obj.GetNext()
-
-def is_effectively_hidden(obj):
+# scene_traversal.py and cleanup_plan.py are shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from cleanup_plan import CleanupPlan, format_plan, measure_subtrees
+from scene_traversal import walk
+
+# Which visibility settings count as hidden. Objects (or their layers)
+# turned off in either enabled mode are deleted.
+CHECK_EDITOR_VISIBILITY = True
+CHECK_RENDER_VISIBILITY = True
+
+def is_layer_hidden(layer, doc, layer_cache):
+    """Returns True if the layer hides its objects in a checked mode."""
+    if layer is None:
+        return False
+    hidden = layer_cache.get(layer)
+    if hidden is None:
+        data = layer.GetLayerData(doc) or {}
+        hidden = ((CHECK_EDITOR_VISIBILITY and not data.get("view", True)) or
+                  (CHECK_RENDER_VISIBILITY and not data.get("render", True)))
+        layer_cache[layer] = hidden
+    return hidden
+
+def is_hidden(obj, doc, layer_cache):
     """
-    Returns True if the object itself or any of its parent objects
-    is hidden in the viewport or renderer.
+    Returns True if the object's own visibility flags or its layer hide it
+    in the viewport or renderer.
     """
-    if obj is None:
-        return False
-    if obj[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] == c4d.OBJECT_OFF or \
-       obj[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] == c4d.OBJECT_OFF:
+    if CHECK_EDITOR_VISIBILITY and obj[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] == c4d.OBJECT_OFF:
+        return True
+    if CHECK_RENDER_VISIBILITY and obj[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] == c4d.OBJECT_OFF:
         return True
-    parent = obj.GetUp()
-    while parent:
-        if parent[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] == c4d.OBJECT_OFF or \
-           parent[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] == c4d.OBJECT_OFF:
-            return True
-        parent = parent.GetUp()
-    return False
-
-def swap_hidden_referenced_instances(doc):
+    return is_layer_hidden(obj.GetLayerObject(doc), doc, layer_cache)
+
+def collect_hidden_objects(doc):
+    """
+    Walks the scene once, top-down, carrying an "effectively hidden" flag
+    from each parent to its children.
+    Returns (hidden_roots, hidden, visible_instances):
+      - hidden_roots: the topmost hidden objects; removing them removes
+        every hidden object
+      - hidden: the set of all effectively hidden objects
+      - visible_instances: the instance objects that stay in the scene
+    """
+    hidden_roots = []
+    hidden = set()
+    visible_instances = []
+    layer_cache = {}
+
+    # Parents are visited before their children, so the parent's flag is set.
+    for obj, parent, _ in walk(doc.GetFirstObject()):
+        parent_hidden = parent in hidden
+        if parent_hidden or is_hidden(obj, doc, layer_cache):
+            hidden.add(obj)
+            if not parent_hidden:
+                hidden_roots.append(obj)
+        elif obj.CheckType(c4d.Oinstance):
+            visible_instances.append(obj)
+    return hidden_roots, hidden, visible_instances
+
+def plan_hidden_objects(doc):
+    """
+    Analyses the scene without changing it. The plan removes the topmost
+    hidden objects; its instances are the visible instances of hidden masters,
+    which get a visible copy of their master.
+    """
+    hidden_roots, hidden, visible_instances = collect_hidden_objects(doc)
+    swaps = tuple(inst for inst in visible_instances
+                  if inst[c4d.INSTANCEOBJECT_LINK] in hidden)
+    objects, points, polygons = measure_subtrees(hidden_roots)
+    return CleanupPlan(tuple(hidden_roots), objects, points, polygons, swaps)
+
+def swap_hidden_referenced_instances(doc, instances):
     """
     For each visible instance whose referenced object (master) is hidden,
     the script finds the first such instance for each unique hidden master,
@@ -42,61 +94,53 @@ def swap_hidden_referenced_instances(doc):
     remains as the master.
     """
     swapped_refs = {}  # Maps original hidden master objects to their visible clone
-    all_objects = []
-    get_all_objects(doc.GetFirstObject(), all_objects)
-
-    for obj in all_objects:
-        if obj.CheckType(c4d.Oinstance):
-            ref = obj[c4d.INSTANCEOBJECT_LINK]
-            if ref and is_effectively_hidden(ref):
-                if ref not in swapped_refs:
-                    parent = obj.GetUp()
-                    instance_world = obj.GetMg()  # Get the instance's world matrix
-                    # Calculate new local matrix for the clone relative to parent's global matrix.
-                    if parent:
-                        new_local = ~parent.GetMg() * instance_world
-                    else:
-                        new_local = instance_world
-                    # Clone the hidden master.
-                    ref_clone = ref.GetClone()
-                    ref_clone.SetMl(new_local)
-                    # Insert the clone in the same hierarchy as the instance.
-                    doc.InsertObject(ref_clone, parent=parent, pred=obj)
-                    doc.AddUndo(c4d.UNDOTYPE_NEW, ref_clone)
-                    swapped_refs[ref] = ref_clone
-                    # Remove the first instance since its job is to swap.
-                    doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
-                    obj.Remove()
-                    continue  # Skip updating this instance since it was removed.
-                else:
-                    # For subsequent visible instances referencing the same hidden master,
-                    # update their link to point to the clone.
-                    new_ref = swapped_refs[ref]
-                    doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
-                    obj[c4d.INSTANCEOBJECT_LINK] = new_ref
 
-def delete_hidden_objects(doc):
+    for obj in instances:
+        ref = obj[c4d.INSTANCEOBJECT_LINK]
+        if ref:
+            if ref not in swapped_refs:
+                parent = obj.GetUp()
+                instance_world = obj.GetMg()  # Get the instance's world matrix
+                # Calculate new local matrix for the clone relative to parent's global matrix.
+                if parent:
+                    new_local = ~parent.GetMg() * instance_world
+                else:
+                    new_local = instance_world
+                # Clone the hidden master and make the clone itself visible.
+                ref_clone = ref.GetClone()
+                ref_clone.SetMl(new_local)
+                ref_clone[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] = c4d.OBJECT_UNDEF
+                ref_clone[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] = c4d.OBJECT_UNDEF
+                ref_clone.SetLayerObject(obj.GetLayerObject(doc))
+                # Insert the clone in the same hierarchy as the instance.
+                doc.InsertObject(ref_clone, parent=parent, pred=obj)
+                doc.AddUndo(c4d.UNDOTYPE_NEW, ref_clone)
+                swapped_refs[ref] = ref_clone
+                # Remove the first instance since its job is to swap.
+                doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
+                obj.Remove()
+            else:
+                # For subsequent visible instances referencing the same hidden master,
+                # update their link to point to the clone.
+                new_ref = swapped_refs[ref]
+                doc.AddUndo(c4d.UNDOTYPE_CHANGE, obj)
+                obj[c4d.INSTANCEOBJECT_LINK] = new_ref
+
+def delete_hidden_objects(doc, hidden_roots):
     """
-    Recursively collects and deletes all objects that are hidden in the viewport
-    or renderer.
+    Deletes the topmost hidden objects. Their hidden descendants go with
+    them, so each subtree costs a single undo entry.
     """
-    hidden_objects = []
-
-    def collect_hidden_objects(obj):
-        while obj:
-            if obj[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] == c4d.OBJECT_OFF or \
-               obj[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] == c4d.OBJECT_OFF:
-                hidden_objects.append(obj)
-            collect_hidden_objects(obj.GetDown())
-            obj = obj.GetNext()
-
-    collect_hidden_objects(doc.GetFirstObject())
-
-    for obj in hidden_objects:
+    for obj in hidden_roots:
         doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
         obj.Remove()
 
-    return len(hidden_objects)
+def apply_plan(doc, plan):
+    """Executes a plan from plan_hidden_objects as a single undo step."""
+    doc.StartUndo()
+    swap_hidden_referenced_instances(doc, plan.instances)
+    delete_hidden_objects(doc, plan.removals)
+    doc.EndUndo()
 
 def main():
     doc = c4d.documents.GetActiveDocument()
@@ -104,17 +148,24 @@ def main():
         gui.MessageDialog("No active document found.")
         return
 
-    if not gui.QuestionDialog("Are you sure you want to delete all hidden objects?"):
+    # Dry run: nothing is touched until the plan is confirmed.
+    start = time.time()
+    plan = plan_hidden_objects(doc)
+    print(f"Planned in {time.time() - start:.3f}s")
+    if not plan.removals:
+        gui.MessageDialog("No hidden objects found.")
         return
 
-    # Group all operations into a single undo step.
-    doc.StartUndo()
-    swap_hidden_referenced_instances(doc)
-    num_hidden = delete_hidden_objects(doc)
-    doc.EndUndo()
+    report = format_plan(plan)
+    if plan.instances:
+        report += f"\n{len(plan.instances)} visible instances of hidden masters will get a visible copy"
+    print(report)
+    if not gui.QuestionDialog(f"Delete all hidden objects?\n\n{report}"):
+        return
 
+    apply_plan(doc, plan)
     c4d.EventAdd()
-    gui.MessageDialog(f"Deleted {num_hidden} hidden objects.")
+    gui.MessageDialog(f"Deleted {plan.objects} hidden objects.")
 
 if __name__ == "__main__":
     main()
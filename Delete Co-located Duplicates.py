@@ -0,0 +1,374 @@
+import os
+import sys
+
+import c4d
+from c4d import gui
+
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects
+
+# Smallest grid cell, so a zero tolerance still produces a usable grid
+# (objects with identical bounding boxes share a cell).
+MIN_CELL_SIZE = 1e-6
+
+# Offsets of a cell and its 26 neighbours.
+NEIGHBOUR_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+# UV coordinates are compared after rounding to this many digits.
+UV_DIGITS = 5
+
+def get_master_object(obj):
+    """Follows instance links to the real master (None for broken links or cycles)."""
+    seen = set()
+    while obj and obj.CheckType(c4d.Oinstance) and obj not in seen:
+        seen.add(obj)
+        obj = obj[c4d.INSTANCEOBJECT_LINK]
+    if obj and obj.CheckType(c4d.Oinstance):
+        return None
+    return obj
+
+def is_generator_input(obj):
+    """Returns True if the object or one of its parents is used by a generator."""
+    while obj:
+        if obj.GetBit(c4d.BIT_CONTROLOBJECT):
+            return True
+        obj = obj.GetUp()
+    return False
+
+def is_ancestor(obj, child):
+    """Returns True if obj is a parent (at any depth) of child."""
+    parent = child.GetUp()
+    while parent:
+        if parent == obj:
+            return True
+        parent = parent.GetUp()
+    return False
+
+def shape_source(obj):
+    """
+    Returns the object whose geometry obj shows: the real master for
+    instances, the object itself for point objects, None for anything else.
+    """
+    if obj.CheckType(c4d.Oinstance):
+        return get_master_object(obj)
+    if obj.CheckType(c4d.Opoint):
+        return obj
+    return None
+
+def world_bounds(obj, source):
+    """
+    Returns (center, half_size) of the world-space bounding box of source's
+    geometry placed with obj's matrix.
+    """
+    mg = obj.GetMg()
+    rad = source.GetRad()
+    center = mg * source.GetMp()
+    half = c4d.Vector(abs(mg.v1.x) * rad.x + abs(mg.v2.x) * rad.y + abs(mg.v3.x) * rad.z,
+                      abs(mg.v1.y) * rad.x + abs(mg.v2.y) * rad.y + abs(mg.v3.y) * rad.z,
+                      abs(mg.v1.z) * rad.x + abs(mg.v2.z) * rad.y + abs(mg.v3.z) * rad.z)
+    return center, half
+
+def grid_key(p, cell):
+    """Returns the integer grid cell containing point p."""
+    return (int(p.x // cell), int(p.y // cell), int(p.z // cell))
+
+def similar_bounds(bounds_a, bounds_b, tolerance):
+    """Co-located copies have box centers and sizes within tolerance."""
+    (center_a, half_a), (center_b, half_b) = bounds_a, bounds_b
+    limit = tolerance + MIN_CELL_SIZE
+    return ((center_a - center_b).GetLength() <= limit and
+            abs(half_a.x - half_b.x) <= limit and
+            abs(half_a.y - half_b.y) <= limit and
+            abs(half_a.z - half_b.z) <= limit)
+
+def matrices_match(mg_a, mg_b, rad, tolerance):
+    """
+    Returns True if geometry with the given bounding radius ends up within
+    tolerance when placed with either matrix (a conservative bound).
+    """
+    deviation = ((mg_a.off - mg_b.off).GetLength() +
+                 (mg_a.v1 - mg_b.v1).GetLength() * abs(rad.x) +
+                 (mg_a.v2 - mg_b.v2).GetLength() * abs(rad.y) +
+                 (mg_a.v3 - mg_b.v3).GetLength() * abs(rad.z))
+    return deviation <= tolerance
+
+def world_points(obj, cache):
+    """Returns the object's points in world space, computed once per run."""
+    points = cache.get(obj)
+    if points is None:
+        mg = obj.GetMg()
+        points = [mg * p for p in obj.GetAllPoints()]
+        cache[obj] = points
+    return points
+
+def points_match(points_a, points_b, tolerance):
+    """
+    Checks that every point of one cloud has a point of the other within
+    tolerance. Exact copies keep their point order, so that is tried first;
+    otherwise the second cloud is hashed into a grid of tolerance-sized cells.
+    """
+    if all((p - q).GetLength() <= tolerance for p, q in zip(points_a, points_b)):
+        return True
+    cell = max(tolerance, MIN_CELL_SIZE)
+    for src, dst in ((points_a, points_b), (points_b, points_a)):
+        grid = {}
+        for q in dst:
+            grid.setdefault(grid_key(q, cell), []).append(q)
+        for p in src:
+            kx, ky, kz = grid_key(p, cell)
+            if not any((p - q).GetLength() <= tolerance
+                       for dx, dy, dz in NEIGHBOUR_OFFSETS
+                       for q in grid.get((kx + dx, ky + dy, kz + dz), ())):
+                return False
+    return True
+
+def point_mapping(points_a, points_b, tolerance):
+    """
+    Returns, for every point of points_a, the index of the nearest point of
+    points_b within tolerance, or None if a point has no match.
+    """
+    if all((p - q).GetLength() <= tolerance for p, q in zip(points_a, points_b)):
+        return list(range(len(points_a)))
+    cell = max(tolerance, MIN_CELL_SIZE)
+    grid = {}
+    for i, q in enumerate(points_b):
+        grid.setdefault(grid_key(q, cell), []).append(i)
+    mapping = []
+    for p in points_a:
+        kx, ky, kz = grid_key(p, cell)
+        best, best_dist = None, tolerance
+        for dx, dy, dz in NEIGHBOUR_OFFSETS:
+            for i in grid.get((kx + dx, ky + dy, kz + dz), ()):
+                dist = (p - points_b[i]).GetLength()
+                if dist <= best_dist:
+                    best, best_dist = i, dist
+        if best is None:
+            return None
+        mapping.append(best)
+    return mapping
+
+def surface_layout(obj, mapping):
+    """
+    Describes the faces of a polygon object independent of point and
+    polygon order: every polygon as its corners (through mapping), starting
+    at the lowest index, with the UVs of each UVW tag and its state in each
+    polygon and edge selection tag, plus the mapped points of each point
+    selection tag. Equal layouts mean equal faces, UVs and selections.
+    """
+    polys = obj.GetAllPolygons()
+    uvw_tags, polygon_sels, edge_sels, point_sels = [], [], [], []
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Tuvw):
+            uvw_tags.append(tag)
+        elif tag.CheckType(c4d.Tpolygonselection):
+            polygon_sels.append(tag)
+        elif tag.CheckType(c4d.Tedgeselection):
+            edge_sels.append(tag)
+        elif tag.CheckType(c4d.Tpointselection):
+            point_sels.append(tag)
+        tag = tag.GetNext()
+    polygon_sel = [t.GetBaseSelect() for t in polygon_sels]
+    edge_sel = [t.GetBaseSelect() for t in edge_sels]
+
+    faces = []
+    for i, poly in enumerate(polys):
+        # C4D numbers the edges of a triangle 0, 1 and 3.
+        corners, sides = ("abcd", (0, 1, 2, 3)) if not poly.IsTriangle() else ("abc", (0, 1, 3))
+        indices = [mapping[getattr(poly, c)] for c in corners]
+        start = indices.index(min(indices))
+        order = [(start + k) % len(corners) for k in range(len(corners))]
+        uvs = []
+        for t in uvw_tags:
+            uvw = t.GetSlow(i)
+            uvs.append(tuple((round(uvw[corners[k]].x, UV_DIGITS), round(uvw[corners[k]].y, UV_DIGITS))
+                             for k in order))
+        faces.append((tuple(indices[k] for k in order), tuple(uvs),
+                      tuple(sel.IsSelected(i) for sel in polygon_sel),
+                      tuple(tuple(sel.IsSelected(4 * i + sides[k]) for k in order) for sel in edge_sel)))
+    faces.sort()
+    count = obj.GetPointCount()
+    points = []
+    for t in point_sels:
+        sel = t.GetBaseSelect()
+        points.append(tuple(sorted(mapping[j] for j in range(count) if sel.IsSelected(j))))
+    names = tuple((t.GetType(), t.GetName()) for t in uvw_tags + polygon_sels + edge_sels + point_sels)
+    return names, tuple(points), faces
+
+def same_surface(obj_a, obj_b, tolerance, point_cache):
+    """
+    Returns True if two polygon objects with matching world points also
+    share their polygons, UVs and selections.
+    """
+    points_b = world_points(obj_b, point_cache)
+    mapping = point_mapping(world_points(obj_a, point_cache), points_b, tolerance)
+    if mapping is None:
+        return False
+    return surface_layout(obj_a, mapping) == surface_layout(obj_b, range(len(points_b)))
+
+def material_links(obj):
+    """Returns the materials assigned by the object's texture tags, in order."""
+    links = []
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Ttexture):
+            links.append((tag[c4d.TEXTURETAG_MATERIAL], tag[c4d.TEXTURETAG_RESTRICTION]))
+        tag = tag.GetNext()
+    return links
+
+def same_geometry(obj_a, obj_b, tolerance, point_cache):
+    """
+    Returns True if both objects show the same geometry at the same place:
+    instances (or an instance and its master) are compared by matrix,
+    point objects by their world-space points, polygon objects also by
+    their polygons, UVs and selections.
+    """
+    source_a, source_b = shape_source(obj_a), shape_source(obj_b)
+    if material_links(obj_a) != material_links(obj_b):
+        return False
+    if source_a == source_b:
+        return matrices_match(obj_a.GetMg(), obj_b.GetMg(), source_a.GetRad(), tolerance)
+    if obj_a.GetType() != obj_b.GetType() or obj_a.CheckType(c4d.Oinstance):
+        return False
+    if obj_a.GetPointCount() != obj_b.GetPointCount():
+        return False
+    if obj_a.CheckType(c4d.Opolygon) and obj_a.GetPolygonCount() != obj_b.GetPolygonCount():
+        return False
+    if not points_match(world_points(obj_a, point_cache), world_points(obj_b, point_cache), tolerance):
+        return False
+    return not obj_a.CheckType(c4d.Opolygon) or same_surface(obj_a, obj_b, tolerance, point_cache)
+
+def find_colocated_duplicates(all_objects, tolerance):
+    """
+    Finds objects that duplicate another object in place. Bounding box
+    centers are hashed into a uniform grid of tolerance-sized cells, so each
+    object is only compared with the kept objects in its neighbouring cells
+    instead of the whole scene. Real geometry is visited before instances, so
+    a mesh is always kept over an instance lying on top of it.
+    Returns a list of (duplicate, keeper) pairs.
+    """
+    cell = max(tolerance, MIN_CELL_SIZE)
+    candidates = [obj for obj in all_objects
+                  if shape_source(obj) is not None and not is_generator_input(obj)]
+    candidates.sort(key=lambda obj: obj.CheckType(c4d.Oinstance))
+
+    grid = {}
+    point_cache = {}
+    pairs = []
+    for obj in candidates:
+        bounds = world_bounds(obj, shape_source(obj))
+        kx, ky, kz = grid_key(bounds[0], cell)
+        keeper = None
+        for dx, dy, dz in NEIGHBOUR_OFFSETS:
+            for other, other_bounds in grid.get((kx + dx, ky + dy, kz + dz), ()):
+                if (similar_bounds(bounds, other_bounds, tolerance) and
+                        not is_ancestor(obj, other) and
+                        same_geometry(other, obj, tolerance, point_cache)):
+                    keeper = other
+                    break
+            if keeper is not None:
+                break
+        if keeper is not None:
+            pairs.append((obj, keeper))
+        else:
+            grid.setdefault((kx, ky, kz), []).append((obj, bounds))
+    return pairs
+
+def transfer_children(doc, old_obj, new_parent):
+    """
+    Transfers all child objects from old_obj to new_parent,
+    preserving their world-space transforms.
+    """
+    child = old_obj.GetDown()
+    while child:
+        next_child = child.GetNext()
+        doc.AddUndo(c4d.UNDOTYPE_CHANGE, child)
+        world_mtx = child.GetMg()
+        child.Remove()
+        doc.InsertObject(child, parent=new_parent)
+        child.SetMl(~new_parent.GetMg() * world_mtx)
+        child = next_child
+
+def relink_instance(doc, inst, target, correction=None):
+    """
+    Links inst to target. Instances draw their master's local geometry, so
+    when the new master's points are placed differently, correction (old
+    master matrix to new master matrix) keeps inst where it was drawn. Its
+    children keep their world position.
+    """
+    doc.AddUndo(c4d.UNDOTYPE_CHANGE, inst)
+    inst[c4d.INSTANCEOBJECT_LINK] = target
+    if correction is None:
+        return
+    children = []
+    child = inst.GetDown()
+    while child:
+        doc.AddUndo(c4d.UNDOTYPE_CHANGE, child)
+        children.append((child, child.GetMg()))
+        child = child.GetNext()
+    inst.SetMg(inst.GetMg() * correction)
+    for child, mg in children:
+        child.SetMg(mg)
+
+def delete_colocated_duplicates(doc, all_objects, pairs):
+    """
+    Deletes every duplicate, moving its children to the keeper and
+    re-linking instances that referenced it, moved so they still draw in
+    place. A keeper that is itself an instance of the duplicate is linked
+    to the duplicate's real master instead. Returns the number deleted.
+    """
+    links = {}
+    for obj in all_objects:
+        if obj.CheckType(c4d.Oinstance):
+            links.setdefault(obj[c4d.INSTANCEOBJECT_LINK], []).append(obj)
+
+    for duplicate, keeper in pairs:
+        correction = ~duplicate.GetMg() * keeper.GetMg()
+        for inst in links.pop(duplicate, ()):
+            if inst is keeper:
+                target = get_master_object(duplicate)
+                relink_instance(doc, inst, target)
+            else:
+                target = keeper
+                relink_instance(doc, inst, target, correction)
+            links.setdefault(target, []).append(inst)
+        transfer_children(doc, duplicate, keeper)
+        doc.AddUndo(c4d.UNDOTYPE_DELETE, duplicate)
+        duplicate.Remove()
+    return len(pairs)
+
+def main():
+    doc = c4d.documents.GetActiveDocument()
+    if not doc:
+        gui.MessageDialog("No active document found.")
+        return
+
+    # Ask for tolerance from the user.
+    input_str = gui.InputDialog("Enter tolerance (e.g. 0.01):", "0.01")
+    if not input_str:
+        return
+    try:
+        tolerance = float(input_str)
+    except ValueError:
+        gui.MessageDialog("Invalid number.")
+        return
+
+    all_objects = get_all_objects(doc.GetFirstObject())
+    pairs = find_colocated_duplicates(all_objects, tolerance)
+    if not pairs:
+        gui.MessageDialog("No co-located duplicates found.")
+        return
+
+    # Group all operations into a single undo step.
+    doc.StartUndo()
+    num_deleted = delete_colocated_duplicates(doc, all_objects, pairs)
+    doc.EndUndo()
+
+    c4d.EventAdd()
+    gui.MessageDialog(f"Deleted {num_deleted} co-located duplicates.")
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,63 @@
+import os
+import sys
+import time
+
 import c4d
+from c4d import gui
 
-def delete_empty_material_tags(doc):
-    """Deletes all empty material tags from objects in the document."""
-    def search(obj):
-        while obj:
-            tags = obj.GetTags()
-            for tag in tags:
-                if tag.CheckType(c4d.Ttexture) and not tag[c4d.TEXTURETAG_MATERIAL]:
-                    doc.AddUndo(c4d.UNDOTYPE_DELETE, tag)  # Add undo support
-                    tag.Remove()  # Corrected: Use Remove() on the tag
-            search(obj.GetDown())
-            obj = obj.GetNext()
+# scene_traversal.py and cleanup_plan.py are shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from cleanup_plan import CleanupPlan
+from scene_traversal import iter_objects, iter_tags
 
+def plan_empty_material_tags(doc):
+    """Analyses the document without changing it and collects empty material tags."""
+    removals = []
+    objects = 0
+    for obj in iter_objects(doc.GetFirstObject()):
+        empty = [tag for tag in iter_tags(obj, (c4d.Ttexture,))
+                 if not tag[c4d.TEXTURETAG_MATERIAL]]
+        if empty:
+            removals.extend(empty)
+            objects += 1
+    # objects counts the objects that carry the tags.
+    return CleanupPlan(tuple(removals), objects)
+
+def apply_plan(doc, plan):
+    """Deletes the planned tags as a single undo step."""
     doc.StartUndo()  # Begin undo operation
-    search(doc.GetFirstObject())
+    for tag in plan.removals:
+        doc.AddUndo(c4d.UNDOTYPE_DELETE, tag)  # Add undo support
+        tag.Remove()  # Corrected: Use Remove() on the tag
     doc.EndUndo()    # End undo operation
     c4d.EventAdd()
 
+def delete_empty_material_tags(doc):
+    """Deletes all empty material tags from objects in the document. Returns the number deleted."""
+    plan = plan_empty_material_tags(doc)
+    apply_plan(doc, plan)
+    return len(plan.removals)
+
 def main():
     doc = c4d.documents.GetActiveDocument()
-    delete_empty_material_tags(doc)
+    if not doc:
+        return
+
+    # Dry run: nothing is touched until the plan is confirmed.
+    start = time.time()
+    plan = plan_empty_material_tags(doc)
+    print(f"Planned in {time.time() - start:.3f}s")
+    if not plan.removals:
+        gui.MessageDialog("No empty material tags found.")
+        return
+
+    report = f"{len(plan.removals)} empty material tags on {plan.objects} objects"
+    print(report)
+    if not gui.QuestionDialog(f"Delete empty material tags?\n\n{report}"):
+        return
+    apply_plan(doc, plan)
 
 if __name__ == "__main__":
     main()
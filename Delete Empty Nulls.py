@@ -1,27 +1,131 @@
+import collections
+import os
+import sys
+import time
+
 import c4d
+from c4d import gui
 
-def delete_empty_nulls(doc):
-    """Recursively deletes all empty null objects in the document."""
-    def search_and_delete(obj):
-        while obj:
-            next_obj = obj.GetNext()  # Store the next object before deleting
-            if obj.GetType() == c4d.Onull and not obj.GetDown():  # Check if it's an empty null
-                doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
-                obj.Remove()  # Correct method to remove the object
+# scene_traversal.py and cleanup_plan.py are shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from cleanup_plan import CleanupPlan
+from scene_traversal import iter_objects, walk
+
+# Optional: also remove nulls that hold a single object, baking the null's
+# transform into the child. Nulls with tags, visibility settings or
+# instances pointing at them are kept.
+FLATTEN_SINGLE_CHILD_NULLS = False
+
+def can_flatten(obj):
+    """Returns True if removing the null changes nothing but the hierarchy."""
+    return (obj.GetType() == c4d.Onull and
+            obj.GetFirstTag() is None and
+            obj[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] == c4d.OBJECT_UNDEF and
+            obj[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] == c4d.OBJECT_UNDEF)
+
+def plan_empty_nulls(doc):
+    """
+    Analyses the scene without changing it in one post-order pass. A null is
+    empty when all its children are empty nulls, so whole hierarchies of
+    nulls without content are found at once; only their topmost null is
+    planned for removal.
+    """
+    removals = []
+    flattens = []
+    instances = []
+    count = 0
+    sizes = collections.Counter()  # subtree sizes of the children seen so far
+    survivors = collections.Counter()  # children that are not empty
+    empty_children = collections.defaultdict(list)
+
+    # The reversed pre-order list visits every object after its descendants.
+    for obj, parent, _ in reversed(list(walk(doc.GetFirstObject()))):
+        size = sizes.pop(obj, 0) + 1
+        if obj.CheckType(c4d.Oinstance):
+            instances.append(obj)
+        is_empty = obj.GetType() == c4d.Onull and not survivors[obj]
+        if not is_empty:
+            for child, child_size in empty_children.pop(obj, ()):
+                removals.append(child)
+                count += child_size
+            if FLATTEN_SINGLE_CHILD_NULLS and survivors[obj] == 1 and can_flatten(obj):
+                flattens.append(obj)
+
+        if parent is None:
+            if is_empty:
+                removals.append(obj)
+                count += size
+        else:
+            sizes[parent] += size
+            if is_empty:
+                empty_children[parent].append((obj, size))
             else:
-                search_and_delete(obj.GetDown())  # Check child objects
-            obj = next_obj  # Move to the next object
+                survivors[parent] += 1
+
+    linked = set(inst[c4d.INSTANCEOBJECT_LINK] for inst in instances)
+    removed = set()
+    for obj in removals:
+        removed.update(iter_objects(obj, siblings=False))
+    affected = tuple(inst for inst in instances if inst[c4d.INSTANCEOBJECT_LINK] in removed)
+    flattens = tuple(obj for obj in flattens if obj not in linked)
+    return CleanupPlan(tuple(removals), count, instances=affected, flattens=flattens)
 
+def flatten_null(doc, null):
+    """
+    Moves the null's only child into the null's place with the null's
+    transform baked in, then removes the null.
+    """
+    child = null.GetDown()
+    doc.AddUndo(c4d.UNDOTYPE_CHANGE, child)
+    local_mtx = null.GetMl() * child.GetMl()
+    child.Remove()
+    doc.InsertObject(child, parent=null.GetUp(), pred=null)
+    child.SetMl(local_mtx)
+    doc.AddUndo(c4d.UNDOTYPE_DELETE, null)
+    null.Remove()
+
+def apply_plan(doc, plan):
+    """Deletes the planned nulls and flattens the planned ones as a single undo step."""
     doc.StartUndo()  # Start undo group
-    search_and_delete(doc.GetFirstObject())
+    for obj in plan.removals:
+        doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
+        obj.Remove()
+    # Deepest first, so chains of single-child nulls collapse completely.
+    for null in plan.flattens:
+        flatten_null(doc, null)
     doc.EndUndo()  # End undo group
     c4d.EventAdd()
 
+def delete_empty_nulls(doc):
+    """Deletes all empty null hierarchies in the document. Returns the number of nulls deleted."""
+    plan = plan_empty_nulls(doc)
+    apply_plan(doc, plan)
+    return plan.objects
+
 def main():
     doc = c4d.documents.GetActiveDocument()
     if not doc:
         return
-    delete_empty_nulls(doc)
+
+    # Dry run: nothing is touched until the plan is confirmed.
+    start = time.time()
+    plan = plan_empty_nulls(doc)
+    print(f"Planned in {time.time() - start:.3f}s")
+    if not plan.removals and not plan.flattens:
+        gui.MessageDialog("No empty nulls found.")
+        return
+
+    report = f"{plan.objects} empty nulls ({len(plan.removals)} top-level)"
+    if plan.flattens:
+        report += f"\n{len(plan.flattens)} single-child nulls will be flattened"
+    if plan.instances:
+        report += f"\n{len(plan.instances)} instances link to them and will lose their reference"
+    print(report)
+    if not gui.QuestionDialog(f"Delete empty nulls?\n\n{report}"):
+        return
+    apply_plan(doc, plan)
 
 if __name__ == "__main__":
     main()
@@ -1,39 +1,77 @@
+import os
+import sys
+import time
+
 import c4d
+from c4d import gui
 
-def remove_orphan_instances(obj, doc):
-    if not obj:
-        return
-    
+# scene_traversal.py and cleanup_plan.py are shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from cleanup_plan import CleanupPlan, format_plan, measure_subtrees
+from scene_traversal import iter_objects
+
+def is_orphan(op):
+    """Returns True for instances without a reference."""
+    return op.GetType() == c4d.Oinstance and op[c4d.INSTANCEOBJECT_LINK] is None
+
+def plan_orphan_instances(obj):
+    """Analyses the hierarchy without changing it and collects orphan instances."""
     to_delete = []
-    
-    # Рекурсивный обход всех объектов
-    def traverse_hierarchy(op):
-        while op:
-            next_obj = op.GetNext()
-            if op.GetType() == c4d.Oinstance:
-                ref = op[c4d.INSTANCEOBJECT_LINK]
-                if ref is None:  # Проверяем, есть ли референс
-                    to_delete.append(op)
-            traverse_hierarchy(op.GetDown())
-            op = next_obj
-    
-    traverse_hierarchy(obj)
-    
+    instances = []
+
+    # Children of an orphan go with it, so its subtree is skipped.
+    for op in iter_objects(obj, prune=is_orphan):
+        if op.GetType() == c4d.Oinstance:
+            if op[c4d.INSTANCEOBJECT_LINK] is None:  # Проверяем, есть ли референс
+                to_delete.append(op)
+            else:
+                instances.append(op)
+
+    removed = set(to_delete)
+    affected = tuple(inst for inst in instances if inst[c4d.INSTANCEOBJECT_LINK] in removed)
+    objects, points, polygons = measure_subtrees(to_delete)
+    return CleanupPlan(tuple(to_delete), objects, points, polygons, affected)
+
+def apply_plan(doc, plan):
+    """Deletes the planned instances as a single undo step."""
+    doc.StartUndo()
     # Удаляем найденные объекты
-    for inst in to_delete:
+    for inst in plan.removals:
         doc.AddUndo(c4d.UNDOTYPE_DELETE, inst)
         inst.Remove()
-    
+    doc.EndUndo()
     c4d.EventAdd()
 
+def remove_orphan_instances(obj, doc):
+    """Deletes all orphan instances below obj. Returns the number of objects deleted."""
+    if not obj:
+        return 0
+    plan = plan_orphan_instances(obj)
+    apply_plan(doc, plan)
+    return plan.objects
+
 def main():
     doc = c4d.documents.GetActiveDocument()
     if not doc:
         return
-    
-    doc.StartUndo()
-    remove_orphan_instances(doc.GetFirstObject(), doc)
-    doc.EndUndo()
+
+    # Dry run: nothing is touched until the plan is confirmed.
+    start = time.time()
+    plan = plan_orphan_instances(doc.GetFirstObject())
+    print(f"Planned in {time.time() - start:.3f}s")
+    if not plan.removals:
+        gui.MessageDialog("No orphan instances found.")
+        return
+
+    report = format_plan(plan)
+    if plan.instances:
+        report += f"\n{len(plan.instances)} instances link to them and will lose their reference"
+    print(report)
+    if not gui.QuestionDialog(f"Delete orphan instances?\n\n{report}"):
+        return
+    apply_plan(doc, plan)
     
 if __name__ == "__main__":
     main()
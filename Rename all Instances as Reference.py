@@ -1,18 +1,20 @@
+import os
+import sys
+
 import c4d
 
-def get_all_objects(op, out):
-    while op:
-        out.append(op)
-        get_all_objects(op.GetDown(), out)
-        op = op.GetNext()
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects
 
 def main():
     doc = c4d.documents.GetActiveDocument()
     if not doc:
         return
 
-    all_objs = []
-    get_all_objects(doc.GetFirstObject(), all_objs)
+    all_objs = get_all_objects(doc.GetFirstObject())
 
     doc.StartUndo()
     renamed = 0
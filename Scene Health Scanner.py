@@ -0,0 +1,314 @@
+import collections
+import os
+import sys
+import time
+
+import c4d
+from c4d import gui
+
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_subtree, iter_objects, iter_tags, walk
+
+def get_master_object(obj):
+    """Follows instance links to the real master (None for broken links or cycles)."""
+    seen = set()
+    while obj and obj.CheckType(c4d.Oinstance) and obj not in seen:
+        seen.add(obj)
+        obj = obj[c4d.INSTANCEOBJECT_LINK]
+    if obj and obj.CheckType(c4d.Oinstance):
+        return None
+    return obj
+
+def is_layer_hidden(layer, doc, layer_cache):
+    """Returns True if the layer hides its objects in the viewport or renderer."""
+    if layer is None:
+        return False
+    hidden = layer_cache.get(layer)
+    if hidden is None:
+        data = layer.GetLayerData(doc) or {}
+        hidden = not data.get("view", True) or not data.get("render", True)
+        layer_cache[layer] = hidden
+    return hidden
+
+def is_hidden(obj, doc, layer_cache):
+    """
+    Returns True if the object's own visibility flags or its layer hide it
+    in the viewport or renderer.
+    """
+    if obj[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] == c4d.OBJECT_OFF or \
+       obj[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] == c4d.OBJECT_OFF:
+        return True
+    return is_layer_hidden(obj.GetLayerObject(doc), doc, layer_cache)
+
+def is_effectively_hidden(obj, doc, layer_cache):
+    """Returns True if the object or one of its parents is hidden."""
+    while obj:
+        if is_hidden(obj, doc, layer_cache):
+            return True
+        obj = obj.GetUp()
+    return False
+
+def scan_scene(doc):
+    """
+    Visits every object and tag once and collects all cleanup categories:
+      - "chains": (instance, real master) for instances linking to an instance
+      - "hidden": topmost hidden objects (their subtrees are hidden too)
+      - "hidden_set": every effectively hidden object
+      - "visible_instances": instances that stay when hidden objects go
+      - "orphans": instances without a reference
+      - "empty_tags": texture tags without a material
+      - "empty_nulls": topmost nulls whose subtree holds nothing but nulls
+    The scene is walked once; hidden flags are carried down the tree in
+    that order, and emptiness is decided on the way back up by running over
+    the same list in reverse.
+    """
+    index = {"chains": [], "hidden": [], "hidden_set": set(), "visible_instances": [],
+             "orphans": [], "empty_tags": [], "empty_nulls": []}
+    hidden_set = index["hidden_set"]
+    layer_cache = {}
+    order = list(walk(doc.GetFirstObject()))
+
+    for obj, parent, _ in order:
+        parent_hidden = parent in hidden_set
+        obj_hidden = parent_hidden or is_hidden(obj, doc, layer_cache)
+        if obj_hidden:
+            hidden_set.add(obj)
+            if not parent_hidden:
+                index["hidden"].append(obj)
+
+        for tag in iter_tags(obj, (c4d.Ttexture,)):
+            if not tag[c4d.TEXTURETAG_MATERIAL]:
+                index["empty_tags"].append(tag)
+
+        if obj.CheckType(c4d.Oinstance):
+            link = obj[c4d.INSTANCEOBJECT_LINK]
+            if link is None:
+                index["orphans"].append(obj)
+            else:
+                if link.CheckType(c4d.Oinstance):
+                    master = get_master_object(obj)
+                    if master:
+                        index["chains"].append((obj, master))
+                if not obj_hidden:
+                    index["visible_instances"].append(obj)
+
+    survivors = collections.Counter()  # children that are not empty
+    empty_children = collections.defaultdict(list)
+    for obj, parent, _ in reversed(order):
+        is_empty = obj.GetType() == c4d.Onull and not survivors[obj]
+        if not is_empty:
+            index["empty_nulls"].extend(empty_children.pop(obj, ()))
+        if parent is None:
+            if is_empty:
+                index["empty_nulls"].append(obj)
+        elif is_empty:
+            empty_children[parent].append(obj)
+        else:
+            survivors[parent] += 1
+    return index
+
+def in_document(node):
+    """Returns True if an indexed object or tag wasn't removed by an earlier fix."""
+    return node.GetDocument() is not None
+
+# The dialog is not modal, so the scene may have changed since the scan.
+# Every fix re-checks its entries' conditions on the spot (without walking
+# the scene again) and leaves alone whatever no longer qualifies.
+
+def delete_nodes(doc, nodes, still_applies):
+    """
+    Removes the objects or tags that are still in the document and for which
+    still_applies(node) is True. Returns the number removed.
+    """
+    count = 0
+    for node in nodes:
+        if in_document(node) and still_applies(node):
+            doc.AddUndo(c4d.UNDOTYPE_DELETE, node)
+            node.Remove()
+            count += 1
+    return count
+
+def fix_chains(doc, index):
+    """Points every chained instance directly to its real master."""
+    count = 0
+    for inst, _ in index["chains"]:
+        if not in_document(inst):
+            continue
+        link = inst[c4d.INSTANCEOBJECT_LINK]
+        if link is None or not link.CheckType(c4d.Oinstance):
+            continue
+        master = get_master_object(inst)
+        if master:
+            doc.AddUndo(c4d.UNDOTYPE_CHANGE, inst)
+            inst[c4d.INSTANCEOBJECT_LINK] = master
+            count += 1
+    return count
+
+def fix_hidden(doc, index):
+    """
+    Deletes the hidden objects that are still hidden. Visible instances whose
+    master is about to be deleted get a visible copy of the master in place of
+    the first instance, and the other instances are re-linked to that copy
+    (as in Delete All Hidden Objects).
+    Links are read now, so instances re-linked by fix_chains are covered.
+    """
+    layer_cache = {}
+    roots = set(obj for obj in index["hidden"]
+                if in_document(obj) and is_effectively_hidden(obj, doc, layer_cache))
+
+    def is_deleted(obj):
+        while obj:
+            if obj in roots:
+                return True
+            obj = obj.GetUp()
+        return False
+
+    swapped_refs = {}
+    for inst in index["visible_instances"]:
+        if not in_document(inst) or is_deleted(inst):
+            continue
+        ref = inst[c4d.INSTANCEOBJECT_LINK]
+        if ref is None or not is_deleted(ref):
+            continue
+        if ref in swapped_refs:
+            doc.AddUndo(c4d.UNDOTYPE_CHANGE, inst)
+            inst[c4d.INSTANCEOBJECT_LINK] = swapped_refs[ref]
+            continue
+        parent = inst.GetUp()
+        ref_clone = ref.GetClone()
+        ref_clone.SetMl(~parent.GetMg() * inst.GetMg() if parent else inst.GetMg())
+        ref_clone[c4d.ID_BASEOBJECT_VISIBILITY_EDITOR] = c4d.OBJECT_UNDEF
+        ref_clone[c4d.ID_BASEOBJECT_VISIBILITY_RENDER] = c4d.OBJECT_UNDEF
+        ref_clone.SetLayerObject(inst.GetLayerObject(doc))
+        doc.InsertObject(ref_clone, parent=parent, pred=inst)
+        doc.AddUndo(c4d.UNDOTYPE_NEW, ref_clone)
+        swapped_refs[ref] = ref_clone
+        doc.AddUndo(c4d.UNDOTYPE_DELETE, inst)
+        inst.Remove()
+
+    count = sum(len(get_subtree(obj)) for obj in roots)
+    delete_nodes(doc, index["hidden"], lambda obj: obj in roots)
+    return count
+
+def fix_orphans(doc, index):
+    """Deletes instances that still have no reference."""
+    return delete_nodes(doc, index["orphans"],
+                        lambda inst: inst[c4d.INSTANCEOBJECT_LINK] is None)
+
+def fix_empty_tags(doc, index):
+    """Deletes texture tags that still have no material."""
+    return delete_nodes(doc, index["empty_tags"],
+                        lambda tag: not tag[c4d.TEXTURETAG_MATERIAL])
+
+def fix_empty_nulls(doc, index):
+    """Deletes the null hierarchies that still hold nothing but nulls."""
+    return delete_nodes(doc, index["empty_nulls"],
+                        lambda null: all(obj.GetType() == c4d.Onull
+                                         for obj in iter_objects(null, siblings=False)))
+
+# (index key, label, fix). Fix All runs the fixes in this order: chains are
+# resolved before hidden masters are swapped, and hidden objects go before
+# the smaller categories, whose entries they may already contain.
+CATEGORIES = (
+    ("chains", "Instance chains", fix_chains),
+    ("hidden_set", "Hidden objects", fix_hidden),
+    ("orphans", "Orphan instances", fix_orphans),
+    ("empty_tags", "Empty material tags", fix_empty_tags),
+    ("empty_nulls", "Empty nulls", fix_empty_nulls),
+)
+
+ID_TEXT = 1100
+ID_FIX = 1200
+ID_RESCAN = 1001
+ID_FIX_ALL = 1002
+ID_STATUS = 1003
+
+class ScannerDialog(gui.GeDialog):
+    def __init__(self):
+        super().__init__()
+        self.doc = None
+        self.index = None
+
+    def CreateLayout(self):
+        self.SetTitle("Scene Health Scanner")
+        self.GroupBegin(2000, c4d.BFH_SCALEFIT, cols=2)
+        for i, (_, label, _) in enumerate(CATEGORIES):
+            self.AddStaticText(ID_TEXT + i, c4d.BFH_SCALEFIT, initw=220, name=label)
+            self.AddButton(ID_FIX + i, c4d.BFH_RIGHT, name="Fix")
+        self.GroupEnd()
+
+        self.GroupBegin(2001, c4d.BFH_SCALEFIT, cols=2)
+        self.AddButton(ID_RESCAN, c4d.BFH_LEFT, name="Rescan")
+        self.AddButton(ID_FIX_ALL, c4d.BFH_RIGHT, name="Fix All")
+        self.GroupEnd()
+        self.AddStaticText(ID_STATUS, c4d.BFH_SCALEFIT, name="")
+        return True
+
+    def InitValues(self):
+        self.rescan()
+        return True
+
+    def rescan(self):
+        self.doc = c4d.documents.GetActiveDocument()
+        start = time.time()
+        self.index = scan_scene(self.doc)
+        elapsed = time.time() - start
+        self.update_counts()
+        self.SetString(ID_STATUS, f"Scanned in {elapsed:.2f}s")
+        print(f"[Scene Health] Scanned in {elapsed:.2f}s")
+
+    def update_counts(self):
+        for i, (key, label, _) in enumerate(CATEGORIES):
+            count = len(self.index[key])
+            self.SetString(ID_TEXT + i, f"{label}: {count}")
+            self.Enable(ID_FIX + i, count > 0)
+
+    def run_fixes(self, categories):
+        """Runs the given fixes on the scanned index as a single undo step."""
+        doc = c4d.documents.GetActiveDocument()
+        if doc != self.doc:
+            # The index belongs to another document: show its counts first.
+            self.rescan()
+            self.SetString(ID_STATUS, "Document changed. Rescanned, nothing was fixed.")
+            return False
+        doc.StartUndo()
+        for key, label, fix in categories:
+            if self.index[key]:
+                count = fix(doc, self.index)
+                print(f"[Scene Health] {label}: fixed {count}")
+                self.index[key] = type(self.index[key])()
+        doc.EndUndo()
+        c4d.EventAdd()
+        self.update_counts()
+        return True
+
+    def Command(self, id, msg):
+        if id == ID_RESCAN:
+            self.rescan()
+        elif id == ID_FIX_ALL:
+            if self.run_fixes(CATEGORIES):
+                self.SetString(ID_STATUS, "Fixed. Rescan to catch follow-up issues.")
+        elif ID_FIX <= id < ID_FIX + len(CATEGORIES):
+            self.run_fixes([CATEGORIES[id - ID_FIX]])
+        return True
+
+# -----------------------------------------------------------------------------
+# Launch the dialog
+# -----------------------------------------------------------------------------
+global dlg
+dlg = ScannerDialog()
+
+
+def main():
+    dlg.Open(
+        dlgtype=c4d.DLG_TYPE_ASYNC,
+        pluginid=1065433,
+        defaultw=320,
+        defaulth=200
+    )
+
+if __name__ == "__main__":
+    main()
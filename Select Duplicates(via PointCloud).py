@@ -1,53 +1,619 @@
+import collections
+import json
+import math
+import os
+import sys
+import time
+import types
+
 import c4d
 from c4d import gui
 
-def get_all_objects(op, out):
-    """Recursively collects all objects in the scene."""
-    while op:
-        out.append(op)
-        get_all_objects(op.GetDown(), out)
-        op = op.GetNext()
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects
 
-def get_centered_points(obj):
+# Optional: with NumPy installed in C4D's Python, point clouds become
+# float64 arrays and every comparison step is vectorized.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Smallest grid cell for the point matcher (keeps a zero tolerance usable).
+MIN_CELL_SIZE = 1e-6
+
+# Relative eigenvalue gap / third-moment size below which the canonical
+# frame's axes or signs are treated as ambiguous.
+AXIS_EPSILON = 1e-4
+SIGN_EPSILON = 1e-6
+
+# Axis sign flips that keep the frame right-handed.
+PROPER_FLIPS = ((1, 1, 1), (1, -1, -1), (-1, 1, -1), (-1, -1, 1))
+MIRROR_FLIPS = ((1, 1, -1), (1, -1, 1), (-1, 1, 1), (-1, -1, -1))
+
+# Optional: also match scaled (uniformly or along the principal axes) and
+# mirrored copies. Buckets then only use the point count.
+MATCH_SCALED_AND_MIRRORED = False
+
+# Shape buckets are this many tolerances wide; matching clouds land in the
+# same or a neighbouring bucket.
+DESCRIPTOR_CELL_FACTOR = 4.0
+
+# A grid cell and its 26 neighbours.
+NEIGHBOUR_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+# Per-run caches keyed by object.
+point_cache = {}
+cloud_cache = {}
+canon_cache = {}
+radius_cache = {}
+spread_cache = {}
+
+# Comparison stages, cheapest first; each records pairs checked, pairs
+# rejected and time spent.
+COMPARISON_STAGES = ("type", "counts", "radius", "moments", "match")
+stage_stats = {}
+
+# Shape fingerprints are kept for the whole Cinema 4D session, keyed by object
+# GUID and content stamp (copies of an object can share a GUID), and reused
+# while the object's data dirty counter and matrix scale are unchanged. Only
+# the most recently used entries are kept.
+FINGERPRINT_CACHE_LIMIT = 200000
+SESSION_CACHE_NAME = "select_duplicates_pointcloud_fingerprints"
+
+# Also store fingerprints in the document, so they survive saving and
+# reopening the scene.
+PERSIST_FINGERPRINTS = False
+FINGERPRINT_CONTAINER_ID = 1065432  # document container slot for persisted fingerprints
+FINGERPRINT_FORMAT = 2  # bumped whenever the persisted layout changes
+
+def clear_caches():
+    """Drop point buffers from a previous run."""
+    point_cache.clear()
+    cloud_cache.clear()
+    canon_cache.clear()
+    radius_cache.clear()
+    spread_cache.clear()
+
+def read_point_array(obj):
+    """Local points of obj as an (n, 3) float64 array."""
+    count = obj.GetPointCount()
+    try:
+        arr = np.frombuffer(obj.GetPointR(), dtype=np.float64, count=count * 3)
+        return arr.reshape(count, 3).copy()
+    except Exception:
+        pts = [(p.x, p.y, p.z) for p in obj.GetAllPoints()]
+        return np.array(pts, dtype=np.float64).reshape(count, 3)
+
+def get_local_points(obj):
     """
-    Returns world-space points centered on the object's centroid,
-    ignoring its pivot.
+    Local points of obj, read once per run (array with NumPy,
+    list of c4d.Vector without).
     """
-    pts = obj.GetAllPoints()
-    if not pts:
-        return []
+    pts = point_cache.get(obj)
+    if pts is None:
+        pts = read_point_array(obj) if np is not None else obj.GetAllPoints()
+        point_cache[obj] = pts
+    return pts
+
+def get_world_points(obj):
+    """World-space points of obj."""
     mg = obj.GetMg()
-    world_pts = [mg * p for p in pts]
+    pts = get_local_points(obj)
+    if np is not None:
+        basis = np.array([[mg.v1.x, mg.v1.y, mg.v1.z],
+                          [mg.v2.x, mg.v2.y, mg.v2.z],
+                          [mg.v3.x, mg.v3.y, mg.v3.z]])
+        return pts @ basis + np.array([mg.off.x, mg.off.y, mg.off.z])
+    return [mg * p for p in pts]
+
+def get_centroid(pts):
+    """Average of a non-empty point cloud."""
+    if np is not None:
+        return pts.mean(axis=0)
     center = c4d.Vector()
-    for p in world_pts:
+    for p in pts:
         center += p
-    center /= len(world_pts)
-    return [p - center for p in world_pts]
+    return center / len(pts)
+
+def get_centered_points(obj):
+    """
+    Returns world-space points centered on the object's centroid,
+    ignoring its pivot. Cached per run.
+    """
+    centered = cloud_cache.get(obj)
+    if centered is None:
+        world_pts = get_world_points(obj)
+        if len(world_pts) == 0:
+            centered = world_pts
+        elif np is not None:
+            centered = world_pts - get_centroid(world_pts)
+        else:
+            center = get_centroid(world_pts)
+            centered = [p - center for p in world_pts]
+        cloud_cache[obj] = centered
+    return centered
+
+def symmetric_eigen(a):
+    """
+    Jacobi eigen decomposition of a symmetric 3x3 matrix (nested lists).
+    Returns (eigenvalues, unit eigenvectors as c4d.Vectors).
+    Fallback for when NumPy is missing.
+    """
+    a = [row[:] for row in a]
+    v = [[1.0 if i == j else 0.0 for j in range(3)] for i in range(3)]
+    for _ in range(50):
+        if a[0][1] ** 2 + a[0][2] ** 2 + a[1][2] ** 2 < 1e-30:
+            break
+        for p, q in ((0, 1), (0, 2), (1, 2)):
+            if a[p][q] == 0.0:
+                continue
+            theta = (a[q][q] - a[p][p]) / (2.0 * a[p][q])
+            t = math.copysign(1.0, theta) / (abs(theta) + math.sqrt(theta * theta + 1.0))
+            c = 1.0 / math.sqrt(t * t + 1.0)
+            s = t * c
+            for k in range(3):
+                akp, akq = a[k][p], a[k][q]
+                a[k][p] = c * akp - s * akq
+                a[k][q] = s * akp + c * akq
+            for k in range(3):
+                apk, aqk = a[p][k], a[q][k]
+                a[p][k] = c * apk - s * aqk
+                a[q][k] = s * apk + c * aqk
+            for k in range(3):
+                vkp, vkq = v[k][p], v[k][q]
+                v[k][p] = c * vkp - s * vkq
+                v[k][q] = s * vkp + c * vkq
+    values = [a[i][i] for i in range(3)]
+    vectors = [c4d.Vector(v[0][i], v[1][i], v[2][i]) for i in range(3)]
+    return values, vectors
+
+def principal_axes(centered):
+    """(variances, unit axes) of a centered cloud, largest variance first."""
+    if np is not None:
+        values, vectors = np.linalg.eigh(centered.T @ centered)
+        order = np.argsort(values)[::-1]
+        return [float(values[i]) for i in order], [vectors[:, i].copy() for i in order]
+
+    cov = [[0.0] * 3 for _ in range(3)]
+    for p in centered:
+        c = (p.x, p.y, p.z)
+        for i in range(3):
+            for j in range(i, 3):
+                cov[i][j] += c[i] * c[j]
+    for i in range(3):
+        for j in range(i):
+            cov[i][j] = cov[j][i]
+    values, vectors = symmetric_eigen(cov)
+    order = sorted(range(3), key=lambda i: values[i], reverse=True)
+    return [values[i] for i in order], [vectors[i] for i in order]
+
+def third_moments(centered, axis):
+    """(signed, absolute) third moments of the cloud along axis."""
+    if np is not None:
+        proj = centered @ axis
+        return float(np.sum(proj ** 3)), float(np.sum(np.abs(proj) ** 3))
+    proj = [p.Dot(axis) for p in centered]
+    return sum(d ** 3 for d in proj), sum(abs(d) ** 3 for d in proj)
+
+def get_canonical_points(obj):
+    """
+    Points of obj in its canonical frame (centroid origin, principal axes
+    sorted by variance, signs fixed by the third moment).
+    Returns (canonical_points, ambiguous). Cached per run.
+    """
+    cached = canon_cache.get(obj)
+    if cached is not None:
+        return cached
+
+    centered = get_centered_points(obj)
+    if len(centered) == 0:
+        return centered, True
+
+    values, axes = principal_axes(centered)
+    scale = max(values[0], 1e-30)
+    ambiguous = (values[0] - values[1] <= AXIS_EPSILON * scale or
+                 values[1] - values[2] <= AXIS_EPSILON * scale)
+    for i in (0, 1):
+        skew, magnitude = third_moments(centered, axes[i])
+        if abs(skew) <= SIGN_EPSILON * magnitude:
+            ambiguous = True
+        if skew < 0:
+            axes[i] = -axes[i]
+
+    if np is not None:
+        axes[2] = np.cross(axes[0], axes[1])
+        canonical = centered @ np.array(axes).T
+    else:
+        axes[2] = axes[0].Cross(axes[1])
+        canonical = [c4d.Vector(p.Dot(axes[0]), p.Dot(axes[1]), p.Dot(axes[2]))
+                     for p in centered]
+    cached = (canonical, ambiguous)
+    canon_cache[obj] = cached
+    return cached
+
+def grid_key(p, cell):
+    """Integer grid cell containing point p."""
+    return (math.floor(p.x / cell), math.floor(p.y / cell), math.floor(p.z / cell))
+
+def build_point_grid(pts, cell):
+    """Bucket points into a uniform grid keyed by cell."""
+    grid = {}
+    for p in pts:
+        grid.setdefault(grid_key(p, cell), []).append(p)
+    return grid
+
+def nearest_distance(grid, cell, p):
+    """
+    Distance from p to the closest grid point in the neighbouring cells,
+    or None if they are empty.
+    """
+    kx, ky, kz = grid_key(p, cell)
+    best = None
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                for q in grid.get((kx + dx, ky + dy, kz + dz), ()):
+                    d = (p - q).GetLength()
+                    if best is None or d < best:
+                        best = d
+    return best
+
+def directed_deviation(pts, grid, cell, tol):
+    """
+    (matched, max_deviation) for every point in pts against the grid.
+    """
+    worst = 0.0
+    for p in pts:
+        d = nearest_distance(grid, cell, p)
+        if d is None or d > tol:
+            return False, float("inf") if d is None else d
+        if d > worst:
+            worst = d
+    return True, worst
+
+def encode_cells(keys):
+    """One int64 hash per row of integer cell coordinates."""
+    return (keys[:, 0] * 73856093) ^ (keys[:, 1] * 19349663) ^ (keys[:, 2] * 83492791)
+
+def directed_deviation_array(src, dst, cell, tol):
+    """
+    NumPy version of directed_deviation: dst rows are sorted by cell hash
+    and looked up per neighbour offset with a binary search.
+    """
+    if len(src) == 0:
+        return True, 0.0
+    dst_codes = encode_cells(np.floor(dst / cell).astype(np.int64))
+    order = np.argsort(dst_codes, kind="stable")
+    dst_codes = dst_codes[order]
+    dst_sorted = dst[order]
+
+    src_keys = np.floor(src / cell).astype(np.int64)
+    best = np.full(len(src), np.inf)
+    for offset in NEIGHBOUR_OFFSETS:
+        codes = encode_cells(src_keys + offset)
+        lo = np.searchsorted(dst_codes, codes, side="left")
+        counts = np.searchsorted(dst_codes, codes, side="right") - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        seg_starts = np.cumsum(counts) - counts
+        src_idx = np.repeat(np.arange(len(src)), counts)
+        dst_idx = np.arange(total) + np.repeat(lo - seg_starts, counts)
+        dist = np.linalg.norm(src[src_idx] - dst_sorted[dst_idx], axis=1)
+        hit = counts > 0
+        best[hit] = np.minimum(best[hit], np.minimum.reduceat(dist, seg_starts[hit]))
+    worst = float(best.max())
+    return worst <= tol, worst
 
 def points_match(a_pts, b_pts, tol):
     """
-    True if every point in a_pts has a match in b_pts within tol,
-    and vice versa.
+    (matched, max_deviation): matched is True if every point in a_pts has a
+    match in b_pts within tol, and vice versa.
     """
-    for pa in a_pts:
-        if not any((pa - pb).GetLength() <= tol for pb in b_pts):
-            return False
-    for pb in b_pts:
-        if not any((pb - pa).GetLength() <= tol for pa in a_pts):
+    cell = max(tol, MIN_CELL_SIZE)
+    if np is not None:
+        ok, dev_a = directed_deviation_array(a_pts, b_pts, cell, tol)
+        if not ok:
+            return False, dev_a
+        ok, dev_b = directed_deviation_array(b_pts, a_pts, cell, tol)
+        return ok, max(dev_a, dev_b)
+    ok, dev_a = directed_deviation(a_pts, build_point_grid(b_pts, cell), cell, tol)
+    if not ok:
+        return False, dev_a
+    ok, dev_b = directed_deviation(b_pts, build_point_grid(a_pts, cell), cell, tol)
+    return ok, max(dev_a, dev_b)
+
+def flip_points(pts, flip):
+    """Scale each axis of the cloud by the sign (or factor) in flip."""
+    if np is not None:
+        return pts * np.array(flip, dtype=np.float64)
+    sx, sy, sz = flip
+    return [c4d.Vector(p.x * sx, p.y * sy, p.z * sz) for p in pts]
+
+def are_shapes_equal_by_vertices(a, b, tol):
+    """
+    Compare two polygon objects by their vertex clouds. Cheap stages reject
+    most pairs before the full match in clouds_match.
+    """
+    for stage, test in COMPARISON_TESTS:
+        if not run_stage(stage, test, a, b, tol):
             return False
     return True
 
-def are_shapes_equal_by_vertices(a, b, tol):
+def clouds_match(a, b, tol):
+    """
+    Match the vertex clouds of a and b, first centered and then in their
+    canonical frames, so rotated (and optionally scaled or mirrored) copies
+    match too.
+    """
+    matched, _ = points_match(get_centered_points(a),
+                              get_centered_points(b),
+                              tol)
+    if matched:
+        return True
+
+    canon_a, ambiguous_a = get_canonical_points(a)
+    canon_b, ambiguous_b = get_canonical_points(b)
+    ambiguous = ambiguous_a or ambiguous_b
+    flips = PROPER_FLIPS if ambiguous else PROPER_FLIPS[:1]
+    if MATCH_SCALED_AND_MIRRORED:
+        # Stretch a to b's spreads; mirrored frames differ in the third axis.
+        flips = flips + (MIRROR_FLIPS if ambiguous else MIRROR_FLIPS[:1])
+        canon_a = flip_points(canon_a, tuple(
+            y / x if x > MIN_CELL_SIZE else 1.0
+            for x, y in zip(shape_fingerprint(a)[1:], shape_fingerprint(b)[1:])))
+    for flip in flips:
+        matched, _ = points_match(canon_a, flip_points(canon_b, flip), tol)
+        if matched:
+            return True
+    return False
+
+def get_session_cache():
     """
-    Compare two polygon objects by their centered vertex clouds.
+    (GUID, content stamp) -> (object stamp, (fingerprint, radius)) for this
+    Cinema 4D session. Stored in sys.modules because the script itself is
+    re-executed on every run.
     """
-    if not (a.CheckType(c4d.Opolygon) and b.CheckType(c4d.Opolygon)):
-        return False
-    if a.GetPointCount() != b.GetPointCount():
-        return False
-    return points_match(get_centered_points(a),
-                        get_centered_points(b),
-                        tol)
+    holder = sys.modules.get(SESSION_CACHE_NAME)
+    if holder is None:
+        holder = types.ModuleType(SESSION_CACHE_NAME)
+        holder.entries = collections.OrderedDict()
+        sys.modules[SESSION_CACHE_NAME] = holder
+    return holder.entries
+
+def matrix_metric(obj):
+    """
+    Dot products of the global matrix axes. Spreads are measured in world
+    space, so they depend on the object's scale and shear but not on its
+    position or rotation.
+    """
+    mg = obj.GetMg()
+    v1, v2, v3 = mg.v1, mg.v2, mg.v3
+    return [round(x, 9) for x in (v1 * v1, v2 * v2, v3 * v3, v1 * v2, v1 * v3, v2 * v3)]
+
+def object_stamp(obj):
+    """Changes whenever the points or the matrix scale of obj change."""
+    return (obj.GetDirty(c4d.DIRTYFLAGS_DATA), tuple(matrix_metric(obj)))
+
+def content_stamp(obj):
+    """
+    Dirty counters restart when a document is loaded, so persisted
+    fingerprints are validated against point count, bounding box, a few
+    sample points and the matrix scale instead.
+    """
+    count = obj.GetPointCount()
+    mp, rad = obj.GetMp(), obj.GetRad()
+    stamp = [count,
+             round(mp.x, 6), round(mp.y, 6), round(mp.z, 6),
+             round(rad.x, 6), round(rad.y, 6), round(rad.z, 6)]
+    for i in sorted({0, count // 2, count - 1}):
+        if 0 <= i < count:
+            p = obj.GetPoint(i)
+            stamp.extend((round(p.x, 6), round(p.y, 6), round(p.z, 6)))
+    return stamp + matrix_metric(obj)
+
+def load_persisted_fingerprints(doc):
+    """
+    Fingerprints stored in doc by a previous session, if enabled:
+    GUID string -> [[content stamp, fingerprint, radius], ...].
+    """
+    if not PERSIST_FINGERPRINTS:
+        return {}
+    raw = doc.GetDataInstance().GetString(FINGERPRINT_CONTAINER_ID)
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict) or data.get("format") != FINGERPRINT_FORMAT:
+        return {}
+    return data.get("entries", {})
+
+def save_persisted_fingerprints(doc, objs, cache):
+    """
+    Stores the fingerprints of the polygons in objs in doc, if enabled. The
+    document is only touched (with undo, and marked as changed so saving
+    keeps the data) when the stored fingerprints differ.
+    Returns the number of fingerprints stored, or None if nothing changed.
+    """
+    if not PERSIST_FINGERPRINTS:
+        return None
+    entries = {}
+    count = 0
+    for o in objs:
+        if not o.CheckType(c4d.Opolygon):
+            continue
+        stamp = content_stamp(o)
+        entry = cache.get((o.GetGUID(), tuple(stamp)))
+        if entry is None:
+            continue
+        fingerprint, radius = entry[1]
+        item = [stamp, list(fingerprint), radius]
+        stored = entries.setdefault(str(o.GetGUID()), [])
+        if item not in stored:
+            stored.append(item)
+            count += 1
+    raw = json.dumps({"format": FINGERPRINT_FORMAT, "entries": entries}, sort_keys=True)
+    if raw == doc.GetDataInstance().GetString(FINGERPRINT_CONTAINER_ID):
+        return None
+    doc.StartUndo()
+    doc.AddUndo(c4d.UNDOTYPE_CHANGE_SMALL, doc)
+    doc.GetDataInstance().SetString(FINGERPRINT_CONTAINER_ID, raw)
+    doc.EndUndo()
+    doc.SetChanged()
+    return count
+
+def shape_fingerprint(obj):
+    """Point count plus the spreads along the principal axes, once per run."""
+    fingerprint = spread_cache.get(obj)
+    if fingerprint is None:
+        centered = get_centered_points(obj)
+        count = len(centered)
+        if not count:
+            fingerprint = (0, 0.0, 0.0, 0.0)
+        else:
+            values, _ = principal_axes(centered)
+            fingerprint = (count,) + tuple(math.sqrt(max(v, 0.0) / count) for v in values)
+        spread_cache[obj] = fingerprint
+    return fingerprint
+
+def cached_fingerprint(obj, cache, persisted):
+    """
+    shape_fingerprint(obj), reused from the session cache or the document
+    while obj is unchanged. The reused fingerprint and cloud radius also
+    fill this run's caches, so the radius and spread stages don't read the
+    points again; only pairs that reach the full match do.
+    """
+    stamp = content_stamp(obj)
+    key = (obj.GetGUID(), tuple(stamp))
+    dirty = object_stamp(obj)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == dirty:
+        data = entry[1]
+    else:
+        data = None
+        for stored_stamp, fingerprint, radius in persisted.get(str(obj.GetGUID()), ()):
+            if stored_stamp == stamp:
+                data = (tuple(fingerprint), radius)
+                break
+        if data is None:
+            data = (shape_fingerprint(obj), cloud_radius(obj))
+        cache[key] = (dirty, data)
+    cache.move_to_end(key)
+    while len(cache) > FINGERPRINT_CACHE_LIMIT:
+        cache.popitem(last=False)
+    spread_cache[obj], radius_cache[obj] = data
+    return data[0]
+
+def descriptor_key(fingerprint, cell):
+    """
+    Bucket key from a rotation-invariant fingerprint: point count plus the
+    principal-axis spreads, quantized to cell.
+    """
+    count = fingerprint[0]
+    if MATCH_SCALED_AND_MIRRORED:
+        return (count, 0, 0, 0)
+    return (count,) + tuple(math.floor(v / cell) for v in fingerprint[1:])
+
+def shape_candidates(index, fingerprint, cell):
+    """Indexed entries from the fingerprint's bucket and its neighbours."""
+    count, kx, ky, kz = descriptor_key(fingerprint, cell)
+    for dx, dy, dz in NEIGHBOUR_OFFSETS:
+        for entry in index.get((count, kx + dx, ky + dy, kz + dz), ()):
+            yield entry
+
+def cloud_radius(obj):
+    """Largest distance of a world point from the centroid, once per run."""
+    radius = radius_cache.get(obj)
+    if radius is None:
+        centered = get_centered_points(obj)
+        if not len(centered):
+            radius = 0.0
+        elif np is not None:
+            radius = float(np.sqrt((centered * centered).sum(axis=1).max()))
+        else:
+            radius = max(p.GetLength() for p in centered)
+        radius_cache[obj] = radius
+    return radius
+
+def stage_limit(tol):
+    """
+    How far the radius or a spread of two matching clouds can differ: every
+    point, and with it the centroid, moves by at most tol.
+    """
+    return 2.0 * tol + MIN_CELL_SIZE
+
+# Comparison stages; each only rejects pairs that can't match.
+def both_polygons(a, b, tol):
+    return a.CheckType(c4d.Opolygon) and b.CheckType(c4d.Opolygon)
+
+def same_point_count(a, b, tol):
+    return a.GetPointCount() == b.GetPointCount()
+
+def similar_radius(a, b, tol):
+    if MATCH_SCALED_AND_MIRRORED:
+        return True
+    return abs(cloud_radius(a) - cloud_radius(b)) <= stage_limit(tol)
+
+def similar_spreads(a, b, tol):
+    if MATCH_SCALED_AND_MIRRORED:
+        return True
+    limit = stage_limit(tol)
+    return all(abs(x - y) <= limit
+               for x, y in zip(shape_fingerprint(a)[1:], shape_fingerprint(b)[1:]))
+
+COMPARISON_TESTS = (("type", both_polygons), ("counts", same_point_count),
+                    ("radius", similar_radius), ("moments", similar_spreads),
+                    ("match", clouds_match))
+
+def reset_stage_stats():
+    stage_stats.clear()
+    for stage in COMPARISON_STAGES:
+        stage_stats[stage] = [0, 0, 0.0]  # checked, rejected, seconds
+
+def run_stage(stage, test, a, b, tol):
+    start = time.perf_counter()
+    passed = test(a, b, tol)
+    entry = stage_stats.setdefault(stage, [0, 0, 0.0])
+    entry[0] += 1
+    entry[2] += time.perf_counter() - start
+    if not passed:
+        entry[1] += 1
+    return passed
+
+def print_stage_stats():
+    print("Duplicate comparison stages (checked / rejected / ms):")
+    for stage in COMPARISON_STAGES:
+        checked, rejected, seconds = stage_stats.get(stage, (0, 0, 0.0))
+        print("  {:<8}{:>10}{:>10}{:>12.2f}".format(stage, checked, rejected, seconds * 1000.0))
+
+def cluster_shapes(objs, tol, fingerprints):
+    """
+    One pass over objs: each polygon joins the first matching master from the
+    neighbouring buckets, or becomes a new master.
+    Returns [(master, [duplicates])].
+    """
+    cell = max(DESCRIPTOR_CELL_FACTOR * tol, MIN_CELL_SIZE)
+    index = {}
+    classes = []
+    for o in objs:
+        if not o.CheckType(c4d.Opolygon) or not o.GetPointCount():
+            continue
+        fingerprint = fingerprints(o)
+        for cls in shape_candidates(index, fingerprint, cell):
+            if are_shapes_equal_by_vertices(cls[0], o, tol):
+                cls[1].append(o)
+                break
+        else:
+            cls = (o, [])
+            classes.append(cls)
+            index.setdefault(descriptor_key(fingerprint, cell), []).append(cls)
+    return classes
 
 def deduplicate_selection(selection, tol):
     """
@@ -64,13 +630,22 @@ def main():
     if not doc:
         gui.MessageDialog("No active document found.")
         return
+    clear_caches()
+    reset_stage_stats()
 
-    # 1) Capture original polygon selection
+    # 1) Capture original polygon selection; with nothing selected, offer
+    #    to search the entire scene
     original = doc.GetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_NONE)
-    polys = [o for o in original if o.CheckType(c4d.Opolygon)]
-    if not polys:
-        gui.MessageDialog("Please select one or more polygon objects.")
-        return
+    whole_scene = not original
+    if whole_scene:
+        if not gui.QuestionDialog("Nothing is selected.\n"
+                                  "Select duplicates in the entire scene?"):
+            return
+    else:
+        polys = [o for o in original if o.CheckType(c4d.Opolygon)]
+        if not polys:
+            gui.MessageDialog("Please select one or more polygon objects.")
+            return
 
     # 2) Get tolerance from user
     tol_str = gui.InputDialog("Enter matching tolerance (e.g. 0.01):", "0.01")
@@ -82,24 +657,47 @@ def main():
         gui.MessageDialog("Invalid tolerance.")
         return
 
-    # 3) Deduplicate your selection
-    masters = deduplicate_selection(polys, tol)
+    # 3) Scan entire scene
+    all_objs = get_all_objects(doc.GetFirstObject())
+
+    cache = get_session_cache()
+    persisted = load_persisted_fingerprints(doc)
 
-    # 4) Scan entire scene
-    all_objs = []
-    get_all_objects(doc.GetFirstObject(), all_objs)
+    def fingerprints(o):
+        return cached_fingerprint(o, cache, persisted)
 
-    # 5) For each master, find and select any other polygon matching by vertex cloud
     found = False
-    for m in masters:
-        for o in all_objs:
-            if o in masters:
-                continue
-            if are_shapes_equal_by_vertices(m, o, tol):
+    if whole_scene:
+        # 4) Cluster every polygon; all but the first of each class get selected
+        for _, duplicates in cluster_shapes(all_objs, tol, fingerprints):
+            for o in duplicates:
                 o.SetBit(c4d.BIT_ACTIVE)
                 found = True
+    else:
+        # 4) Deduplicate your selection
+        for o in polys:
+            fingerprints(o)
+        masters = deduplicate_selection(polys, tol)
+        master_set = set(masters)
+
+        # 5) For each master, select any polygon from the neighbouring shape
+        #    buckets that matches by vertex cloud
+        cell = max(DESCRIPTOR_CELL_FACTOR * tol, MIN_CELL_SIZE)
+        index = {}
+        for o in all_objs:
+            if o.CheckType(c4d.Opolygon) and o.GetPointCount() and o not in master_set:
+                index.setdefault(descriptor_key(fingerprints(o), cell), []).append(o)
+        for m in masters:
+            for o in shape_candidates(index, fingerprints(m), cell):
+                if are_shapes_equal_by_vertices(m, o, tol):
+                    o.SetBit(c4d.BIT_ACTIVE)
+                    found = True
 
+    stored = save_persisted_fingerprints(doc, all_objs, cache)
+    if stored is not None:
+        print("Stored {} fingerprints in the document; save the scene to keep them.".format(stored))
     c4d.EventAdd()
+    print_stage_stats()
 
     # 6) If none found, notify
     if not found:
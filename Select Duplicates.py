@@ -1,6 +1,29 @@
+import collections
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+import types
+from array import array
+
 import c4d
 from c4d import gui
 
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects
+
+# NumPy is optional: if it's installed into C4D's Python, point sets are
+# compared as sorted float64 arrays instead of Vector sets.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # ----------------------------------------------------------------------
 # Define key parameters for comparing lights.
 LIGHT_PARAMETERS = {
@@ -20,12 +43,30 @@ LIGHT_PARAMETERS = {
     "Path": c4d.LIGHT_PHOTOMETRIC_FILE
 }
 
-# ----------------------------------------------------------------------
-def get_all_objects(op, out):
-    while op:
-        out.append(op)
-        get_all_objects(op.GetDown(), out)
-        op = op.GetNext()
+# Point sets read during this run, keyed by object.
+point_cache = {}
+moment_cache = {}
+hash_cache = {}
+mesh_cache = {}
+generator_cache = {}
+
+# Comparison stages, cheapest first; each records pairs checked, pairs
+# rejected and time spent.
+COMPARISON_STAGES = ("type", "counts", "bounds", "moments", "hash", "exact", "cache")
+stage_stats = {}
+
+# Signatures are cached per object GUID and content (copies of an object can
+# share a GUID) and reused on the next run while the object's dirty counters
+# are unchanged. The cache lives for the whole Cinema 4D session and is
+# trimmed to the most recently used entries.
+FINGERPRINT_CACHE_LIMIT = 200000
+SESSION_CACHE_NAME = "select_duplicates_fingerprints"
+
+# Also store polygon/spline signatures in the document, so they survive
+# saving and reopening the scene.
+PERSIST_FINGERPRINTS = False
+FINGERPRINT_CONTAINER_ID = 1065431  # document container slot for persisted signatures
+FINGERPRINT_FORMAT = 2  # bumped whenever the persisted layout changes
 
 SUPPORTED_GENERATORS = {
     c4d.Ocube, c4d.Osphere, c4d.Oplatonic, c4d.Ocone,
@@ -40,9 +81,25 @@ def is_supported_type(op):
     return op and (
         op.CheckType(c4d.Opolygon) or
         op.CheckType(c4d.Ospline) or
-        op.GetType() in SUPPORTED_GENERATORS
+        op.GetType() in SUPPORTED_GENERATORS or
+        is_procedural(op)
     )
 
+def is_procedural(op):
+    # Any other generator (Extrude, Sweep, Boole...) is compared by its cache.
+    return (op.GetType() not in SUPPORTED_GENERATORS and
+            not op.CheckType(c4d.Oinstance) and
+            bool(op.GetInfo() & c4d.OBJECT_GENERATOR) and
+            op.GetCache() is not None)
+
+def is_generator_input(op):
+    # Objects consumed by a generator are part of its cache.
+    while op:
+        if op.GetBit(c4d.BIT_CONTROLOBJECT):
+            return True
+        op = op.GetUp()
+    return False
+
 def rs_lights_equal(op1, op2):
     d1 = op1.GetDataInstance(); d2 = op2.GetDataInstance()
     try:
@@ -58,68 +115,563 @@ def standard_lights_identical(l1, l2):
             return False
     return True
 
-def objects_are_identical(o1, o2):
-    if not o1 or not o2 or o1.GetType() != o2.GetType():
+def read_point_array(op):
+    count = op.GetPointCount()
+    try:
+        arr = np.frombuffer(op.GetPointR(), dtype=np.float64, count=count * 3)
+        return arr.reshape(count, 3).copy()
+    except Exception:
+        pts = [(p.x, p.y, p.z) for p in op.GetAllPoints()]
+        return np.array(pts, dtype=np.float64).reshape(count, 3)
+
+def get_point_set(op):
+    # Unique sorted points (NumPy) or a frozenset of Vectors, read once per run.
+    key = point_cache.get(op)
+    if key is None:
+        if np is not None:
+            key = np.unique(read_point_array(op) + 0.0, axis=0)
+        else:
+            key = frozenset(op.GetAllPoints())
+        point_cache[op] = key
+    return key
+
+def points_equal(o1, o2):
+    a, b = get_point_set(o1), get_point_set(o2)
+    if np is not None:
+        return a.shape == b.shape and bool(np.array_equal(a, b))
+    return a == b
+
+# Tags that are part of a mesh's identity.
+CORNER_TAGS = (c4d.Tuvw, c4d.Tnormal)
+SELECTION_TAGS = (c4d.Tpointselection, c4d.Tpolygonselection, c4d.Tedgeselection)
+
+def read_polygon_array(op):
+    count = op.GetPolygonCount()
+    try:
+        arr = np.frombuffer(op.GetPolygonR(), dtype=np.int32, count=count * 4)
+        return arr.reshape(count, 4).astype(np.int64)
+    except Exception:
+        polys = [(p.a, p.b, p.c, p.d) for p in op.GetAllPolygons()]
+        return np.array(polys, dtype=np.int64).reshape(count, 4)
+
+def canonical_mesh_layout(op):
+    # Points sorted by position; polygons relabelled, rotated to start at
+    # their lowest point and sorted. Returns (points, polygons, rank,
+    # poly_order, poly_rank, corners, shift, size), see the Convert script.
+    if np is not None:
+        pts = read_point_array(op) + 0.0
+        order = np.lexsort(pts.T[::-1])
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        polys = rank[read_polygon_array(op)]
+        size = np.where(polys[:, 2] == polys[:, 3], 3, 4)
+        lead = polys.copy()
+        lead[size == 3, 3] = len(order)
+        shift = np.argmin(lead, axis=1)
+        corners = (shift[:, None] + np.arange(4)) % size[:, None]
+        corners[size == 3, 3] = corners[size == 3, 2]
+        canon = np.take_along_axis(polys, corners, axis=1)
+        poly_order = np.lexsort(canon.T[::-1])
+        poly_rank = np.empty(len(poly_order), dtype=np.int64)
+        poly_rank[poly_order] = np.arange(len(poly_order))
+        return (pts[order], canon[poly_order], rank, poly_order, poly_rank,
+                corners[poly_order], shift, size)
+
+    pts = [(p.x + 0.0, p.y + 0.0, p.z + 0.0) for p in op.GetAllPoints()]
+    order = sorted(range(len(pts)), key=pts.__getitem__)
+    rank = [0] * len(pts)
+    for new, old in enumerate(order):
+        rank[old] = new
+    canon, corners, shift, size = [], [], [], []
+    for poly in op.GetAllPolygons():
+        idx = (rank[poly.a], rank[poly.b], rank[poly.c], rank[poly.d])
+        n = 3 if poly.c == poly.d else 4
+        first = min(range(n), key=idx.__getitem__)
+        cols = [(first + k) % n for k in range(n)]
+        if n == 3:
+            cols.append(cols[2])
+        canon.append(tuple(idx[c] for c in cols))
+        corners.append(cols)
+        shift.append(first)
+        size.append(n)
+    poly_order = sorted(range(len(canon)), key=canon.__getitem__)
+    poly_rank = [0] * len(canon)
+    for new, old in enumerate(poly_order):
+        poly_rank[old] = new
+    return ([pts[i] for i in order], [canon[i] for i in poly_order], rank, poly_order,
+            poly_rank, [corners[i] for i in poly_order], shift, size)
+
+def layout_bytes(rows, code):
+    if np is not None:
+        return np.ascontiguousarray(rows).tobytes()
+    return array(code, (v for row in rows for v in row)).tobytes()
+
+def corner_tag_bytes(tag, layout, poly_count):
+    # UVW/normal data in canonical polygon and corner order; None if unreadable.
+    try:
+        data = bytes(tag.GetLowlevelDataAddressR())
+    except Exception:
+        return None
+    if not poly_count or len(data) % (poly_count * 4):
+        # Unknown layout: compare as stored (may miss reordered copies).
+        return data
+    corner = len(data) // (poly_count * 4)
+    poly_order, corners = layout[3], layout[5]
+    if np is not None:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(poly_count, 4, corner)
+        return raw[poly_order[:, None], corners].tobytes()
+    record = corner * 4
+    return b"".join(data[i * record + c * corner:i * record + (c + 1) * corner]
+                    for i, cols in zip(poly_order, corners) for c in cols)
+
+def selection_bytes(tag, layout, poly_count, point_count):
+    rank, poly_rank, shift, size = layout[2], layout[4], layout[6], layout[7]
+    if tag.CheckType(c4d.Tpointselection):
+        count, remap = point_count, rank
+    elif tag.CheckType(c4d.Tpolygonselection):
+        count, remap = poly_count, poly_rank
+    else:
+        count, remap = poly_count * 4, None
+    flags = tag.GetBaseSelect().GetAll(count)
+    if np is not None:
+        sel = np.flatnonzero(np.array(flags, dtype=bool))
+        if remap is not None:
+            return np.sort(remap[sel]).tobytes()
+        poly, edge = sel // 4, sel % 4
+        n = size[poly]
+        side = np.where(edge < n, (edge - shift[poly]) % n, edge)
+        return np.sort(poly_rank[poly] * 4 + side).tobytes()
+    sel = [i for i, on in enumerate(flags) if on]
+    if remap is not None:
+        return array("q", sorted(remap[i] for i in sel)).tobytes()
+    new = []
+    for i in sel:
+        poly, edge = divmod(i, 4)
+        n = size[poly]
+        side = (edge - shift[poly]) % n if edge < n else edge
+        new.append(poly_rank[poly] * 4 + side)
+    return array("q", sorted(new)).tobytes()
+
+def mesh_hash(op):
+    # Points, connectivity, UVW/normal/selection tags and Phong settings,
+    # independent of point and polygon order. None never matches.
+    if op in mesh_cache:
+        return mesh_cache[op]
+    poly_count, point_count = op.GetPolygonCount(), op.GetPointCount()
+    layout = canonical_mesh_layout(op)
+    h = hashlib.md5()
+    h.update(layout_bytes(layout[0], "d"))
+    h.update(layout_bytes(layout[1], "q"))
+    digest = None
+    tag = op.GetFirstTag()
+    while tag:
+        t = tag.GetType()
+        if t in CORNER_TAGS:
+            data = corner_tag_bytes(tag, layout, poly_count)
+            if data is None:
+                break
+        elif t in SELECTION_TAGS:
+            data = tag.GetName().encode("utf-8") + b"\0" + \
+                selection_bytes(tag, layout, poly_count, point_count)
+        elif t == c4d.Tphong:
+            data = repr(container_hash(tag.GetDataInstance())).encode("utf-8")
+        else:
+            tag = tag.GetNext()
+            continue
+        h.update(b"%d:%d:" % (t, len(data)))
+        h.update(data)
+        tag = tag.GetNext()
+    else:
+        digest = h.hexdigest()
+    mesh_cache[op] = digest
+    return digest
+
+def matrix_bytes(m):
+    return array("d", (m.off.x, m.off.y, m.off.z, m.v1.x, m.v1.y, m.v1.z,
+                       m.v2.x, m.v2.y, m.v2.z, m.v3.x, m.v3.y, m.v3.z)).tobytes()
+
+def hash_cache_tree(op, h):
+    # Type, local matrix and (deformed) geometry of every cache object.
+    while op:
+        h.update(b"%d[" % op.GetType())
+        h.update(matrix_bytes(op.GetMl()))
+        sub = op.GetDeformCache() or op.GetCache()
+        if sub is not None:
+            if not hash_cache_tree(sub, h):
+                return False
+        elif not op.GetBit(c4d.BIT_CONTROLOBJECT):
+            if op.CheckType(c4d.Opolygon):
+                digest = mesh_hash(op)
+                if digest is None:
+                    return False
+                h.update(digest.encode("ascii"))
+            elif op.CheckType(c4d.Ospline):
+                h.update(points_hash(op).encode("ascii"))
+        if not hash_cache_tree(op.GetDown(), h):
+            return False
+        h.update(b"]")
+        op = op.GetNext()
+    return True
+
+def generator_cache_hash(op):
+    if op in generator_cache:
+        return generator_cache[op]
+    cache = op.GetDeformCache() or op.GetCache()
+    h = hashlib.md5()
+    digest = None
+    if cache is not None and hash_cache_tree(cache, h):
+        digest = h.hexdigest()
+    generator_cache[op] = digest
+    return digest
+
+def point_moments(o):
+    # Mean and second moments of the point set, computed once per run.
+    m = moment_cache.get(o)
+    if m is None:
+        pts = get_point_set(o)
+        if not len(pts):
+            m = (0.0,) * 9
+        elif np is not None:
+            prod = pts[:, [0, 0, 0, 1, 1, 2]] * pts[:, [0, 1, 2, 1, 2, 2]]
+            m = tuple(pts.mean(axis=0).tolist() + prod.mean(axis=0).tolist())
+        else:
+            rows = [(p.x, p.y, p.z, p.x * p.x, p.x * p.y, p.x * p.z,
+                     p.y * p.y, p.y * p.z, p.z * p.z) for p in pts]
+            m = tuple(math.fsum(col) / len(rows) for col in zip(*rows))
+        moment_cache[o] = m
+    return m
+
+def cached_points_hash(o):
+    h = hash_cache.get(o)
+    if h is None:
+        h = hash_cache[o] = points_hash(o)
+    return h
+
+# Comparison stages; each only rejects pairs that can't be identical.
+def same_type(o1, o2):
+    return o1.GetType() == o2.GetType()
+
+def same_counts(o1, o2):
+    if o1.CheckType(c4d.Ospline):
+        if (o1[c4d.SPLINEOBJECT_TYPE] != o2[c4d.SPLINEOBJECT_TYPE] or
+                o1.GetSegmentCount() != o2.GetSegmentCount()):
+            return False
+    elif o1.GetPolygonCount() != o2.GetPolygonCount():
         return False
+    return o1.GetPointCount() == o2.GetPointCount()
+
+def same_bounds(o1, o2):
+    # Polygon boxes are spanned by the points.
+    return o1.GetMp() == o2.GetMp() and o1.GetRad() == o2.GetRad()
+
+def same_moments(o1, o2):
+    return all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+               for a, b in zip(point_moments(o1), point_moments(o2)))
+
+def same_points_hash(o1, o2):
+    return cached_points_hash(o1) == cached_points_hash(o2)
+
+def same_mesh_hash(o1, o2):
+    h = mesh_hash(o1)
+    return h is not None and h == mesh_hash(o2)
+
+def same_generator_cache(o1, o2):
+    h = generator_cache_hash(o1)
+    return h is not None and h == generator_cache_hash(o2)
+
+def same_parameters(o1, o2):
     t = o1.GetType()
-    if o1.CheckType(c4d.Opolygon):
-        return (o1.GetPolygonCount() == o2.GetPolygonCount() and
-                o1.GetPointCount() == o2.GetPointCount() and
-                set(o1.GetAllPoints()) == set(o2.GetAllPoints()))
-    if o1.CheckType(c4d.Ospline):
-        return (o1[c4d.SPLINEOBJECT_TYPE] == o2[c4d.SPLINEOBJECT_TYPE] and
-                o1.GetSegmentCount() == o2.GetSegmentCount() and
-                o1.GetPointCount() == o2.GetPointCount() and
-                set(o1.GetAllPoints()) == set(o2.GetAllPoints()))
     if t in (c4d.Olight, c4d.Orslight):
         return rs_lights_equal(o1, o2) if t == c4d.Orslight else standard_lights_identical(o1, o2)
     return o1.GetDataInstance() == o2.GetDataInstance()
 
-def get_canonical_masters(selected):
-    canonical = []
-    for obj in selected:
-        if obj.CheckType(c4d.Oinstance):
+# The mesh hash is exact, so polygons need no point compare after it.
+POLYGON_STAGES = (("type", same_type), ("counts", same_counts), ("bounds", same_bounds),
+                  ("moments", same_moments), ("hash", same_mesh_hash))
+SPLINE_STAGES = (("type", same_type), ("counts", same_counts), ("moments", same_moments),
+                 ("hash", same_points_hash), ("exact", points_equal))
+PARAMETER_STAGES = (("type", same_type), ("exact", same_parameters))
+GENERATOR_STAGES = (("type", same_type), ("exact", same_parameters), ("cache", same_generator_cache))
+
+def reset_stage_stats():
+    stage_stats.clear()
+    for stage in COMPARISON_STAGES:
+        stage_stats[stage] = [0, 0, 0.0]  # checked, rejected, seconds
+
+def run_stage(stage, test, o1, o2):
+    start = time.perf_counter()
+    passed = test(o1, o2)
+    entry = stage_stats.setdefault(stage, [0, 0, 0.0])
+    entry[0] += 1
+    entry[2] += time.perf_counter() - start
+    if not passed:
+        entry[1] += 1
+    return passed
+
+def print_stage_stats():
+    print("Duplicate comparison stages (checked / rejected / ms):")
+    for stage in COMPARISON_STAGES:
+        checked, rejected, seconds = stage_stats.get(stage, (0, 0, 0.0))
+        print("  {:<8}{:>10}{:>10}{:>12.2f}".format(stage, checked, rejected, seconds * 1000.0))
+
+def objects_are_identical(o1, o2):
+    if not o1 or not o2:
+        return False
+    if o1.CheckType(c4d.Opolygon):
+        stages = POLYGON_STAGES
+    elif o1.CheckType(c4d.Ospline):
+        stages = SPLINE_STAGES
+    elif is_procedural(o1):
+        stages = GENERATOR_STAGES
+    else:
+        stages = PARAMETER_STAGES
+    for stage, test in stages:
+        if not run_stage(stage, test, o1, o2):
+            return False
+    return True
+
+# Values that can't be hashed reliably only contribute their type name,
+# so equal containers always get equal signatures.
+HASHABLE_TYPES = (bool, int, float, str, c4d.Vector)
+
+def hashable_value(v):
+    if v is None or isinstance(v, HASHABLE_TYPES):
+        return v
+    return type(v).__name__
+
+def stable_digest(data):
+    # Python's hash() of strings changes between sessions, so anything that
+    # may be persisted is hashed with hashlib instead.
+    return hashlib.md5(data).hexdigest()
+
+def container_hash(bc):
+    if bc is None:
+        return None
+    try:
+        items = sorted(((pid, hashable_value(v)) for pid, v in bc), key=lambda it: it[0])
+    except Exception:
+        return None
+    return stable_digest(repr(items).encode("utf-8"))
+
+def light_parameters_hash(light):
+    values = []
+    for pid in LIGHT_PARAMETERS.values():
+        try:
+            values.append(hashable_value(light[pid]))
+        except Exception:
+            values.append(None)
+    return stable_digest(repr(values).encode("utf-8"))
+
+def points_hash(op):
+    key = get_point_set(op)
+    if np is not None:
+        return stable_digest(key.tobytes())
+    coords = array("d")
+    for p in sorted((p.x + 0.0, p.y + 0.0, p.z + 0.0) for p in key):
+        coords.extend(p)
+    return stable_digest(coords.tobytes())
+
+def get_signature(o):
+    # Identical objects always share a signature; only same-signature
+    # objects are compared in full.
+    t = o.GetType()
+    if o.CheckType(c4d.Opolygon):
+        return (t, o.GetPolygonCount(), o.GetPointCount(), mesh_hash(o))
+    if o.CheckType(c4d.Ospline):
+        return (t, o[c4d.SPLINEOBJECT_TYPE], o.GetSegmentCount(),
+                o.GetPointCount(), points_hash(o))
+    if t == c4d.Olight:
+        return (t, light_parameters_hash(o))
+    if is_procedural(o):
+        return (t, container_hash(o.GetDataInstance()), generator_cache_hash(o))
+    return (t, container_hash(o.GetDataInstance()))
+
+def get_session_cache():
+    # Script modules are re-executed on every run, but sys.modules lives as
+    # long as Cinema 4D, so the cache is parked there.
+    holder = sys.modules.get(SESSION_CACHE_NAME)
+    if holder is None:
+        holder = types.ModuleType(SESSION_CACHE_NAME)
+        holder.entries = collections.OrderedDict()
+        sys.modules[SESSION_CACHE_NAME] = holder
+    return holder.entries
+
+def object_stamp(o):
+    # Changes whenever the object's points, parameters, cache or mesh tags change.
+    tags = []
+    tag = o.GetFirstTag()
+    while tag:
+        if tag.GetType() in CORNER_TAGS or tag.GetType() in SELECTION_TAGS or tag.CheckType(c4d.Tphong):
+            tags.append((tag.GetType(), tag.GetDirty(c4d.DIRTYFLAGS_DATA)))
+        tag = tag.GetNext()
+    return (o.GetType(), o.GetDirty(c4d.DIRTYFLAGS_DATA | c4d.DIRTYFLAGS_CACHE), tuple(tags))
+
+def content_stamp(o):
+    # Dirty counters restart when a document is loaded, so persisted
+    # signatures are validated against counts, bounding box and a few
+    # sample points instead.
+    count = o.GetPointCount()
+    mp, rad = o.GetMp(), o.GetRad()
+    stamp = [o.GetType(), count,
+             round(mp.x, 6), round(mp.y, 6), round(mp.z, 6),
+             round(rad.x, 6), round(rad.y, 6), round(rad.z, 6)]
+    for i in sorted({0, count // 2, count - 1}):
+        if 0 <= i < count:
+            p = o.GetPoint(i)
+            stamp.extend((round(p.x, 6), round(p.y, 6), round(p.z, 6)))
+    return stamp
+
+def cache_key(o):
+    # Copies of an object can share a GUID, so entries are also keyed by
+    # content: the content stamp of point objects, the parameters of others.
+    if o.CheckType(c4d.Opoint):
+        return (o.GetGUID(), tuple(content_stamp(o)))
+    return (o.GetGUID(), o.GetType(), container_hash(o.GetDataInstance()))
+
+def load_persisted_fingerprints(doc):
+    # GUID string -> [[content stamp, signature], ...]
+    if not PERSIST_FINGERPRINTS:
+        return {}
+    raw = doc.GetDataInstance().GetString(FINGERPRINT_CONTAINER_ID)
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict) or data.get("format") != FINGERPRINT_FORMAT:
+        return {}
+    return data.get("entries", {})
+
+def save_persisted_fingerprints(doc, objs, cache):
+    # Only touches the document (with undo, and marked as changed so saving
+    # keeps the data) when the stored signatures differ. Returns the number
+    # stored, or None if nothing changed.
+    if not PERSIST_FINGERPRINTS:
+        return None
+    entries = {}
+    count = 0
+    for o in objs:
+        if not (o.CheckType(c4d.Opolygon) or o.CheckType(c4d.Ospline)):
+            continue
+        key = cache_key(o)
+        entry = cache.get(key)
+        if entry is None:
             continue
-        if not any(objects_are_identical(obj, c) for c in canonical):
-            canonical.append(obj)
-    return canonical
+        item = [list(key[1]), list(entry[1])]
+        stored = entries.setdefault(str(o.GetGUID()), [])
+        if item not in stored:
+            stored.append(item)
+            count += 1
+    raw = json.dumps({"format": FINGERPRINT_FORMAT, "entries": entries}, sort_keys=True)
+    if raw == doc.GetDataInstance().GetString(FINGERPRINT_CONTAINER_ID):
+        return None
+    doc.StartUndo()
+    doc.AddUndo(c4d.UNDOTYPE_CHANGE_SMALL, doc)
+    doc.GetDataInstance().SetString(FINGERPRINT_CONTAINER_ID, raw)
+    doc.EndUndo()
+    doc.SetChanged()
+    return count
+
+def cached_signature(o, cache, persisted):
+    # Reuse the signature while the object is unchanged; otherwise take it
+    # from the document (if it still validates) or compute it.
+    key = cache_key(o)
+    stamp = object_stamp(o)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == stamp:
+        sig = entry[1]
+    else:
+        sig = None
+        if o.CheckType(c4d.Opolygon) or o.CheckType(c4d.Ospline):
+            for stored_stamp, stored_sig in persisted.get(str(o.GetGUID()), ()):
+                if stored_stamp == list(key[1]):
+                    sig = tuple(stored_sig)
+                    break
+        if sig is None:
+            sig = get_signature(o)
+        cache[key] = (stamp, sig)
+    cache.move_to_end(key)
+    while len(cache) > FINGERPRINT_CACHE_LIMIT:
+        cache.popitem(last=False)
+    return sig
+
+def find_duplicate_classes(objs, cache, persisted):
+    # One pass: bucket by signature, then split buckets into identical classes.
+    index = {}
+    for o in objs:
+        if o.CheckType(c4d.Oinstance) or not is_supported_type(o) or is_generator_input(o):
+            continue
+        index.setdefault(cached_signature(o, cache, persisted), []).append(o)
+    classes = []
+    for bucket in index.values():
+        bucket_classes = []
+        for o in bucket:
+            for cls in bucket_classes:
+                if objects_are_identical(cls[0], o):
+                    cls.append(o)
+                    break
+            else:
+                bucket_classes.append([o])
+        classes.extend(bucket_classes)
+    return classes
 
 def main():
     doc = c4d.documents.GetActiveDocument()
     if not doc:
         gui.MessageDialog("No active document.")
         return
+    point_cache.clear()
+    moment_cache.clear()
+    hash_cache.clear()
+    mesh_cache.clear()
+    generator_cache.clear()
+    reset_stage_stats()
 
-    # 1) capture original selection
+    # 1) capture original selection; with nothing selected, offer a whole-scene run
     original_sel = doc.GetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_CHILDREN)
-    if not original_sel:
-        gui.MessageDialog("Please select some polygon, spline, primitive or light objects.")
-        return
+    whole_scene = not original_sel
+    if whole_scene:
+        if not gui.QuestionDialog("Nothing is selected.\n"
+                                  "Select duplicates in the entire scene?"):
+            return
+    else:
+        # 2) filter to supported types
+        masters = [o for o in original_sel if is_supported_type(o)]
+        if not masters:
+            gui.MessageDialog("No supported object types in selection.")
+            return
 
-    # 2) filter to supported types
-    masters = [o for o in original_sel if is_supported_type(o)]
-    if not masters:
-        gui.MessageDialog("No supported object types in selection.")
-        return
+    # 3) scan the whole doc and group it into duplicate classes in one pass
+    all_objs = get_all_objects(doc.GetFirstObject())
+    cache = get_session_cache()
+    classes = find_duplicate_classes(all_objs, cache, load_persisted_fingerprints(doc))
+    stored = save_persisted_fingerprints(doc, all_objs, cache)
+    if stored is not None:
+        print("Stored {} signatures in the document; save the scene to keep them.".format(stored))
 
-    # 3) find canonical masters
-    canonical = get_canonical_masters(masters)
+    # 4) collect duplicates (excluding the masters themselves)
+    duplicates = []
+    if whole_scene:
+        # the first object of each class stays unselected as its master
+        for cls in classes:
+            duplicates.extend(cls[1:])
+    else:
+        class_of = {}
+        for cls in classes:
+            for o in cls:
+                class_of[o] = cls
+        selected = set(masters)
+        picked = set()
+        for m in masters:
+            cls = class_of.get(m)
+            if cls is not None and id(cls) not in picked:
+                picked.add(id(cls))
+                duplicates.extend(o for o in cls if o not in selected)
 
-    # 4) scan the whole doc
-    all_objs = []
-    get_all_objects(doc.GetFirstObject(), all_objs)
+    print_stage_stats()
 
-    # 5) collect duplicates (excluding the masters themselves)
-    duplicates = []
-    canon_set = set(canonical)
-    for m in canonical:
-        for o in all_objs:
-            if o in canon_set:
-                continue
-            if is_supported_type(o) and objects_are_identical(m, o):
-                duplicates.append(o)
-
-    # 6) add duplicates to the existing selection (preserving original_sel)
+    # 5) add duplicates to the existing selection (preserving original_sel)
     if duplicates:
         for d in duplicates:
             d.SetBit(c4d.BIT_ACTIVE)
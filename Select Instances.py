@@ -1,5 +1,14 @@
+import os
+import sys
+
 import c4d
 
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import iter_objects
+
 def get_instance_master(obj):
     """Returns the ultimate reference of an instance or the object itself if not an instance."""
     while obj and obj.GetType() == c4d.Oinstance:
@@ -9,19 +18,8 @@ def get_instance_master(obj):
 def collect_all_instances(doc, master_objs):
     """Finds all instances in the document referencing any of the given master objects."""
     masters_set = set(master_objs)
-    instances = []
-
-    def search(obj):
-        while obj:
-            if obj.GetType() == c4d.Oinstance:
-                ref = obj[c4d.INSTANCEOBJECT_LINK]
-                if ref in masters_set:
-                    instances.append(obj)
-            search(obj.GetDown())
-            obj = obj.GetNext()
-
-    search(doc.GetFirstObject())
-    return instances
+    return [obj for obj in iter_objects(doc.GetFirstObject(), types=(c4d.Oinstance,))
+            if obj[c4d.INSTANCEOBJECT_LINK] in masters_set]
 
 def main():
     doc = c4d.documents.GetActiveDocument()
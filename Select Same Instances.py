@@ -1,8 +1,17 @@
 # Author: Chat GPT and Dani Zaitcev
 # Tested with Cinema 4D 2025.2 
 
+import os
+import sys
+
 import c4d
 
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import iter_objects
+
 def main():
     doc = c4d.documents.GetActiveDocument()
     selection = doc.GetActiveObjects(0)
@@ -14,16 +23,8 @@ def main():
     if not ref_obj:
         return
 
-    instances = []
-
-    def search(obj):
-        while obj:
-            if obj.GetType() == c4d.Oinstance and obj[c4d.INSTANCEOBJECT_LINK] == ref_obj:
-                instances.append(obj)
-            search(obj.GetDown())
-            obj = obj.GetNext()
-
-    search(doc.GetFirstObject())
+    instances = [obj for obj in iter_objects(doc.GetFirstObject(), types=(c4d.Oinstance,))
+                 if obj[c4d.INSTANCEOBJECT_LINK] == ref_obj]
 
     doc.SetActiveObject(None, c4d.SELECTION_NEW)
     for inst in instances:
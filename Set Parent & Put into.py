@@ -1,6 +1,15 @@
+import os
+import sys
+
 import c4d
 from c4d import gui
 
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import iter_objects
+
 def debug(msg):
     """Print to the C4D Console with a prefix."""
     print(f"[ParentDialog] {msg}")
@@ -10,15 +19,7 @@ def get_true_selection(doc):
     Return every object with BIT_ACTIVE set—no hierarchy culling—
     so selecting both a parent and its child counts as two.
     """
-    sel = []
-    def recurse(op):
-        while op:
-            if op.GetBit(c4d.BIT_ACTIVE):
-                sel.append(op)
-            recurse(op.GetDown())
-            op = op.GetNext()
-    recurse(doc.GetFirstObject())
-    return sel
+    return [op for op in iter_objects(doc.GetFirstObject()) if op.GetBit(c4d.BIT_ACTIVE)]
 
 class ParentDialog(gui.GeDialog):
     def __init__(self):
@@ -0,0 +1,894 @@
+import math
+import os
+import sys
+import time
+from array import array
+
+import c4d
+from c4d import gui
+
+# scene_traversal.py is shared by the scripts in this folder.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+from scene_traversal import get_all_objects
+
+# NumPy is optional. Cinema 4D doesn't ship it, but when it is installed into
+# C4D's Python the connected components are found with vectorized label
+# propagation instead of a per-polygon union-find.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Smallest grid cell used by the point matcher, so a zero tolerance
+# still produces a usable grid (identical points share a cell).
+MIN_CELL_SIZE = 1e-6
+
+# Principal axes whose variances differ by less than this fraction of the
+# largest variance can't be told apart (e.g. cubes, cylinders).
+AXIS_EPSILON = 1e-4
+
+# An axis sign is ambiguous if the third moment along it is this small
+# relative to its absolute third moment (symmetric shapes).
+SIGN_EPSILON = 1e-6
+
+# Axis sign flips that keep the frame right-handed (proper rotations only).
+PROPER_FLIPS = ((1, 1, 1), (1, -1, -1), (-1, 1, -1), (-1, -1, 1))
+
+# Shape buckets are this many tolerances wide. Matching parts differ by at
+# most about two tolerances in their principal spreads, so probing the
+# neighbouring buckets never misses a match.
+DESCRIPTOR_CELL_FACTOR = 4.0
+
+# UV coordinates are compared rounded to this many digits.
+UV_DIGITS = 5
+
+# Normal tags store every component as a 16-bit integer scaled by this.
+NORMAL_SCALE = 32000.0
+
+# Normals of matching corners may differ by this much (the 16-bit storage
+# rounds rotated copies differently).
+NORMAL_TOLERANCE = 1e-3
+
+# Vertex map weights are compared rounded to this many digits.
+WEIGHT_DIGITS = 5
+
+# Per-point and per-polygon tags that are sliced onto the rebuilt parts.
+# Meshes with other data tags (vertex colors, weights...) are not split.
+SLICED_TAGS = (c4d.Tuvw, c4d.Tnormal, c4d.Tvertexmap,
+               c4d.Tpointselection, c4d.Tpolygonselection, c4d.Tedgeselection)
+
+# Offsets of a cell and its 26 neighbours.
+NEIGHBOUR_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+def as_vector(v):
+    """Converts a NumPy row to a c4d.Vector (Vectors are returned unchanged)."""
+    if np is not None and isinstance(v, np.ndarray):
+        return c4d.Vector(float(v[0]), float(v[1]), float(v[2]))
+    return v
+
+def read_points(obj):
+    """
+    Reads the object's local points: an (n, 3) float64 array with NumPy,
+    a list of c4d.Vectors without it.
+    """
+    if np is None:
+        return obj.GetAllPoints()
+    count = obj.GetPointCount()
+    try:
+        # View the point memory directly instead of creating a Vector per point.
+        arr = np.frombuffer(obj.GetPointR(), dtype=np.float64, count=count * 3)
+        return arr.reshape(count, 3).copy()
+    except Exception:
+        pts = [(p.x, p.y, p.z) for p in obj.GetAllPoints()]
+        return np.array(pts, dtype=np.float64).reshape(count, 3)
+
+def read_polygons(obj):
+    """
+    Reads the object's polygons as (a, b, c, d) rows: an (m, 4) int64 array
+    with NumPy, a list of tuples without it. Triangles have c == d.
+    """
+    if np is None:
+        return [(p.a, p.b, p.c, p.d) for p in obj.GetAllPolygons()]
+    count = obj.GetPolygonCount()
+    try:
+        arr = np.frombuffer(obj.GetPolygonR(), dtype=np.int32, count=count * 4)
+        return arr.reshape(count, 4).astype(np.int64)
+    except Exception:
+        polys = [(p.a, p.b, p.c, p.d) for p in obj.GetAllPolygons()]
+        return np.array(polys, dtype=np.int64).reshape(count, 4)
+
+def point_labels_array(point_count, polys):
+    """
+    Vectorized connected components over the polygon index array (hooking
+    and pointer jumping). Every label is a root, a point whose label is
+    itself. Each round, every polygon edge hooks the larger root of its two
+    points onto the smaller one. Then every label jumps to its label's label
+    until all labels are roots again. Merging whole components, not just
+    the edge endpoints, needs a few rounds even on long strips. When no
+    edge joins two roots, all connected points carry the smallest point
+    index of their component.
+    """
+    labels = np.arange(point_count, dtype=np.int64)
+    src = polys[:, :3].ravel()
+    dst = polys[:, 1:].ravel()
+    while True:
+        src_roots, dst_roots = labels[src], labels[dst]
+        lowest = np.minimum(src_roots, dst_roots)
+        if np.array_equal(src_roots, dst_roots):
+            return labels
+        hooked = labels.copy()
+        np.minimum.at(hooked, src_roots, lowest)
+        np.minimum.at(hooked, dst_roots, lowest)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        labels = hooked
+
+def point_labels_list(point_count, polys):
+    """Union-find with path halving; the fallback for point_labels_array."""
+    parent = list(range(point_count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for poly in polys:
+        root = find(poly[0])
+        for i in poly[1:]:
+            other = find(i)
+            if other != root:
+                if other < root:
+                    root, other = other, root
+                parent[other] = root
+    return [find(i) for i in range(point_count)]
+
+def split_components(point_count, polys):
+    """
+    Splits a mesh into its connected components (polygons sharing points).
+    Returns a list of (polygon_indices, point_indices) pairs, both sorted.
+    """
+    if len(polys) == 0:
+        return []
+    if np is not None:
+        labels = point_labels_array(point_count, polys)
+        _, component = np.unique(labels[polys[:, 0]], return_inverse=True)
+        order = np.argsort(component, kind="stable")
+        bounds = np.flatnonzero(np.diff(component[order])) + 1
+        return [(group, np.unique(polys[group])) for group in np.split(order, bounds)]
+
+    labels = point_labels_list(point_count, polys)
+    groups = {}
+    for i, poly in enumerate(polys):
+        groups.setdefault(labels[poly[0]], []).append(i)
+    return [(group, sorted(set(i for j in group for i in polys[j])))
+            for group in groups.values()]
+
+def gather_points(points, point_indices):
+    """Returns the sub-cloud of points at point_indices."""
+    if np is not None:
+        return points[point_indices]
+    return [points[i] for i in point_indices]
+
+def get_centroid(points):
+    """Returns the average of a non-empty point cloud."""
+    if np is not None:
+        return points.mean(axis=0)
+    center = c4d.Vector(0)
+    for p in points:
+        center += p
+    return center / len(points)
+
+def symmetric_eigen(a):
+    """
+    Jacobi eigen decomposition of a symmetric 3x3 matrix given as nested lists.
+    Returns (eigenvalues, eigenvectors) with eigenvectors as unit c4d.Vectors.
+    Only used when NumPy is not available.
+    """
+    a = [row[:] for row in a]
+    v = [[1.0 if i == j else 0.0 for j in range(3)] for i in range(3)]
+    for _ in range(50):
+        if a[0][1] ** 2 + a[0][2] ** 2 + a[1][2] ** 2 < 1e-30:
+            break
+        for p, q in ((0, 1), (0, 2), (1, 2)):
+            if a[p][q] == 0.0:
+                continue
+            theta = (a[q][q] - a[p][p]) / (2.0 * a[p][q])
+            t = math.copysign(1.0, theta) / (abs(theta) + math.sqrt(theta * theta + 1.0))
+            c = 1.0 / math.sqrt(t * t + 1.0)
+            s = t * c
+            for k in range(3):
+                akp, akq = a[k][p], a[k][q]
+                a[k][p] = c * akp - s * akq
+                a[k][q] = s * akp + c * akq
+            for k in range(3):
+                apk, aqk = a[p][k], a[q][k]
+                a[p][k] = c * apk - s * aqk
+                a[q][k] = s * apk + c * aqk
+            for k in range(3):
+                vkp, vkq = v[k][p], v[k][q]
+                v[k][p] = c * vkp - s * vkq
+                v[k][q] = s * vkp + c * vkq
+    values = [a[i][i] for i in range(3)]
+    vectors = [c4d.Vector(v[0][i], v[1][i], v[2][i]) for i in range(3)]
+    return values, vectors
+
+def principal_axes(centered):
+    """
+    Returns (variances, axes) of a centered cloud sorted by decreasing
+    variance. Axes are unit NumPy rows or c4d.Vectors.
+    """
+    if np is not None:
+        values, vectors = np.linalg.eigh(centered.T @ centered)
+        order = np.argsort(values)[::-1]
+        return [float(values[i]) for i in order], [vectors[:, i].copy() for i in order]
+
+    cov = [[0.0] * 3 for _ in range(3)]
+    for p in centered:
+        c = (p.x, p.y, p.z)
+        for i in range(3):
+            for j in range(i, 3):
+                cov[i][j] += c[i] * c[j]
+    for i in range(3):
+        for j in range(i):
+            cov[i][j] = cov[j][i]
+    values, vectors = symmetric_eigen(cov)
+    order = sorted(range(3), key=lambda i: values[i], reverse=True)
+    return [values[i] for i in order], [vectors[i] for i in order]
+
+def third_moments(centered, axis):
+    """Returns (signed, absolute) third moments of the cloud along axis."""
+    if np is not None:
+        proj = centered @ axis
+        return float(np.sum(proj ** 3)), float(np.sum(np.abs(proj) ** 3))
+    proj = [p.Dot(axis) for p in centered]
+    return sum(d ** 3 for d in proj), sum(abs(d) ** 3 for d in proj)
+
+def analyze_part(points, polygon_indices, point_indices):
+    """
+    Describes one connected component. The part keeps its polygon and point
+    indices into the source mesh, its centroid and centered cloud, and a
+    rotation-invariant descriptor (point count, polygon count, spreads), where
+    spreads are the standard deviations along the principal axes.
+    """
+    cloud = gather_points(points, point_indices)
+    center = get_centroid(cloud)
+    if np is not None:
+        centered = cloud - center
+    else:
+        centered = [p - center for p in cloud]
+    values, axes = principal_axes(centered)
+    count = len(centered)
+    return {
+        "polygons": polygon_indices,
+        "points": point_indices,
+        "center": center,
+        "centered": centered,
+        "values": values,
+        "axes": axes,
+        "spreads": tuple(math.sqrt(max(v, 0.0) / count) for v in values),
+    }
+
+def canonical_frame(part):
+    """
+    Puts the part's points into a canonical frame: origin at the centroid,
+    axes along the principal axes (largest variance first), and each axis
+    flipped so the third moment of the cloud along it is positive.
+    Returns (frame, canonical_points, ambiguous), where frame maps canonical
+    coordinates to the source object's space and ambiguous is True if the
+    axes or their signs could not be fixed reliably (symmetric shapes).
+    Computed once per part.
+    """
+    cached = part.get("frame")
+    if cached is not None:
+        return cached
+
+    centered = part["centered"]
+    values, axes = part["values"], list(part["axes"])
+    scale = max(values[0], 1e-30)
+    ambiguous = (values[0] - values[1] <= AXIS_EPSILON * scale or
+                 values[1] - values[2] <= AXIS_EPSILON * scale)
+
+    for i in (0, 1):
+        skew, magnitude = third_moments(centered, axes[i])
+        if abs(skew) <= SIGN_EPSILON * magnitude:
+            ambiguous = True
+        if skew < 0:
+            axes[i] = -axes[i]
+
+    if np is not None:
+        axes[2] = np.cross(axes[0], axes[1])
+        canonical = centered @ np.array(axes).T
+    else:
+        axes[2] = axes[0].Cross(axes[1])
+        canonical = [c4d.Vector(p.Dot(axes[0]), p.Dot(axes[1]), p.Dot(axes[2]))
+                     for p in centered]
+
+    frame = c4d.Matrix(as_vector(part["center"]), as_vector(axes[0]),
+                       as_vector(axes[1]), as_vector(axes[2]))
+    cached = (frame, canonical, ambiguous)
+    part["frame"] = cached
+    return cached
+
+def read_normal_data(tag, count):
+    """
+    Returns the raw components of a normal tag (four corners of three
+    16-bit integers per polygon) as an array, or None if they can't be read.
+    """
+    try:
+        data = array("h", bytes(tag.GetLowlevelDataAddressR()))
+    except Exception:
+        return None
+    return data if len(data) == count * 12 else None
+
+def normal_vector(data, index, corner):
+    """Returns the normal of a polygon corner from read_normal_data()."""
+    i = index * 12 + corner * 3
+    return c4d.Vector(data[i], data[i + 1], data[i + 2]) / NORMAL_SCALE
+
+def unsupported_tags(obj):
+    """
+    Returns the names of the object's per-point or per-polygon data tags
+    that can't be carried over to the split parts.
+    """
+    count = obj.GetPolygonCount()
+    names = []
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Tnormal):
+            if read_normal_data(tag, count) is None:
+                names.append(tag.GetName())
+        elif (isinstance(tag, c4d.VariableTag) and tag.GetType() not in SLICED_TAGS and
+                not tag.CheckType(c4d.Tpoint) and not tag.CheckType(c4d.Tpolygon)):
+            names.append(tag.GetName())
+        tag = tag.GetNext()
+    return names
+
+def read_polygon_attributes(obj):
+    """
+    Reads the per-polygon and per-point data an instance must reproduce.
+    Returns (corner_data, face_data, point_data, normal_data):
+    corner_data[i] holds, for each corner of polygon i, its rounded UVs in
+    every UVW tag and whether the edge leaving it is in each edge selection;
+    face_data[i] holds the polygon's membership in every polygon selection
+    tag; point_data[p] holds point p's rounded weight in every vertex map
+    and its membership in every point selection tag; normal_data holds the
+    read_normal_data() of every normal tag. Normals turn with the part, so
+    they are only compared once the placement is known (see same_layout).
+    """
+    polys = obj.GetAllPolygons()
+    count, point_count = len(polys), obj.GetPointCount()
+    uvw_tags, normal_data, selections, edges, weights, point_selections = [], [], [], [], [], []
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Tuvw):
+            uvw_tags.append(tag)
+        elif tag.CheckType(c4d.Tnormal):
+            data = read_normal_data(tag, count)
+            if data is not None:
+                normal_data.append(data)
+        elif tag.CheckType(c4d.Tpolygonselection):
+            selections.append(tag.GetBaseSelect().GetAll(count))
+        elif tag.CheckType(c4d.Tedgeselection):
+            edges.append(tag.GetBaseSelect().GetAll(count * 4))
+        elif tag.CheckType(c4d.Tvertexmap):
+            weights.append(tag.GetAllHighlevelData())
+        elif tag.CheckType(c4d.Tpointselection):
+            point_selections.append(tag.GetBaseSelect().GetAll(point_count))
+        tag = tag.GetNext()
+
+    corner_data = []
+    for i, poly in enumerate(polys):
+        # C4D numbers the edges of a triangle 0, 1 and 3.
+        sides = (0, 1, 3) if poly.c == poly.d else (0, 1, 2, 3)
+        uvs = [tag.GetSlow(i) for tag in uvw_tags]
+        corner_data.append(tuple(
+            (tuple((round(uv["abcd"[k]].x, UV_DIGITS), round(uv["abcd"[k]].y, UV_DIGITS)) for uv in uvs),
+             tuple(bool(edge[i * 4 + side]) for edge in edges))
+            for k, side in enumerate(sides)))
+    face_data = [tuple(bool(selected[i]) for selected in selections) for i in range(count)]
+    point_data = [tuple(round(weight[p], WEIGHT_DIGITS) for weight in weights) +
+                  tuple(bool(selected[p]) for selected in point_selections)
+                  for p in range(point_count)]
+    return corner_data, face_data, point_data, normal_data
+
+def polygon_key(poly, index, attributes, label):
+    """
+    Returns polygon index as a hashable key: its corners as (label(point),
+    corner data, point data), rotated so the key doesn't depend on the first
+    corner, plus its face data. Winding is kept, so flipped polygons differ.
+    """
+    corner_data, face_data, point_data = attributes[:3]
+    n = 3 if poly[2] == poly[3] else 4
+    corners = [(label(int(poly[k])), corner_data[index][k], point_data[int(poly[k])]) for k in range(n)]
+    return min(tuple(corners[k:] + corners[:k]) for k in range(n)), face_data[index]
+
+def corner_normals(polys, polygon_indices, normal_data, label):
+    """
+    Maps every corner of the given polygons, as (the polygon's labelled
+    points, the corner's labelled point), to its normals.
+    """
+    normals = {}
+    for i in polygon_indices:
+        poly = polys[i]
+        n = 3 if poly[2] == poly[3] else 4
+        points = tuple(sorted(label(int(poly[k])) for k in range(n)))
+        for k in range(n):
+            normals[(points, label(int(poly[k])))] = [normal_vector(data, int(i), k) for data in normal_data]
+    return normals
+
+def same_normals(polys, part_a, part_b, mapping, shape_mtx, normal_data):
+    """
+    Returns True if every corner of part_b carries the normals of the
+    corresponding corner of part_a, turned by shape_mtx.
+    """
+    if not normal_data:
+        return True
+    normals_b = corner_normals(polys, part_b["polygons"], normal_data, int)
+    for corner, normals in corner_normals(polys, part_a["polygons"], normal_data, mapping.get).items():
+        expected = normals_b.get(corner)
+        if expected is None:
+            return False
+        for n, m in zip(normals, expected):
+            if (shape_mtx.MulV(n) - m).GetLength() > NORMAL_TOLERANCE:
+                return False
+    return True
+
+def part_fingerprint(part, polys, attributes):
+    """
+    Hashes the part's connectivity, UVs, vertex maps and selections
+    independent of point order and placement: every corner is labelled with its point's
+    valence (the number of the part's polygons using it). Parts with
+    different fingerprints are never compared.
+    """
+    valence = {}
+    for i in part["polygons"]:
+        poly = polys[i]
+        for k in range(3 if poly[2] == poly[3] else 4):
+            point = int(poly[k])
+            valence[point] = valence.get(point, 0) + 1
+    keys = sorted(polygon_key(polys[i], int(i), attributes, valence.get) for i in part["polygons"])
+    return hash(tuple(keys))
+
+def corresponding_points(points, part_a, part_b, shape_mtx, tolerance):
+    """
+    Maps every point of part_a to the point of part_b it lands on under
+    shape_mtx. Copies usually keep their point order, which is tried first;
+    otherwise each point takes its nearest neighbour within tolerance.
+    Returns a dict of point indices, or None if a point finds no partner.
+    """
+    indices_a = [int(i) for i in part_a["points"]]
+    indices_b = [int(i) for i in part_b["points"]]
+    moved = [shape_mtx * as_vector(points[i]) for i in indices_a]
+    targets = [as_vector(points[i]) for i in indices_b]
+    if all((p - q).GetLength() <= tolerance for p, q in zip(moved, targets)):
+        return dict(zip(indices_a, indices_b))
+
+    cell = max(tolerance, MIN_CELL_SIZE)
+    grid = {}
+    for i, q in zip(indices_b, targets):
+        grid.setdefault(grid_key(q, cell), []).append((i, q))
+    mapping = {}
+    for i, p in zip(indices_a, moved):
+        kx, ky, kz = grid_key(p, cell)
+        best = None
+        for dx, dy, dz in NEIGHBOUR_OFFSETS:
+            for j, q in grid.get((kx + dx, ky + dy, kz + dz), ()):
+                d = (p - q).GetLength()
+                if d <= tolerance and (best is None or d < best[0]):
+                    best = (d, j)
+        if best is None:
+            return None
+        mapping[i] = best[1]
+    return mapping
+
+def same_layout(mesh, part_a, part_b, shape_mtx, tolerance):
+    """
+    Returns True if part_b is an exact copy of part_a placed with shape_mtx:
+    its polygons connect the corresponding points in the same winding, with
+    the same UVs, vertex maps and selections, and normals turned by
+    shape_mtx. mesh is (points, polys, attributes).
+    """
+    points, polys, attributes = mesh
+    mapping = corresponding_points(points, part_a, part_b, shape_mtx, tolerance)
+    if mapping is None:
+        return False
+    keys_a = sorted(polygon_key(polys[i], int(i), attributes, mapping.get) for i in part_a["polygons"])
+    keys_b = sorted(polygon_key(polys[i], int(i), attributes, int) for i in part_b["polygons"])
+    return keys_a == keys_b and same_normals(polys, part_a, part_b, mapping, shape_mtx, attributes[3])
+
+def grid_key(p, cell):
+    """Returns the integer grid cell containing point p."""
+    return (math.floor(p.x / cell), math.floor(p.y / cell), math.floor(p.z / cell))
+
+def build_point_grid(points, cell):
+    """Buckets points into a uniform grid keyed by cell coordinates."""
+    grid = {}
+    for p in points:
+        grid.setdefault(grid_key(p, cell), []).append(p)
+    return grid
+
+def nearest_distance(grid, cell, p):
+    """
+    Returns the distance from p to the closest grid point in its own or a
+    neighbouring cell, or None if those cells are empty. Since the cell size
+    is at least the tolerance, every point within tolerance is found.
+    """
+    kx, ky, kz = grid_key(p, cell)
+    best = None
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                for q in grid.get((kx + dx, ky + dy, kz + dz), ()):
+                    d = (p - q).GetLength()
+                    if best is None or d < best:
+                        best = d
+    return best
+
+def directed_deviation(p_list, grid, cell, tolerance):
+    """
+    Checks that every point in p_list has a grid point within tolerance.
+    Returns (matched, max_deviation); stops at the first unmatched point.
+    """
+    worst = 0.0
+    for p in p_list:
+        d = nearest_distance(grid, cell, p)
+        if d is None or d > tolerance:
+            return False, float("inf") if d is None else d
+        if d > worst:
+            worst = d
+    return True, worst
+
+def encode_cells(keys):
+    """Packs rows of integer cell coordinates into one int64 hash each."""
+    return (keys[:, 0] * 73856093) ^ (keys[:, 1] * 19349663) ^ (keys[:, 2] * 83492791)
+
+def directed_deviation_array(src, dst, cell, tolerance):
+    """
+    Vectorized version of directed_deviation for NumPy clouds. dst is sorted
+    by cell hash, and every src row looks up the rows of its neighbouring cells
+    with a binary search. Returns (matched, max_deviation).
+    """
+    if len(src) == 0:
+        return True, 0.0
+    dst_codes = encode_cells(np.floor(dst / cell).astype(np.int64))
+    order = np.argsort(dst_codes, kind="stable")
+    dst_codes = dst_codes[order]
+    dst_sorted = dst[order]
+
+    src_keys = np.floor(src / cell).astype(np.int64)
+    best = np.full(len(src), np.inf)
+    for offset in NEIGHBOUR_OFFSETS:
+        codes = encode_cells(src_keys + offset)
+        lo = np.searchsorted(dst_codes, codes, side="left")
+        counts = np.searchsorted(dst_codes, codes, side="right") - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        # Expand every (src row, candidate dst row) pair of this offset.
+        seg_starts = np.cumsum(counts) - counts
+        src_idx = np.repeat(np.arange(len(src)), counts)
+        dst_idx = np.arange(total) + np.repeat(lo - seg_starts, counts)
+        dist = np.linalg.norm(src[src_idx] - dst_sorted[dst_idx], axis=1)
+        hit = counts > 0
+        best[hit] = np.minimum(best[hit], np.minimum.reduceat(dist, seg_starts[hit]))
+    worst = float(best.max())
+    return worst <= tolerance, worst
+
+def points_match(p_list1, p_list2, tolerance):
+    """
+    Checks if every point in p_list1 has at least one point in p_list2 within tolerance,
+    and vice versa. Each list is hashed into a grid with cells of the tolerance size,
+    so only neighbouring cells are probed.
+    Returns (matched, max_deviation).
+    """
+    cell = max(tolerance, MIN_CELL_SIZE)
+    if np is not None:
+        ok, dev1 = directed_deviation_array(p_list1, p_list2, cell, tolerance)
+        if not ok:
+            return False, dev1
+        ok, dev2 = directed_deviation_array(p_list2, p_list1, cell, tolerance)
+        return ok, max(dev1, dev2)
+    ok, dev1 = directed_deviation(p_list1, build_point_grid(p_list2, cell), cell, tolerance)
+    if not ok:
+        return False, dev1
+    ok, dev2 = directed_deviation(p_list2, build_point_grid(p_list1, cell), cell, tolerance)
+    return ok, max(dev1, dev2)
+
+def flip_points(points, flip):
+    """Multiplies each axis of the cloud by the matching sign in flip."""
+    if np is not None:
+        return points * np.array(flip, dtype=np.float64)
+    sx, sy, sz = flip
+    return [c4d.Vector(p.x * sx, p.y * sy, p.z * sz) for p in points]
+
+def match_parts(part_a, part_b, tolerance):
+    """
+    Full vertex cloud match of two parts with equal point and polygon counts.
+    Translated copies are tried first; rotated copies are matched in their
+    canonical frames. Returns the transform (in the source object's space)
+    that maps part_a onto part_b, or None.
+    """
+    matched, _ = points_match(part_a["centered"], part_b["centered"], tolerance)
+    if matched:
+        return c4d.Matrix(as_vector(part_b["center"]) - as_vector(part_a["center"]))
+
+    frame_a, canon_a, ambiguous_a = canonical_frame(part_a)
+    frame_b, canon_b, ambiguous_b = canonical_frame(part_b)
+    flips = PROPER_FLIPS if ambiguous_a or ambiguous_b else PROPER_FLIPS[:1]
+    for sx, sy, sz in flips:
+        matched, _ = points_match(canon_a, flip_points(canon_b, (sx, sy, sz)), tolerance)
+        if matched:
+            frame = c4d.Matrix(frame_b.off, frame_b.v1 * sx, frame_b.v2 * sy, frame_b.v3 * sz)
+            return frame * ~frame_a
+    return None
+
+def part_key(part, cell):
+    """Quantizes the part's descriptor into a bucket key."""
+    spreads = tuple(math.floor(s / cell) for s in part["spreads"])
+    return (part["fingerprint"], len(part["points"]), len(part["polygons"])) + spreads
+
+def cluster_parts(parts, tolerance, mesh):
+    """
+    Groups matching parts. The first part of each class becomes its master;
+    every other part is only compared against the masters with the same
+    fingerprint in neighbouring descriptor buckets, and only joins a class
+    if its points, polygons and tag data all match (see same_layout).
+    Returns a list of (master, [(part, shape_mtx), ...]).
+    """
+    points, polys, attributes = mesh
+    for part in parts:
+        if "fingerprint" not in part:
+            part["fingerprint"] = part_fingerprint(part, polys, attributes)
+
+    cell = max(DESCRIPTOR_CELL_FACTOR * tolerance, MIN_CELL_SIZE)
+    index = {}
+    classes = []
+    for part in parts:
+        fingerprint, point_count, polygon_count, kx, ky, kz = part_key(part, cell)
+        found = None
+        for dx, dy, dz in NEIGHBOUR_OFFSETS:
+            key = (fingerprint, point_count, polygon_count, kx + dx, ky + dy, kz + dz)
+            for entry in index.get(key, ()):
+                shape_mtx = match_parts(entry[0], part, tolerance)
+                if shape_mtx is not None and same_layout(mesh, entry[0], part, shape_mtx, tolerance):
+                    found = entry
+                    break
+            if found is not None:
+                break
+        if found is not None:
+            found[1].append((part, shape_mtx))
+        else:
+            entry = (part, [])
+            key = (fingerprint, point_count, polygon_count, kx, ky, kz)
+            index.setdefault(key, []).append(entry)
+            classes.append(entry)
+    return classes
+
+def sliced_selection(tag, count, indices):
+    """
+    Returns a new selection tag of tag's type and name that selects element
+    j wherever element indices[j] of tag (with count elements) is selected.
+    """
+    selected = tag.GetBaseSelect().GetAll(count)
+    selection = c4d.SelectionTag(tag.GetType())
+    base_select = selection.GetBaseSelect()
+    for j, i in enumerate(indices):
+        if selected[int(i)]:
+            base_select.Select(j)
+    selection.SetName(tag.GetName())
+    return selection
+
+def copy_part_tags(source, target, polygon_indices, point_indices):
+    """
+    Copies the tags of the source mesh that belong to the given polygons and
+    points onto target: UVW, normal, vertex map and selection tags are
+    sliced, Phong tags are cloned.
+    """
+    count = source.GetPolygonCount()
+    tag = source.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Tuvw):
+            uvw = c4d.UVWTag(len(polygon_indices))
+            for j, i in enumerate(polygon_indices):
+                uv = tag.GetSlow(int(i))
+                uvw.SetSlow(j, uv["a"], uv["b"], uv["c"], uv["d"])
+            uvw.SetName(tag.GetName())
+            target.InsertTag(uvw)
+        elif tag.CheckType(c4d.Tnormal):
+            data = read_normal_data(tag, count)
+            sliced = array("h")
+            for i in polygon_indices:
+                sliced.extend(data[int(i) * 12:int(i) * 12 + 12])
+            normal = c4d.NormalTag(len(polygon_indices))
+            normal.GetLowlevelDataAddressW()[:] = sliced.tobytes()
+            normal.SetName(tag.GetName())
+            target.InsertTag(normal)
+        elif tag.CheckType(c4d.Tvertexmap):
+            weights = tag.GetAllHighlevelData()
+            vertex_map = c4d.VariableTag(c4d.Tvertexmap, len(point_indices))
+            vertex_map.SetAllHighlevelData([weights[int(i)] for i in point_indices])
+            vertex_map.SetName(tag.GetName())
+            target.InsertTag(vertex_map)
+        elif tag.CheckType(c4d.Tpolygonselection):
+            target.InsertTag(sliced_selection(tag, count, polygon_indices))
+        elif tag.CheckType(c4d.Tedgeselection):
+            edges = [int(i) * 4 + side for i in polygon_indices for side in range(4)]
+            target.InsertTag(sliced_selection(tag, count * 4, edges))
+        elif tag.CheckType(c4d.Tpointselection):
+            target.InsertTag(sliced_selection(tag, source.GetPointCount(), point_indices))
+        elif tag.CheckType(c4d.Tphong):
+            target.InsertTag(tag.GetClone())
+        tag = tag.GetNext()
+
+def build_part_object(source, points, polys, polygon_indices, offset, name, loose_points=()):
+    """
+    Builds a polygon object from the given polygons of the source mesh, plus
+    the given points that belong to no polygon.
+    Points are stored relative to offset, so the object's axis can sit at the
+    part's centroid.
+    """
+    if np is not None:
+        sub = polys[polygon_indices]
+        point_indices = np.unique(np.concatenate([sub.ravel(), np.asarray(loose_points, dtype=np.int64)]))
+        local = np.searchsorted(point_indices, sub)
+        cloud = points[point_indices] - offset
+        vectors = [c4d.Vector(*row) for row in cloud.tolist()]
+        rows = local.tolist()
+    else:
+        point_indices = sorted(set(i for j in polygon_indices for i in polys[j]) | set(loose_points))
+        remap = dict((old, new) for new, old in enumerate(point_indices))
+        vectors = [points[i] - offset for i in point_indices]
+        rows = [[remap[i] for i in polys[j]] for j in polygon_indices]
+
+    obj = c4d.PolygonObject(len(vectors), len(rows))
+    obj.SetAllPoints(vectors)
+    for j, (a, b, c, d) in enumerate(rows):
+        obj.SetPolygon(j, c4d.CPolygon(a, b, c, d))
+    copy_part_tags(source, obj, polygon_indices, point_indices)
+    obj.SetName(name)
+    obj.Message(c4d.MSG_UPDATE)
+    return obj
+
+def split_object(doc, obj, tolerance, instances):
+    """
+    Splits obj into connected components and rebuilds it as a null holding
+    one master per repeated part, instances for its copies and a single mesh
+    with all parts that occur only once. The null takes obj's place, tags,
+    children and instance links. Returns (parts, masters, instances, unique),
+    or None if obj has no repeated parts (obj is left untouched). Points that
+    belong to no polygon are kept in the unique mesh.
+    """
+    points = read_points(obj)
+    polys = read_polygons(obj)
+    components = split_components(len(points), polys)
+    parts = [analyze_part(points, group, point_indices) for group, point_indices in components]
+    classes = cluster_parts(parts, tolerance, (points, polys, read_polygon_attributes(obj)))
+    repeated = [entry for entry in classes if entry[1]]
+    if not repeated:
+        return None
+
+    group = c4d.BaseObject(c4d.Onull)
+    group.SetName(obj.GetName() + "_split")
+    group.SetMl(obj.GetMl())
+    doc.InsertObject(group, parent=obj.GetUp(), pred=obj)
+    doc.AddUndo(c4d.UNDOTYPE_NEW, group)
+
+    tag = obj.GetFirstTag()
+    while tag:
+        if tag.CheckType(c4d.Ttexture):
+            group.InsertTag(tag.GetClone())
+        tag = tag.GetNext()
+
+    last = None
+    instance_count = 0
+    for number, (master_part, copies) in enumerate(repeated, 1):
+        offset = master_part["center"]
+        master = build_part_object(obj, points, polys, master_part["polygons"], offset,
+                                   "{}_part_{}".format(obj.GetName(), number))
+        master.SetMl(c4d.Matrix(as_vector(offset)))
+        doc.InsertObject(master, parent=group, pred=last)
+        last = master
+        for _, shape_mtx in copies:
+            instance = c4d.BaseObject(c4d.Oinstance)
+            instance[c4d.INSTANCEOBJECT_LINK] = master
+            instance.SetName(master.GetName() + "_instance")
+            instance.SetMl(shape_mtx * master.GetMl())
+            doc.InsertObject(instance, parent=group, pred=last)
+            last = instance
+            instance_count += 1
+
+    singles = [entry[0] for entry in classes if not entry[1]]
+    if np is not None:
+        loose = np.setdiff1d(np.arange(len(points)), polys.ravel())
+    else:
+        loose = sorted(set(range(len(points))) - set(i for poly in polys for i in poly))
+    if singles or len(loose):
+        if np is not None:
+            polygon_indices = np.sort(np.concatenate([part["polygons"] for part in singles] +
+                                                     [np.zeros(0, dtype=np.int64)]))
+            offset = np.zeros(3)
+        else:
+            polygon_indices = sorted(i for part in singles for i in part["polygons"])
+            offset = c4d.Vector(0)
+        rest = build_part_object(obj, points, polys, polygon_indices, offset,
+                                 obj.GetName() + "_unique", loose)
+        doc.InsertObject(rest, parent=group, pred=last)
+
+    # The null has obj's local matrix, so children keep their placement.
+    child = obj.GetDown()
+    while child:
+        next_child = child.GetNext()
+        doc.AddUndo(c4d.UNDOTYPE_CHANGE, child)
+        child.Remove()
+        doc.InsertObject(child, parent=group, pred=last)
+        last = child
+        child = next_child
+
+    for inst in instances:
+        if inst[c4d.INSTANCEOBJECT_LINK] == obj:
+            doc.AddUndo(c4d.UNDOTYPE_CHANGE, inst)
+            inst[c4d.INSTANCEOBJECT_LINK] = group
+
+    doc.AddUndo(c4d.UNDOTYPE_DELETE, obj)
+    obj.Remove()
+    return len(parts), len(repeated), instance_count, len(singles)
+
+def main():
+    doc = c4d.documents.GetActiveDocument()
+    if not doc:
+        gui.MessageDialog("No active document found.")
+        return
+
+    selection = doc.GetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_NONE)
+    meshes = [obj for obj in selection if obj.CheckType(c4d.Opolygon) and obj.GetPolygonCount()]
+    if not meshes:
+        gui.MessageDialog("Please select one or more polygon objects to split.")
+        return
+
+    # Ask for tolerance from the user.
+    input_str = gui.InputDialog("Enter tolerance (e.g. 0.01):", "0.01")
+    if not input_str:
+        return
+    try:
+        tolerance = float(input_str)
+    except ValueError:
+        gui.MessageDialog("Invalid number.")
+        return
+
+    all_objs = get_all_objects(doc.GetFirstObject())
+    instances = [op for op in all_objs if op.CheckType(c4d.Oinstance)]
+
+    start = time.time()
+    totals = [0, 0, 0, 0]
+    split_count = 0
+    doc.StartUndo()
+    for obj in meshes:
+        blocked = unsupported_tags(obj)
+        if blocked:
+            print("{}: not split, can't carry over tags {}".format(obj.GetName(), ", ".join(blocked)))
+            continue
+        result = split_object(doc, obj, tolerance, instances)
+        if result is None:
+            print("{}: no repeated parts".format(obj.GetName()))
+            continue
+        print("{}: {} parts -> {} masters, {} instances, {} unique".format(obj.GetName(), *result))
+        totals = [t + r for t, r in zip(totals, result)]
+        split_count += 1
+    doc.EndUndo()
+    c4d.EventAdd()
+    print("Split {} meshes in {:.2f}s".format(split_count, time.time() - start))
+
+    if not split_count:
+        gui.MessageDialog("No repeated parts found.")
+        return
+    gui.MessageDialog("Split {} mesh(es) into {} parts:\n"
+                      "{} masters, {} instances, {} unique parts.".format(split_count, *totals))
+
+if __name__ == '__main__':
+    main()
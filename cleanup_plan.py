@@ -0,0 +1,50 @@
+"""
+Shared change plans for the cleanup scripts in this folder.
+
+Each cleanup script first builds a CleanupPlan without touching the
+document, reports it, and only applies it once the user confirms.
+
+Scripts import it from their own folder, like scene_traversal.py:
+
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from cleanup_plan import CleanupPlan, format_plan, measure_subtrees
+"""
+
+import collections
+
+import c4d
+
+from scene_traversal import iter_objects
+
+# Approximate memory per point (a Vector of three doubles) and per polygon
+# (four 32-bit indices) freed by deleting geometry.
+POINT_BYTES = 24
+POLYGON_BYTES = 16
+
+# An immutable change plan: the topmost objects or tags to remove, how many
+# objects that covers, the points and polygons in their subtrees, the
+# instances the change touches and the nulls to flatten, deepest first.
+# Scripts only fill in the fields they use.
+CleanupPlan = collections.namedtuple(
+    "CleanupPlan", "removals objects points polygons instances flattens",
+    defaults=(0, 0, (), ()))
+
+def measure_subtrees(roots):
+    """Returns (objects, points, polygons) in the subtrees of the given objects."""
+    objects = points = polygons = 0
+    for root in roots:
+        for obj in iter_objects(root, siblings=False):
+            objects += 1
+            if obj.CheckType(c4d.Opoint):
+                points += obj.GetPointCount()
+            if obj.CheckType(c4d.Opolygon):
+                polygons += obj.GetPolygonCount()
+    return objects, points, polygons
+
+def format_plan(plan):
+    """Returns the object and geometry lines of a plan's impact report."""
+    freed = (plan.points * POINT_BYTES + plan.polygons * POLYGON_BYTES) / (1024.0 * 1024.0)
+    return (f"{plan.objects} objects ({len(plan.removals)} top-level)\n"
+            f"{plan.points} points, {plan.polygons} polygons (~{freed:.1f} MB)")
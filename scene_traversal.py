@@ -0,0 +1,75 @@
+"""
+Shared scene traversal for the scripts in this folder.
+
+Every walk uses an explicit stack instead of recursion, so very deep or very
+wide hierarchies never hit Python's recursion limit, and each object costs a
+few list operations instead of a Python call frame.
+
+Scripts import it from their own folder:
+
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from scene_traversal import get_all_objects
+"""
+
+
+def walk(start, types=None, prune=None, siblings=True):
+    """
+    Yields (obj, parent, depth) depth-first in Object Manager order for start,
+    its following siblings (unless siblings is False) and all their
+    descendants. depth is 0 for start and its siblings.
+
+    types: optional collection of type IDs; only matching objects are
+        yielded, but the walk still descends through the others.
+    prune: optional callback; when prune(obj) is True, obj is still yielded
+        (if it matches) but its children are skipped.
+
+    The next sibling is read before an object is yielded, so callers may
+    remove the yielded object (prune it to skip its children).
+    """
+    if start is None:
+        return
+    stack = [(start, start.GetUp(), 0)]
+    while stack:
+        obj, parent, depth = stack.pop()
+        if siblings or depth:
+            nxt = obj.GetNext()
+            if nxt:
+                stack.append((nxt, parent, depth))
+        if types is None or obj.GetType() in types:
+            yield obj, parent, depth
+        if prune is not None and prune(obj):
+            continue
+        down = obj.GetDown()
+        if down:
+            stack.append((down, obj, depth + 1))
+
+
+def iter_objects(start, types=None, prune=None, siblings=True):
+    """Yields the objects of walk() without parent and depth."""
+    for obj, _, _ in walk(start, types, prune, siblings):
+        yield obj
+
+
+def get_all_objects(start, types=None, prune=None):
+    """Returns start, its following siblings and all their descendants as a list."""
+    return list(iter_objects(start, types, prune))
+
+
+def get_subtree(root):
+    """Returns root and all its descendants (not root's siblings) as a list."""
+    return list(iter_objects(root, siblings=False))
+
+
+def iter_tags(obj, types=None):
+    """
+    Yields the object's tags, optionally only those of the given type IDs.
+    The next tag is read first, so callers may remove the yielded tag.
+    """
+    tag = obj.GetFirstTag()
+    while tag:
+        nxt = tag.GetNext()
+        if types is None or tag.GetType() in types:
+            yield tag
+        tag = nxt